@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+
+"""
+
+Play many games in lockstep as NumPy arrays, for Monte Carlo evaluation of
+strategies.
+
+Every game is stepped at once: each call to BatchSimulator.step applies one
+play from the turn player of every game, using the same rules as GameStatus
+in liars_dice/server/game.py and the same flow as Session in
+liars_dice/server/session.py.
+
+Requires NumPy, which is not needed by the rest of the project.
+
+"""
+import collections
+import time
+import numpy as np
+from liars_dice import bids
+from liars_dice.server.game import Hand
+
+# Play types accepted by BatchSimulator.step
+BID = 0
+LIAR = 1
+SPOT_ON = 2
+
+# The outcome of a step, as arrays with an entry for each game.
+#
+# valid: Booleans indicating whether the play was accepted. Invalid plays,
+#     and plays for finished games, leave the game unchanged.
+# loser: Integers with the seat of the player who lost a die, or -1.
+# eliminated: Booleans indicating whether the loser was eliminated.
+# new_round: Booleans indicating whether a new round was rolled.
+StepResult = collections.namedtuple(
+    "StepResult", ["valid", "loser", "eliminated", "new_round"])
+
+
+class BatchSimulator:
+    """Hold the state of many games as NumPy arrays.
+
+    Players are identified by their seat, which is their position in the turn
+    order when the game began. As in GameStatus, eliminated players are
+    skipped when passing the turn or round on.
+
+    Attributes:
+        faces: An int8 array of shape (games, players, 5) with the face value
+            of every die. Only the entries marked by alive are in play.
+        dice: An int8 array of shape (games, players) with the number of
+            dice each player has.
+        alive: A Boolean array of shape (games, players, 5) marking the dice
+            each player still holds.
+        previous_face: An int8 array with the face of the previous bid, or 0
+            if no bid has been made this round.
+        previous_number: An int32 array with the number of the previous bid,
+            or 0 if no bid has been made this round.
+        turn_seat: An integer array with the seat of each game's turn player.
+        round_seat: An integer array with the seat of the player who started
+            each game's round.
+        done: A Boolean array indicating whether each game has been won.
+        winner: An integer array with the seat of the winner, or -1.
+        random_state: The numpy.random.RandomState used to roll dice.
+    """
+
+    def __init__(self, games, players, seed=None):
+        shape = (games, players)
+        self.faces = np.zeros(shape + (Hand.INITIAL_HAND_SIZE,), np.int8)
+        self.dice = np.full(shape, Hand.INITIAL_HAND_SIZE, np.int8)
+        self.alive = np.ones(self.faces.shape, bool)
+        self.previous_face = np.zeros(games, np.int8)
+        self.previous_number = np.zeros(games, np.int32)
+        self.turn_seat = np.full(games, -1, np.int64)
+        self.round_seat = np.full(games, -1, np.int64)
+        self.done = np.zeros(games, bool)
+        self.winner = np.full(games, -1, np.int64)
+        self.random_state = np.random.RandomState(seed)
+        self._dice_slots = np.arange(Hand.INITIAL_HAND_SIZE)
+        self._rows = np.arange(games)[:, None]
+        self._after = np.arange(1, players + 1)
+
+        self.next_round(np.ones(games, bool))
+
+    def next_round(self, games):
+        """Move the selected games to their next round.
+
+        Args:
+            games: A Boolean array selecting the games.
+        """
+        self.round_seat[games] = self.next_seat(self.round_seat)[games]
+        self.turn_seat[games] = self.round_seat[games]
+        self.previous_face[games] = 0
+        self.previous_number[games] = 0
+        self.faces[games] = self.random_state.randint(
+            1, 7, size=(np.count_nonzero(games),) + self.faces.shape[1:])
+
+    def next_seat(self, seat):
+        """Find the seats of the players seated after others.
+
+        Args:
+            seat: An integer array with a seat for every game. A seat of -1
+                gives the first remaining player.
+
+        Returns:
+            An integer array with the seat of the next remaining player.
+        """
+        return self._find_seat(seat[:, None] + self._after)
+
+    def previous_seat(self, seat):
+        """Find the seats of the players seated before others.
+
+        Args:
+            seat: An integer array with a seat for every game.
+
+        Returns:
+            An integer array with the seat of the previous remaining player.
+        """
+        return self._find_seat(seat[:, None] - self._after)
+
+    def _find_seat(self, candidates):
+        # Find the first candidate seat of each game held by a remaining
+        # player.
+        #
+        # Args:
+        #     candidates: An integer array of shape (games, players) with
+        #         seats in the order they should be tried. Seats are wrapped
+        #         around the number of players.
+
+        candidates %= self.dice.shape[1]
+        playing = self.dice[self._rows, candidates] > 0
+        return candidates[self._rows[:, 0], np.argmax(playing, 1)]
+
+    def turn_player(self):
+        """Find the seat of the turn player of every game."""
+        return self.turn_seat
+
+    def dice_count(self, face):
+        """Count the dice showing a face in every game.
+
+        Args:
+            face: An integer array with the face to count for every game.
+
+        Returns:
+            An integer array with the number of dice showing the face.
+        """
+        return ((self.faces == face[:, None, None]) & self.alive).sum((1, 2))
+
+    def step(self, play, face, number):
+        """Apply a play by the turn player of every game.
+
+        Args:
+            play: An integer array of BID, LIAR or SPOT_ON for every game.
+            face: An integer array with the die value bid, where play is BID.
+            number: An integer array with the number of dice bid, where play
+                is BID.
+
+        Returns:
+            A StepResult with the outcome of the play in every game.
+        """
+        games = len(self.done)
+        active = ~self.done
+        has_bid = self.previous_number > 0
+
+        # Bids, as validated by GameStatus.handle_bid
+        bid = active & (play == BID)
+        bid &= bids.is_valid(face, number, self.dice.sum(1))
+        previous_code = np.where(has_bid,
+                                 bids.encode(self.previous_face,
+                                             self.previous_number),
+                                 bids.NO_BID)
+        bid &= bids.encode(face, number) > previous_code
+        self.previous_face[bid] = face[bid]
+        self.previous_number[bid] = number[bid]
+        self.turn_seat[bid] = self.next_seat(self.turn_seat)[bid]
+
+        # Declarations, as resolved by GameStatus.handle_liar/handle_spot_on
+        declared = active & has_bid & ((play == LIAR) | (play == SPOT_ON))
+        count = self.dice_count(self.previous_face)
+        bid_lost = np.where(play == LIAR, self.previous_number > count,
+                            self.previous_number == count)
+        turn_seat = self.turn_seat.copy()
+        loser = np.where(bid_lost, self.previous_seat(turn_seat), turn_seat)
+        loser[~declared] = -1
+
+        # Remove the die, as done by GameStatus.remove_die
+        rows = np.flatnonzero(declared)
+        self.dice[rows, loser[rows]] -= 1
+        self.alive = self._dice_slots < self.dice[..., None]
+        eliminated = declared & (self.dice[np.arange(games), loser] == 0)
+
+        # Pass the turn and round back from eliminated players, as done by
+        # GameStatus.remove_player
+        previous = self.previous_seat(loser)
+        moved = eliminated & (turn_seat == loser)
+        self.turn_seat[moved] = previous[moved]
+        moved = eliminated & (self.round_seat == loser)
+        self.round_seat[moved] = previous[moved]
+
+        # Finish won games, and start a new round for the others
+        won = eliminated & ((self.dice > 0).sum(1) == 1)
+        self.done |= won
+        self.winner[won] = np.argmax(self.dice[won] > 0, 1)
+        new_round = declared & ~won
+        self.next_round(new_round)
+
+        return StepResult(bid | declared, loser, eliminated, new_round)
+
+    def play(self, policy):
+        """Play every game to completion.
+
+        Args:
+            policy: A function taking the BatchSimulator and returning the
+                (play, face, number) arrays to pass to step.
+
+        Returns:
+            An integer with the number of steps taken.
+        """
+        steps = 0
+        while not self.done.all():
+            self.step(*policy(self))
+            steps += 1
+        return steps
+
+
+def simple_bot_policy(simulator):
+    """Play every game using the strategy of SimpleBot.
+
+    See liars_dice/client/interface/simple_bot.py for details on the strategy.
+    """
+    random_state = simulator.random_state
+    games = len(simulator.done)
+    previous_face = simulator.previous_face.astype(np.int64)
+    previous_number = simulator.previous_number.astype(np.int64)
+    chance = random_state.random_sample(games)
+
+    # Replicates SimpleBot, which uses the previous number of dice here
+    expected = previous_number // 6 + 2
+    spot_on = (previous_number == expected) & (chance < 0.3)
+    liar = (((previous_number == expected + 1) & (chance < 0.6)) |
+            ((previous_number >= expected + 2) & (chance < 0.8)))
+
+    increase = ((previous_face == 6) |
+                (random_state.random_sample(games) < 0.3))
+    lowest = np.where(increase, previous_face, previous_face + 1)
+    face = lowest + (random_state.random_sample(games) *
+                     (7 - lowest)).astype(np.int64)
+    number = previous_number + increase
+
+    # There are no more dice to bid for
+    liar |= number > simulator.dice.sum(1)
+
+    # Opening bids
+    opening = previous_number == 0
+    face[opening] = random_state.randint(1, 7, np.count_nonzero(opening))
+    number[opening] = 1
+    spot_on &= ~opening
+    liar &= ~opening
+
+    play = np.where(spot_on, SPOT_ON, np.where(liar, LIAR, BID))
+    return play, face, number
+
+
+def run(games=10000, players=4):
+    """Play SimpleBot policies against each other and report the speed."""
+    simulator = BatchSimulator(games, players)
+    start = time.time()
+    steps = simulator.play(simple_bot_policy)
+    seconds = time.time() - start
+    print "Games: %d, steps: %d, seconds: %.2f" % (games, steps, seconds)
+    print "Games/s: %.0f" % (games / seconds)
+    for seat, wins in enumerate(np.bincount(simulator.winner, None,
+                                            players)):
+        print "player" + str(seat) + "\t" + str(wins)
+
+if __name__ == "__main__":
+    run()
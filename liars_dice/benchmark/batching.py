@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+"""
+
+Count the transport writes made by the server per round, with and without
+queuing each client's lines into a single write per reactor turn.
+
+"""
+from twisted.internet.task import Clock
+from twisted.test.proto_helpers import StringTransport
+from liars_dice.benchmark.tables import open_table, play_turn
+from liars_dice.server.game_server import LiarGameFactory, LiarsGame
+
+TABLE_SIZES = (2, 4, 8)
+GAMES = 50
+
+
+class CountingTransport(StringTransport):
+    """A StringTransport counting the writes made to it.
+
+    Every write or writeSequence call would be a separate send on a socket.
+    """
+
+    writes = 0
+
+    def write(self, data):
+        CountingTransport.writes += 1
+        StringTransport.write(self, data)
+
+    def writeSequence(self, data):
+        CountingTransport.writes += 1
+        StringTransport.writeSequence(self, data)
+
+
+class UnbatchedGame(LiarsGame):
+    """A LiarsGame writing every line to the transport as it is sent."""
+
+    def queue_data(self, data, command=None):
+        self.transport.write(data)
+
+
+class UnbatchedFactory(LiarGameFactory):
+    protocol = UnbatchedGame
+
+
+def benchmark(factory_class, players):
+    """Play GAMES games, counting the writes and rounds.
+
+    Returns:
+        A tuple composed of the number of writes and of bytes written per
+        round.
+    """
+    clock = Clock()
+    factory = factory_class(clock)
+    CountingTransport.writes = 0
+    rounds = 0
+    written = 0
+    for game in xrange(GAMES):
+        table = open_table(factory, str(game), players, CountingTransport)
+        transports = [client.transport for client in table.clients.values()]
+        clock.advance(0)
+        while True:
+            won = play_turn(table)
+            clock.advance(0)
+            if won or table.game.previous_bid is None:
+                rounds += 1
+            if won:
+                break
+        written += sum(len(transport.value()) for transport in transports)
+    return CountingTransport.writes / float(rounds), written / float(rounds)
+
+
+def run():
+    """Run the benchmark and print the results."""
+    print "Players\tServer\t\tWrites/round\tBytes/round"
+    for players in TABLE_SIZES:
+        for name, factory_class in (("unbatched", UnbatchedFactory),
+                                    ("batched", LiarGameFactory)):
+            writes, written = benchmark(factory_class, players)
+            print "%d\t%-10s\t%.1f\t\t%.0f" % (players, name, writes,
+                                                written)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+"""
+
+Measure how many bot decisions per second can be made with BidOdds.
+
+A decision scores the previous bid and every legal next bid, then either
+declares 'Liar!' or makes the most likely bid.
+
+"""
+import random
+import time
+from liars_dice.odds import BidOdds
+
+TOTAL_DICE = (10, 30, 100, 500)
+DECISIONS = 5000
+
+
+def decide(odds, hand, previous_bid, total_dice):
+    """Choose a play for a bot, from the probabilities of bids.
+
+    Returns:
+        "liar" or a (face, number) tuple with a bid.
+    """
+    if previous_bid is not None:
+        correct, _ = odds.bid(hand, previous_bid[0], previous_bid[1],
+                              total_dice)
+        if correct < 0.5:
+            return "liar"
+    best = max(odds.score_bids(hand, previous_bid, total_dice),
+               key=lambda score: score[2])
+    return best[:2]
+
+
+def decisions_per_second(odds, total_dice):
+    """Time decisions for random hands and previous bids.
+
+    Returns:
+        A floating point number with the decisions made per second.
+    """
+    situations = []
+    for _ in xrange(DECISIONS):
+        hand = [random.randint(1, 6) for _ in xrange(5)]
+        previous_bid = (random.randint(1, 6),
+                        random.randint(1, total_dice // 4))
+        situations.append((hand, previous_bid))
+
+    start = time.time()
+    for hand, previous_bid in situations:
+        decide(odds, hand, previous_bid, total_dice)
+    return DECISIONS / (time.time() - start)
+
+
+def run():
+    """Run the benchmark and print the results."""
+    odds = BidOdds()
+    print "Total dice\tDecisions/s"
+    for total_dice in TOTAL_DICE:
+        print "%d\t\t%.0f" % (total_dice,
+                              decisions_per_second(odds, total_dice))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+"""
+
+Measure the cost of checkpointing tables (see
+liars_dice/server/checkpoint.py): the time to save a table, the moves per
+second handled by the tables benchmark with and without checkpoints, and the
+time to restore a server's tables from a checkpoint file.
+
+"""
+import os
+import shutil
+import tempfile
+import time
+import timeit
+from twisted.internet.task import Clock
+from liars_dice.benchmark import tables
+from liars_dice.server.checkpoint import CheckpointFile
+from liars_dice.server.game_server import LiarGameFactory
+
+SAVES = 100000
+MOVE_TABLES = 1000
+RESTORE_TABLES = (1000, 10000)
+
+
+def benchmark_save(path):
+    """Returns: A float with the microseconds taken to save a table of
+    tables.PLAYERS players."""
+    clock = Clock()
+    factory = LiarGameFactory(clock)
+    table = tables.open_table(factory, "t")
+    table.number = 0
+    checkpoints = CheckpointFile(path)
+    seconds = timeit.timeit(lambda: checkpoints.save(table), number=SAVES)
+    checkpoints.close()
+    return seconds / SAVES * 1e6
+
+
+def benchmark_restore(path, table_count):
+    """Returns: A float with the seconds taken to restore table_count tables
+    of tables.PLAYERS players."""
+    clock = Clock()
+    factory = LiarGameFactory(clock, checkpoints=CheckpointFile(path))
+    for i in xrange(table_count):
+        tables.open_table(factory, "t" + str(i))
+    clock.advance(0)
+    factory.checkpoints.close()
+
+    start = time.time()
+    factory = LiarGameFactory(clock, checkpoints=CheckpointFile(path))
+    seconds = time.time() - start
+    assert len(factory.tables.detached_tables()) == table_count
+    factory.checkpoints.close()
+    return seconds
+
+
+def run():
+    """Run the benchmark and print the results."""
+    directory = tempfile.mkdtemp()
+    try:
+        print "Save: %.1fus per table" % benchmark_save(
+            os.path.join(directory, "save.ckpt"))
+
+        print "Checkpoints\tMoves/s"
+        _, moves, _, _ = tables.benchmark(MOVE_TABLES)
+        print "off\t\t%.0f" % moves
+        _, moves, _, _ = tables.benchmark(MOVE_TABLES, checkpoints=(
+            CheckpointFile(os.path.join(directory, "moves.ckpt"))))
+        print "on\t\t%.0f" % moves
+
+        print "Tables\tRestore\t\tFile size"
+        for table_count in RESTORE_TABLES:
+            path = os.path.join(directory, "restore-%d.ckpt" % table_count)
+            seconds = benchmark_restore(path, table_count)
+            print "%d\t%.3fs\t\t%.1fMB" % (
+                table_count, seconds, os.path.getsize(path) / 1048576.0)
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,58 @@
+"""
+
+Tables and messages shared by the benchmarks.
+
+"""
+from liars_dice import network_command
+
+
+def make_table(status_class, players, bid=None):
+    """Create a table which has started its first round.
+
+    Args:
+        status_class: GameStatus or a subclass of it.
+        players: An integer with the number of players at the table.
+        bid: A (face, number) tuple made by the first player, after which
+            the turn passes to the next player, or None to make no bid.
+
+    Returns:
+        A status_class object with the players added.
+    """
+    status = status_class()
+    for i in xrange(players):
+        status.add_player("player" + str(i))
+    status.next_round()
+    if bid is not None:
+        status.handle_bid(*bid)
+        status.next_turn()
+    return status
+
+
+def round_messages(usernames, bids, hand=None, chat=None):
+    """List the messages sent to a client over a round.
+
+    Args:
+        usernames: A list of strings with the players' usernames.
+        bids: An integer with the number of bids made in the round.
+        hand: A list of integers with the faces of the client's dice, or
+            None if the client is not sent a hand.
+        chat: A string chatted by each player after their bid, or None for
+            no chat.
+
+    Returns:
+        A list of (command, arguments) tuples.
+    """
+    messages = [(network_command.NEXT_ROUND, ()),
+                (network_command.PLAYER_STATUS,
+                 ([(username, 5) for username in usernames],))]
+    if hand is not None:
+        messages.append((network_command.PLAYER_HAND, (hand,)))
+    for i in xrange(bids):
+        username = usernames[i % len(usernames)]
+        messages += [(network_command.NEXT_TURN, (username,)),
+                     (network_command.BID, (i % 6 + 1, i // 6 + 1))]
+        if chat is not None:
+            messages.append((network_command.CHAT, (username, chat)))
+    messages += [(network_command.LIAR, ()),
+                 (network_command.PLAYER_LOST_DIE, (usernames[0],))]
+    return messages
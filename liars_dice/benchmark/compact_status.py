@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+"""
+
+Compare the memory use and round throughput of GameStatus and
+CompactGameStatus.
+
+"""
+from array import array
+import sys
+import timeit
+from liars_dice.benchmark.common import make_table
+from liars_dice.server.game import GameStatus, CompactGameStatus
+
+TABLE_SIZES = (2, 6, 20)
+ROUNDS = 20000
+
+
+def deep_sizeof(obj, seen=None):
+    """Estimate the memory used by an object and everything it references.
+
+    Args:
+        obj: The object to measure.
+        seen: A set of the ids of objects already measured, used to avoid
+            counting shared objects twice.
+
+    Returns:
+        An integer with the estimated size in bytes.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen)
+                    for k, v in obj.iteritems())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(x, seen) for x in obj)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, array):
+        size += deep_sizeof(obj.__dict__, seen)
+    return size
+
+
+def table_memory(status_class, players):
+    """Measure the memory used by a single table.
+
+    Usernames and the shared DiceSource are excluded, as they are not owned
+    by the table.
+
+    Returns:
+        An integer with the estimated size in bytes.
+    """
+    status = make_table(status_class, players)
+    seen = set(id(player) for player in status.players)
+    seen.add(id(status.dice))
+    return deep_sizeof(status, seen)
+
+
+def rounds_per_second(status_class, players, rounds=ROUNDS):
+    """Measure how many rounds a table can play per second.
+
+    Each round rolls the dice, reads the hands and status as the server does,
+    and resolves a liar declaration. The table is replaced once won.
+
+    Returns:
+        A floating point number with the rounds played per second.
+    """
+    state = {"status": make_table(status_class, players)}
+
+    def play_round():
+        status = state["status"]
+        status.next_round()
+        list(status.get_player_hands())
+        status.get_player_status()
+        status.previous_bid = None
+        status.handle_bid(1, 1)
+        status.next_turn()
+        status.handle_liar()
+        if status.get_winner() is not None:
+            state["status"] = make_table(status_class, players)
+
+    return rounds / timeit.timeit(play_round, number=rounds)
+
+
+def run():
+    """Run the benchmark and print the results."""
+    print "Players\tClass\t\t\tBytes/table\tRounds/s"
+    for players in TABLE_SIZES:
+        for status_class in (GameStatus, CompactGameStatus):
+            print "%d\t%-20s\t%d\t\t%.0f" % (
+                players, status_class.__name__,
+                table_memory(status_class, players),
+                rounds_per_second(status_class, players))
+
+if __name__ == "__main__":
+    run()
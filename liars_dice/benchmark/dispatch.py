@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+"""
+
+Measure the lines per second parsed and dispatched by the client and server
+protocols.
+
+The client's notifications do nothing, so the client benchmark times parsing
+and dispatch alone. The server benchmark sends lines from a seated player
+whose turn it is not, so every command is parsed and dispatched, and then
+rejected or relayed to the table.
+
+"""
+import timeit
+from twisted.internet.task import Clock
+from liars_dice import network_command
+from liars_dice.benchmark.fanout import NullTransport
+from liars_dice.benchmark.tables import connect
+from liars_dice.client.player import Player
+from liars_dice.server.game_server import LiarGameFactory
+
+REPEATS = 20000
+
+CLIENT_LINES = [
+    "next_round",
+    "player_status:alice=5,bob=4,carol=5,dave=3",
+    "hand:3,1,6,2,2",
+    "next_turn:alice",
+    "play",
+    "bid:4,3",
+    "bid:5,3",
+    "liar",
+    "player_lost_die:bob",
+    "chat:alice,good luck, everyone",
+]
+
+SERVER_LINES = [
+    "bid:4,3",
+    "liar",
+    "spot_on",
+    "start",
+    "chat:good luck, everyone",
+    "bid:5,3",
+]
+
+
+class SilentPlayer(Player):
+    """A Player ignoring every notification."""
+
+    def notification_username_request(self):
+        pass
+
+    def notification_play_request(self):
+        pass
+
+    def notification_can_start(self):
+        pass
+
+
+def benchmark_client():
+    """Returns: A float with the lines dispatched per second."""
+    player = SilentPlayer()
+    received = player.lineReceived
+    lines = CLIENT_LINES
+
+    def dispatch():
+        for line in lines:
+            received(line)
+
+    return REPEATS * len(lines) / timeit.timeit(dispatch, number=REPEATS)
+
+
+def benchmark_server():
+    """Returns: A float with the lines dispatched per second."""
+    clock = Clock()
+    factory = LiarGameFactory(clock)
+    players = [connect(factory, name, NullTransport)
+               for name in ("alice", "bob")]
+    players[0].lineReceived(network_command.START)
+    waiting = players[1 - players.index(
+        players[0].table.clients[players[0].table.game.turn_player()])]
+    received = waiting.lineReceived
+    lines = SERVER_LINES
+
+    def dispatch():
+        for line in lines:
+            received(line)
+        clock.advance(0)
+
+    return REPEATS * len(lines) / timeit.timeit(dispatch, number=REPEATS)
+
+
+def run():
+    """Run the benchmark and print the results."""
+    client = benchmark_client()
+    server = benchmark_server()
+    print "Side\tLines/s"
+    print "client\t%.0f" % client
+    print "server\t%.0f" % server
+
+if __name__ == "__main__":
+    run()
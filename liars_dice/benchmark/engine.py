@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+"""
+
+Micro-benchmarks of the hot paths of GameStatus and CompactGameStatus, with
+results saved as JSON and compared against a stored baseline.
+
+Each benchmark times a single method call on a table part way through a round,
+at several table sizes. Methods which change the players or the previous bid
+are called once on each of a batch of clones of the table, so every call sees
+the same state.
+
+As timings depend on the machine, the baseline should be recreated (with
+save_baseline) on the machine used for comparisons.
+
+"""
+import gc
+import json
+import os.path
+import platform
+import sys
+import time
+from liars_dice.benchmark.common import make_table
+from liars_dice.server.game import GameStatus, CompactGameStatus
+
+TABLE_SIZES = (2, 6, 20, 100)
+BATCH_SIZE = 500  # calls per timing
+REPEATS = 5  # timings per benchmark, of which the fastest is kept
+
+# Slowdown relative to the baseline above which a result is a regression
+DEFAULT_TOLERANCE = 0.5
+
+BASELINE_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+                             "baseline.json")
+
+# Method calls to time, by name, and whether they must be made on clones
+OPERATIONS = (
+    ("add_player", lambda status: status.add_player("new player"), True),
+    ("roll_all", lambda status: status.roll_all(), False),
+    ("handle_bid", lambda status: status.handle_bid(4, 2), True),
+    ("handle_liar", lambda status: status.handle_liar(), True),
+    ("handle_spot_on", lambda status: status.handle_spot_on(), True),
+    ("remove_die", lambda status: status.remove_die(status.turn_player()),
+     True),
+    ("remove_player", lambda status: status.remove_player("player1"), True),
+    ("get_player_status", lambda status: status.get_player_status(), False),
+    ("get_player_hands", lambda status: list(status.get_player_hands()),
+     False),
+)
+
+
+def time_operation(operation, status, on_clones):
+    """Time an operation.
+
+    Args:
+        operation: A function taking a game to call the method on.
+        status: The game to call the method on.
+        on_clones: A Boolean indicating whether to call the method on clones
+            of the game, rather than the game itself.
+
+    Returns:
+        A floating point number with the fastest time per call, in
+        microseconds.
+    """
+    best = None
+    for _ in xrange(REPEATS):
+        if on_clones:
+            clones = [status.clone() for _ in xrange(BATCH_SIZE)]
+        else:
+            clones = [status] * BATCH_SIZE
+        gc.disable()
+        start = time.time()
+        for clone in clones:
+            operation(clone)
+        elapsed = time.time() - start
+        gc.enable()
+        if best is None or elapsed < best:
+            best = elapsed
+    return best / BATCH_SIZE * 1e6
+
+
+def benchmark():
+    """Run every benchmark.
+
+    Returns:
+        A dictionary of benchmark names to microseconds per call. Names are
+        of the form "<class>.<method>/<players>".
+    """
+    results = {}
+    for status_class in (GameStatus, CompactGameStatus):
+        for players in TABLE_SIZES:
+            status = make_table(status_class, players, (3, 2))
+            for name, operation, on_clones in OPERATIONS:
+                key = "%s.%s/%d" % (status_class.__name__, name, players)
+                results[key] = time_operation(operation, status, on_clones)
+    return results
+
+
+def save(results, path):
+    """Save benchmark results as JSON.
+
+    Args:
+        results: A dictionary of benchmark names to microseconds per call.
+        path: A string with the location of the file to write.
+    """
+    with open(path, "w") as results_file:
+        json.dump({"python": platform.python_version(),
+                   "machine": platform.machine(),
+                   "results": results},
+                  results_file, indent=2, separators=(",", ": "),
+                  sort_keys=True)
+
+
+def load(path):
+    """Load benchmark results saved by save.
+
+    Returns:
+        A dictionary of benchmark names to microseconds per call.
+    """
+    with open(path) as results_file:
+        return json.load(results_file)["results"]
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Find the benchmarks which have slowed down relative to a baseline.
+
+    Args:
+        results: A dictionary of benchmark names to microseconds per call.
+        baseline: A dictionary of benchmark names to microseconds per call.
+        tolerance: A floating point number with the allowed slowdown, as a
+            fraction of the baseline.
+
+    Returns:
+        A list of (name, baseline, result) tuples for each regression, sorted
+        by name. Benchmarks missing from the baseline are ignored.
+    """
+    return [(name, baseline[name], results[name])
+            for name in sorted(results)
+            if name in baseline and
+            results[name] > baseline[name] * (1 + tolerance)]
+
+
+def save_baseline(path=BASELINE_PATH):
+    """Run the benchmarks and store the results as the baseline."""
+    save(benchmark(), path)
+
+
+def run(results_path=None, baseline_path=BASELINE_PATH,
+        tolerance=DEFAULT_TOLERANCE):
+    """Run the benchmarks, print them and compare them against the baseline.
+
+    Args:
+        results_path: A string with the location to save the results as JSON,
+            or None to not save them.
+        baseline_path: A string with the location of the baseline, or None to
+            not compare the results.
+        tolerance: A floating point number with the allowed slowdown, as a
+            fraction of the baseline.
+
+    Returns:
+        A list of regressions, as given by compare.
+    """
+    results = benchmark()
+    if results_path is not None:
+        save(results, results_path)
+    baseline = load(baseline_path) if baseline_path is not None else {}
+
+    print "Benchmark\t\t\t\tus/call\tBaseline"
+    for name in sorted(results):
+        print "%-40s%.2f\t%s" % (name, results[name],
+                                 "%.2f" % baseline[name]
+                                 if name in baseline else "-")
+
+    regressions = compare(results, baseline, tolerance)
+    for name, expected, result in regressions:
+        print "Regression: %s took %.2fus, against %.2fus" % (
+            name, result, expected)
+    return regressions
+
+if __name__ == "__main__":
+    sys.exit(1 if run() else 0)
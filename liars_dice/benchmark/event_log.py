@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+"""
+
+Measure the size of game event logs, and how quickly they are decoded and
+replayed.
+
+"""
+import random
+import time
+from StringIO import StringIO
+from liars_dice import network_command
+from liars_dice.server import event_log
+from liars_dice.server.game import GameStatus, CompactGameStatus
+from liars_dice.sim import PlayerView, simple_bot_policy
+
+TABLE_SIZES = (4, 20)
+GAMES = 200
+
+
+def record_game(players):
+    """Play a game between Simple Bots, logging it as the server would.
+
+    Args:
+        players: An integer with the number of players at the table.
+
+    Returns:
+        A string with the contents of the game's log.
+    """
+    log_file = StringIO()
+    log = event_log.EventLog(log_file)
+    status = GameStatus()
+    for i in xrange(players):
+        status.add_player("player" + str(i))
+        log.join("player" + str(i))
+
+    while True:
+        status.next_round()
+        status.previous_bid = None
+        log.new_round(status)
+        hands = dict(status.get_player_hands())
+        player_status = status.get_player_status()
+        total_dice = sum(n for _, n in player_status)
+
+        while True:
+            player = status.turn_player()
+            play = simple_bot_policy(PlayerView(
+                player, hands[player], status.previous_bid, player_status,
+                total_dice, random))
+            if play == network_command.LIAR:
+                loser, eliminated = status.handle_liar()
+                log.liar(player)
+            elif play == network_command.SPOT_ON:
+                loser, eliminated = status.handle_spot_on()
+                log.spot_on(player)
+            else:
+                status.handle_bid(*play)
+                log.bid(player, *play)
+                status.next_turn()
+                continue
+
+            log.die_lost(loser)
+            if eliminated:
+                log.eliminated(loser)
+                winner = status.get_winner()
+                if winner is not None:
+                    status.stop()
+                    log.winner(winner)
+                    return log_file.getvalue()
+            break
+
+
+def benchmark(players):
+    """Record games, then time decoding and replaying their logs.
+
+    Returns:
+        A tuple composed of the mean bytes per game, the mean events per game,
+        and a list of (operation name, events per second) tuples.
+    """
+    logs = [record_game(players) for _ in xrange(GAMES)]
+    events = sum(len(list(event_log.read_events(log))) for log in logs)
+    operations = [
+        ("decode", lambda log: list(event_log.read_events(log))),
+        ("replay", event_log.replay),
+        ("replay compact",
+         lambda log: event_log.replay(log, CompactGameStatus)),
+    ]
+    rates = []
+    for name, operation in operations:
+        start = time.time()
+        for log in logs:
+            operation(log)
+        rates.append((name, events / (time.time() - start)))
+    return (sum(len(log) for log in logs) / float(GAMES),
+            events / float(GAMES), rates)
+
+
+def run():
+    """Run the benchmark and print the results."""
+    print "Players\tBytes/game\tEvents/game\tOperation\tEvents/s"
+    for players in TABLE_SIZES:
+        size, events, rates = benchmark(players)
+        for operation, rate in rates:
+            print "%d\t%.0f\t\t%.0f\t\t%-15s\t%.0f" % (
+                players, size, events, operation, rate)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+"""
+
+Measure the cost of sending a message to every client at a table, as the
+number of spectators grows, with and without framing the message once.
+
+"""
+import time
+from twisted.internet.task import Clock
+from liars_dice import network_command
+from liars_dice.benchmark.tables import connect
+from liars_dice.server.game_server import LiarGameFactory
+from liars_dice.server.session import Message
+
+RECIPIENTS = (10, 100, 1000, 10000)
+MESSAGES = 200000  # Divided between the recipients
+STATUS = [("player" + str(i), 5) for i in xrange(8)]
+MESSAGE = network_command.PLAYER_STATUS + network_command.DELIMITER + ",".join(
+    username + "=" + str(dice) for username, dice in STATUS)
+
+
+class NullTransport:
+    """A transport discarding everything written to it."""
+
+    disconnecting = False
+
+    def write(self, data):
+        pass
+
+    def writeSequence(self, data):
+        pass
+
+    def loseConnection(self):
+        self.disconnecting = True
+
+    def registerProducer(self, producer, streaming):
+        pass
+
+
+def make_table(recipients):
+    """Create a table of two players watched by spectators.
+
+    Returns:
+        A tuple composed of the Clock flushing the clients, the Table and a
+        list of the protocols of every client at the table.
+    """
+    clock = Clock()
+    factory = LiarGameFactory(clock)
+    players = [connect(factory, "player" + str(i), NullTransport)
+               for i in xrange(2)]
+    spectators = []
+    for _ in xrange(recipients - len(players)):
+        spectator = factory.buildProtocol(None)
+        spectator.makeConnection(NullTransport())
+        spectator.lineReceived(network_command.SPECTATE +
+                               network_command.DELIMITER + "0")
+        spectators.append(spectator)
+    clock.advance(0)
+    return clock, players[0].table, players + spectators
+
+
+def benchmark(recipients):
+    """Time sending messages to every client, including flushing them.
+
+    Returns:
+        A list of (method name, nanoseconds per recipient) tuples.
+    """
+    clock, table, clients = make_table(recipients)
+    messages = max(MESSAGES // recipients, 1)
+
+    def send_lines():
+        for client in clients:
+            client.sendLine(MESSAGE)
+
+    def broadcast():
+        table.broadcast(Message(network_command.PLAYER_STATUS, STATUS))
+
+    results = []
+    for name, send in (("sendLine", send_lines), ("broadcast", broadcast)):
+        start = time.time()
+        for _ in xrange(messages):
+            send()
+            clock.advance(0)
+        results.append(
+            (name, (time.time() - start) / messages / recipients * 1e9))
+    return results
+
+
+def run():
+    """Run the benchmark and print the results."""
+    print "Recipients\tMethod\t\tns/recipient"
+    for recipients in RECIPIENTS:
+        for method, nanoseconds in benchmark(recipients):
+            print "%d\t\t%-10s\t%.0f" % (recipients, method, nanoseconds)
+
+if __name__ == "__main__":
+    run()
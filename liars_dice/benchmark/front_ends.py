@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+"""
+
+Compare the Twisted and asyncore front ends of the server under the same
+load.
+
+For each number of connections, each front end serves a new server in its
+own process, on a free port of the local machine, while the bots of the
+swarm benchmark play on it.
+
+"""
+import resource
+import socket
+import subprocess
+import sys
+import time
+from liars_dice.benchmark import swarm
+
+FRONT_ENDS = ("twisted", "asyncore")
+CONNECTIONS = (200, 1000)
+SECONDS = 15.0
+HOST = "127.0.0.1"
+BACKLOG = 1024
+START_TIMEOUT = 10.0  # Seconds to wait for a server to listen
+
+
+def serve(front_end, port):
+    """Serve the game on a port of the local machine, until killed.
+
+    Args:
+        front_end: "twisted" or "asyncore".
+        port: An integer with the port.
+    """
+    # Every client needs a file descriptor
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    if front_end == "twisted":
+        from twisted.internet import reactor
+        from liars_dice.server.game_server import LiarGameFactory
+        reactor.listenTCP(port, LiarGameFactory(), BACKLOG, HOST)
+        reactor.run()
+    else:
+        from liars_dice.server.asyncore_server import (AsyncoreServer,
+                                                       EventLoop)
+        loop = EventLoop()
+        AsyncoreServer(loop).listen(port, HOST, BACKLOG)
+        loop.run()
+
+
+def free_port():
+    """Returns: An integer with a port of the local machine nothing is
+    listening on."""
+    probe = socket.socket()
+    probe.bind((HOST, 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+
+def start_server(front_end):
+    """Serve the game in a new process, once it is listening.
+
+    Args:
+        front_end: "twisted" or "asyncore".
+
+    Returns:
+        A tuple composed of the server's subprocess.Popen and its port.
+
+    Raises:
+        RuntimeError: The server did not listen in time.
+    """
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-c", "from liars_dice.benchmark import front_ends; "
+         "front_ends.serve(%r, %d)" % (front_end, port)])
+    deadline = time.time() + START_TIMEOUT
+    while time.time() < deadline:
+        try:
+            socket.create_connection((HOST, port)).close()
+            return server, port
+        except socket.error:
+            time.sleep(0.05)
+    server.kill()
+    raise RuntimeError("the %s server did not start" % front_end)
+
+
+def run(connections=CONNECTIONS, seconds=SECONDS, processes=1):
+    """Run the benchmark and print the results.
+
+    Args:
+        connections: A tuple of the numbers of bots to load servers with.
+        seconds: A float with the seconds to measure each server for.
+        processes: An integer with the number of processes connecting bots.
+    """
+    print "Connections\tFront end\tActions/s\tRounds/s\tGames/s\t" + \
+        "\t".join("p%g ms" % (fraction * 100)
+                  for fraction in swarm.PERCENTILES)
+    for count in connections:
+        for front_end in FRONT_ENDS:
+            server, port = start_server(front_end)
+            try:
+                result = swarm.load(count, processes, seconds, host=HOST,
+                                    port=port)
+            finally:
+                server.kill()
+                server.wait()
+            print "%d\t\t%-8s\t%.0f\t\t%.1f\t\t%.2f\t%s" % (
+                count, front_end, result["actions"], result["rounds"],
+                result["games"],
+                "\t".join("%.2f" % (value * 1000)
+                          for value in result["percentiles"]))
+
+if __name__ == "__main__":
+    run()
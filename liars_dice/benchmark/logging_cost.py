@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+"""
+
+Measure the cost of logging on the server's reactor thread.
+
+Compares a call to twisted.python.log.msg, formatting its message and writing
+it to a file as the server used to, with calls to the structured log (see
+liars_dice/server/server_log.py) when disabled, when the event is below the
+log's level, and when it is queued for the writer thread. Then compares the
+moves per second handled by the tables benchmark with logging disabled and
+at DEBUG level.
+
+"""
+import os
+import timeit
+from twisted.python import log
+from liars_dice.benchmark import tables
+from liars_dice.server import server_log
+from liars_dice.server.server_log import LogWriter, ServerLog
+
+REPEATS = 100000
+TABLE_COUNT = 1000
+
+
+def time_call(function):
+    """Return the microseconds taken per call of function."""
+    return min(timeit.repeat(function, number=REPEATS, repeat=3)) * \
+        1e6 / REPEATS
+
+
+def benchmark_calls(log_file):
+    """Time a single logged bid by each method.
+
+    Returns:
+        A list of (description, microseconds per call) tuples.
+    """
+    face, number = 4, 3
+    player = "alice"
+    results = []
+
+    observer = log.FileLogObserver(log_file)
+    log.addObserver(observer.emit)
+    try:
+        results.append(("twisted log.msg", time_call(
+            lambda: log.msg("Turn player made the prediction: " +
+                            str(face) + "," + str(number)))))
+    finally:
+        log.removeObserver(observer.emit)
+
+    disabled = ServerLog().for_table(0)
+    results.append(("disabled", time_call(
+        lambda: disabled.debug("bid", player=player, face=face,
+                               number=number))))
+
+    writer = LogWriter(log_file, max_queued=REPEATS * 4)
+    below = ServerLog(writer, server_log.INFO).for_table(0)
+    results.append(("below level", time_call(
+        lambda: below.debug("bid", player=player, face=face,
+                            number=number))))
+    queued = ServerLog(writer, server_log.DEBUG).for_table(0)
+    results.append(("queued", time_call(
+        lambda: queued.debug("bid", player=player, face=face,
+                             number=number))))
+    writer.close()
+    return results
+
+
+def run():
+    """Run the benchmark and print the results."""
+    log_file = open(os.devnull, "w")
+    print "Logging a bid\t\tus per call"
+    for description, micros in benchmark_calls(log_file):
+        print "%-16s\t%.3f" % (description, micros)
+
+    print "\nLog level\tMoves/s (%d tables)" % TABLE_COUNT
+    for name in ("disabled", "info", "debug"):
+        writer = LogWriter(open(os.devnull, "w"), max_queued=10 ** 7)
+        _, move_rate, _, _ = tables.benchmark(
+            TABLE_COUNT, ServerLog(writer, server_log.LEVELS[name]))
+        writer.close()
+        print "%s\t\t%.0f" % (name, move_rate)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+
+"""
+
+Measure the lines per second dispatched by the server while the sampling
+profiler (see liars_dice/server/profiler.py) profiles it, at several sampling
+intervals.
+
+"""
+import os
+import tempfile
+from liars_dice.benchmark.dispatch import benchmark_server
+from liars_dice.server.profiler import SamplingProfiler
+
+INTERVALS = (None, 0.01, 0.005, 0.001)  # None for no profiler
+SECONDS = 60.0  # Longer than the benchmark, which stops the profiler early
+
+
+def run():
+    """Run the benchmark and print the results."""
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "profile.collapsed")
+    print "Interval\tLines/s\t\tSamples"
+    for interval in INTERVALS:
+        if interval is None:
+            print "none\t\t%.0f" % benchmark_server()
+            continue
+        profiler = SamplingProfiler(interval)
+        profiler.start(SECONDS, path)
+        rate = benchmark_server()
+        profiler.stop()
+        profiler.wait()
+        with open(path) as collapsed:
+            samples = sum(int(line.rsplit(" ", 1)[1]) for line in collapsed)
+        print "%gms\t\t%.0f\t\t%d" % (interval * 1000, rate, samples)
+    os.remove(path)
+    os.rmdir(directory)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+"""
+
+Measure turn order operations on tables with large numbers of players.
+
+Each operation should take about the same time regardless of the number of
+players, as GameStatus keeps its players in a SeatRing.
+
+"""
+import random
+import time
+from liars_dice.benchmark.common import make_table
+from liars_dice.server.game import GameStatus, CompactGameStatus
+
+TABLE_SIZES = (1000, 10000)
+OPERATIONS = 20000
+
+
+def time_per_operation(operation, count):
+    """Time an operation.
+
+    Args:
+        operation: A function taking no arguments.
+        count: An integer with the number of times to call operation.
+
+    Returns:
+        A floating point number with the mean time per call in microseconds.
+    """
+    start = time.time()
+    for _ in xrange(count):
+        operation()
+    return (time.time() - start) / count * 1e6
+
+
+def benchmark(status_class, players):
+    """Measure each turn order operation on a table.
+
+    Returns:
+        A list of (operation name, microseconds per operation) tuples.
+    """
+    status = make_table(status_class, players)
+    results = [
+        ("next_turn", time_per_operation(status.next_turn, OPERATIONS)),
+        ("turn_player", time_per_operation(status.turn_player, OPERATIONS)),
+        ("turn_player_previous",
+         time_per_operation(status.turn_player_previous, OPERATIONS)),
+    ]
+
+    # Round start rotation, without rolling the dice
+    status.roll_all = lambda: None
+    results.append(("next_round",
+                     time_per_operation(status.next_round, OPERATIONS)))
+
+    # Disconnects of players anywhere at the table, alternating with
+    # disconnects of the turn player
+    order = list(status.seats)
+    random.shuffle(order)
+    disconnects = []
+
+    def disconnect():
+        disconnects.append(None)
+        if len(disconnects) % 2:
+            player = status.turn_player()
+        else:
+            player = order.pop()
+            while player not in status.players:
+                player = order.pop()
+        status.remove_player(player)
+    results.append(("remove_player",
+                     time_per_operation(disconnect, players // 2)))
+
+    # Eliminations of the turn player
+    status = make_table(status_class, players)
+
+    def eliminate():
+        player = status.turn_player()
+        while not status.remove_die(player):
+            pass
+        status.next_turn()
+    results.append(("elimination",
+                     time_per_operation(eliminate, players // 2)))
+    return results
+
+
+def run():
+    """Run the benchmark and print the results."""
+    print "Players\tClass\t\t\tOperation\t\tus/op"
+    for players in TABLE_SIZES:
+        for status_class in (GameStatus, CompactGameStatus):
+            for operation, microseconds in benchmark(status_class, players):
+                print "%d\t%-20s\t%-20s\t%.2f" % (
+                    players, status_class.__name__, operation, microseconds)
+
+if __name__ == "__main__":
+    run()
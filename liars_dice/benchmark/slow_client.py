@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+"""
+
+Measure the data buffered by the server for clients which stop reading.
+
+A player and a spectator at a table of four players stall, so nothing
+written to them is sent, while every round of play and chat is broadcast to
+the table. Without backpressure, the server buffers every message for them.
+With it (see liars_dice/server/backpressure.py), the clients are paused at
+the high-water mark and the messages held for them are reduced by the
+policy, until they are disconnected.
+
+"""
+import time
+from twisted.internet.task import Clock
+from liars_dice import network_command
+from liars_dice.benchmark.common import round_messages
+from liars_dice.benchmark.fanout import NullTransport
+from liars_dice.benchmark.tables import connect
+from liars_dice.server.backpressure import SlowClientPolicy
+from liars_dice.server.game_server import LiarGameFactory
+from liars_dice.server.session import Message
+
+ROUNDS = 20000
+BIDS = 8  # Per round
+
+POLICIES = (
+    ("unbounded", SlowClientPolicy(high_water=2 ** 62, timeout=0,
+                                   drop_chat=False, collapse_status=False)),
+    ("hold all", SlowClientPolicy(max_held_bytes=2 ** 62, timeout=0,
+                                  drop_chat=False, collapse_status=False)),
+    ("drop/collapse", SlowClientPolicy(max_held_bytes=2 ** 62, timeout=0)),
+    ("default", SlowClientPolicy(timeout=0)),
+)
+
+
+class StalledTransport(NullTransport):
+    """A transport buffering everything written to it, as a TCP connection
+    to a client which has stopped reading would."""
+
+    bufferSize = 65536
+
+    def __init__(self):
+        self.buffered = 0
+        self.producer = None
+
+    def registerProducer(self, producer, streaming):
+        self.producer = producer
+
+    def write(self, data):
+        if self.disconnecting:
+            return
+        self.buffered += len(data)
+        if self.buffered > self.bufferSize:
+            self.producer.pauseProducing()
+
+    def writeSequence(self, data):
+        self.write("".join(data))
+
+    def abortConnection(self):
+        self.disconnecting = True
+
+
+def benchmark(policy):
+    """Broadcast ROUNDS rounds to a table with a stalled player and
+    spectator.
+
+    Args:
+        policy: The SlowClientPolicy of the server.
+
+    Returns:
+        A tuple composed of the rounds broadcast per second, then for the
+        stalled player and the stalled spectator, the bytes buffered by their
+        transport, the bytes held for them by the server, and whether they
+        were disconnected.
+    """
+    clock = Clock()
+    factory = LiarGameFactory(clock)
+    factory.slow_clients = policy
+    stalled = connect(factory, "stalled", StalledTransport)
+    for i in xrange(3):
+        connect(factory, "p" + str(i), NullTransport)
+    spectator = factory.buildProtocol(None)
+    spectator.makeConnection(StalledTransport())
+    spectator.lineReceived(network_command.SPECTATE)
+    table = stalled.table
+    messages = [Message(command, *arguments) for command, arguments in
+                round_messages(sorted(table.clients), BIDS,
+                               chat="I have the sixes, I promise")]
+
+    start = time.time()
+    for _ in xrange(ROUNDS):
+        for message in messages:
+            table.broadcast(message)
+        clock.advance(0)
+    round_rate = ROUNDS / (time.time() - start)
+    return (round_rate,) + tuple(
+        (client.transport.buffered, client._outbound.held_bytes,
+         client.transport.disconnecting)
+        for client in (stalled, spectator))
+
+
+def run():
+    """Run the benchmark and print the results.
+
+    The bytes buffered for each stalled client are the sum of those in its
+    transport and those held by the server, marked with * if the client was
+    disconnected.
+    """
+    print "Policy\t\tRounds/s\tPlayer bytes\tSpectator bytes"
+    for name, policy in POLICIES:
+        result = benchmark(policy)
+        columns = ["%d%s" % (buffered + held, "*" if disconnected else "")
+                   for buffered, held, disconnected in result[1:]]
+        print "%-13s\t%.0f\t\t%-12s\t%s" % ((name, result[0]) +
+                                            tuple(columns))
+
+if __name__ == "__main__":
+    run()
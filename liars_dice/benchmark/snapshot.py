@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+"""
+
+Measure the cost of copying a game with clone, snapshot and restore, against
+copy.deepcopy.
+
+"""
+import copy
+import timeit
+from liars_dice.benchmark.common import make_table
+from liars_dice.server.game import GameStatus, CompactGameStatus
+
+TABLE_SIZES = (4, 20)
+REPEATS = 5000
+
+
+def benchmark(status_class, players):
+    """Measure each way of copying a table.
+
+    Returns:
+        A list of (operation name, microseconds per operation) tuples.
+    """
+    status = make_table(status_class, players, (3, 2))
+    snapshot = status.snapshot()
+    operations = [
+        ("clone", status.clone),
+        ("snapshot", status.snapshot),
+        ("restore", lambda: status.restore(snapshot)),
+        # The DiceSource is shared, as it is by clone
+        ("deepcopy", lambda: copy.deepcopy(status, {id(status.dice):
+                                                    status.dice})),
+    ]
+    return [(name, timeit.timeit(operation, number=REPEATS) / REPEATS * 1e6)
+            for name, operation in operations]
+
+
+def run():
+    """Run the benchmark and print the results."""
+    print "Players\tClass\t\t\tOperation\tus/op"
+    for players in TABLE_SIZES:
+        for status_class in (GameStatus, CompactGameStatus):
+            for operation, microseconds in benchmark(status_class, players):
+                print "%d\t%-20s\t%-10s\t%.2f" % (
+                    players, status_class.__name__, operation, microseconds)
+
+if __name__ == "__main__":
+    run()
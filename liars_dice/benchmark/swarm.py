@@ -0,0 +1,422 @@
+#!/usr/bin/env python
+
+"""
+
+Load test a running server with a swarm of bots.
+
+Thousands of bots connect to the server from one process, or from several,
+each playing the Simple Bot's strategy. As the server seats every player at
+the open table until its game starts, bots join a table at a time: once a
+table's worth of bots has joined, the first of them starts the game, and
+only then do the next bots send their usernames. Swarms in several
+processes may still seat a few more bots at a table. Servers with
+matchmaking form tables themselves, so bots join them as soon as they
+connect. Whenever a game is won
+its bots reconnect to play the next one, so the number of connections stays
+constant. Each bot times its actions from the PLAY it answers to the next
+NEXT_TURN or PLAY it receives, which includes the time the swarm itself
+takes to read the reply, so a swarm should be given enough processes to
+stay idle.
+
+Bots only connect to servers on the local machine.
+
+"""
+import collections
+import json
+import math
+import resource
+import socket
+import subprocess
+import sys
+import time
+from twisted.internet import reactor
+from liars_dice import config_parse
+from liars_dice.client.interface.simple_bot import SimpleBot
+from liars_dice.client.player import PlayerFactory
+
+CONNECTIONS = 1000
+TABLE_SIZE = 4
+SECONDS = 30.0
+CONNECT_BATCH = 100  # Connections made per CONNECT_INTERVAL while ramping up
+CONNECT_INTERVAL = 0.1
+JOIN_TIMEOUT = 1.0  # Seconds before the next bots join if a game has not
+                    # started
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+class SwarmBot(SimpleBot):
+    """A Simple Bot which starts its table's game, and times its actions.
+
+    Args:
+        swarm: The Swarm the bot belongs to.
+        username: A string with the bot's username.
+    """
+
+    def __init__(self, swarm, username):
+        SimpleBot.__init__(self)
+        self.desired_username = username
+        self.use_binary_protocol = swarm.binary
+        self._swarm = swarm
+
+        # Whether the swarm has let the bot join a table, whether it may
+        # start the game, and the players at its table
+        self._admitted = False
+        self._can_start = False
+        self._players = 0
+
+        # When the bot answered PLAY, until the server replies
+        self._played = None
+
+        # Whether a round has started, but its first turn not been announced
+        self._new_round = False
+
+    def notification_username_request(self):
+        if self._admitted:
+            SimpleBot.notification_username_request(self)
+        else:
+            self._swarm.queue(self)
+
+    def join(self):
+        """Send the bot's username, once the swarm lets it join a table."""
+        self._admitted = True
+        SimpleBot.notification_username_request(self)
+
+    def notification_can_start(self):
+        self._can_start = True
+        self._start_if_full()
+
+    def notification_player_status(self, player_data):
+        SimpleBot.notification_player_status(self, player_data)
+        self._players = len(player_data)
+        self._start_if_full()
+
+    def notification_play_request(self):
+        self._answered()
+        self._played = time.time()
+        SimpleBot.notification_play_request(self)
+
+    def notification_new_round(self):
+        SimpleBot.notification_new_round(self)
+        self._new_round = True
+
+    def notification_next_turn(self, player):
+        self._answered()
+
+        # Each round is counted by the player starting it
+        if self._new_round and player == self.username:
+            self._swarm.rounds += 1
+        self._new_round = False
+
+    def notification_winner(self, player):
+        self._played = None
+        if player == self.username:
+            self._swarm.games += 1
+
+    def _start_if_full(self):
+        # Start the game once the table has as many players as the swarm
+        # seats at each.
+
+        if self._can_start and self._players >= self._swarm.table_size:
+            self._can_start = False
+            self.send_start()
+            self._swarm.started(self)
+
+    def _answered(self):
+        # Record the time taken by the server to reply to the bot's action.
+
+        if self._played is not None:
+            self._swarm.latencies.append(time.time() - self._played)
+            self._played = None
+
+
+class SwarmFactory(PlayerFactory):
+    """Connect a bot, and reconnect a new one whenever it is disconnected.
+
+    Args:
+        swarm: The Swarm the bots belong to.
+        username: A string with the username of the bots.
+    """
+
+    def __init__(self, swarm, username):
+        PlayerFactory.__init__(self, None)
+        self._swarm = swarm
+        self._username = username
+
+    def startedConnecting(self, connector):
+        pass
+
+    def buildProtocol(self, addr):
+        bot = SwarmBot(self._swarm, self._username)
+        bot.factory = self
+        return bot
+
+    def clientConnectionLost(self, connector, reason):
+        if self._swarm.running:
+            reactor.callLater(0, connector.connect)
+
+    def clientConnectionFailed(self, connector, reason):
+        self._swarm.failed += 1
+
+
+class Swarm:
+    """A number of bots playing on a server.
+
+    Args:
+        host: A string with the host of the server, which must be the local
+            machine.
+        port: An integer with the port of the server.
+        connections: An integer with the number of bots.
+        table_size: An integer with the players bots wait for before
+            starting a game.
+        binary: A Boolean indicating whether bots use the binary protocol.
+        matched: A Boolean indicating whether the server seats players by
+            matchmaking, so bots join as soon as they connect.
+        name: A string distinguishing the usernames of the swarm's bots from
+            those of other swarms.
+
+    Attributes:
+        latencies: A list of the seconds taken by the server to reply to
+            each action.
+        rounds: An integer with the number of rounds started.
+        games: An integer with the number of games won.
+        failed: An integer with the number of connections which failed.
+        running: A Boolean indicating whether bots reconnect once
+            disconnected.
+
+    Raises:
+        ValueError: The host is not the local machine.
+    """
+
+    def __init__(self, host, port, connections, table_size, binary=True,
+                 matched=False, name="swarm"):
+        if not socket.gethostbyname(host).startswith("127."):
+            raise ValueError("bots only connect to the local machine, not " +
+                             host)
+        self.host = str(host)
+        self.port = port
+        self.connections = connections
+        self.table_size = table_size
+        self.binary = binary
+        self.matched = matched
+        self.name = str(name)
+        self.latencies = []
+        self.rounds = 0
+        self.games = 0
+        self.failed = 0
+        self.running = False
+
+        # Bots waiting to join a table, and the bots which last joined one
+        self._waiting = collections.deque()
+        self._joining = set()
+
+    def start(self, connected):
+        """Connect the bots, a batch at a time.
+
+        Args:
+            connected: A function called once every bot has connected.
+        """
+        self.running = True
+        self._connect(0, connected)
+
+    def queue(self, bot):
+        """Let a bot join a table once the bots joining before it have
+        started their game.
+
+        Args:
+            bot: A connected SwarmBot.
+        """
+        if self.matched:
+            bot.join()
+            return
+        self._waiting.append(bot)
+        if not self._joining:
+            self._join()
+
+    def started(self, bot):
+        """Let the next bots join a table, if a bot which last joined one
+        has started its game.
+
+        Args:
+            bot: A SwarmBot which has sent START.
+        """
+        if bot in self._joining:
+            self._join()
+
+    def reset(self):
+        """Discard the measurements made so far."""
+        self.latencies = []
+        self.rounds = 0
+        self.games = 0
+
+    def _connect(self, first, connected):
+        # Connect a batch of bots, then schedule the next batch.
+
+        last = min(first + CONNECT_BATCH, self.connections)
+        for i in xrange(first, last):
+            reactor.connectTCP(self.host, self.port, SwarmFactory(
+                self, "%s-%d" % (self.name, i)))
+        if last < self.connections:
+            reactor.callLater(CONNECT_INTERVAL, self._connect, last,
+                              connected)
+        else:
+            reactor.callLater(CONNECT_INTERVAL, connected)
+
+    def _join(self):
+        # Let a table's worth of waiting bots join.
+
+        joining = self._joining = set()
+        while self._waiting and len(joining) < self.table_size:
+            joining.add(self._waiting.popleft())
+        for bot in joining:
+            bot.join()
+        if joining:
+            reactor.callLater(JOIN_TIMEOUT, self._join_timed_out, joining)
+
+    def _join_timed_out(self, joining):
+        # Let the next bots join, if those which joined before have not
+        # started their game.
+
+        if self._joining is joining:
+            self._join()
+
+
+def percentile(values, fraction):
+    """Find a percentile by the nearest rank method.
+
+    Args:
+        values: A sorted, non-empty list of numbers.
+        fraction: A float in the range (0.0, 1.0] with the percentile.
+
+    Returns:
+        The smallest value at least the fraction of values are no greater
+        than.
+    """
+    rank = int(math.ceil(fraction * len(values)))
+    return values[max(rank, 1) - 1]
+
+
+def measure(host, port, connections, seconds, table_size, binary=True,
+            matched=False, name="swarm"):
+    """Connect a swarm, and measure it once every bot has connected.
+
+    Runs the reactor, which cannot be restarted, so may only be called
+    once per process.
+
+    Returns:
+        A dictionary with the latencies of every action in seconds, the
+        rounds started, the games won, the seconds measured and the failed
+        connections.
+    """
+    # Every bot needs a file descriptor
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    swarm = Swarm(host, port, connections, table_size, binary, matched,
+                  name)
+    result = {}
+
+    def connected():
+        swarm.reset()
+        result["start"] = time.time()
+        reactor.callLater(seconds, finished)
+
+    def finished():
+        swarm.running = False
+        result.update(latencies=swarm.latencies, rounds=swarm.rounds,
+                      games=swarm.games, failed=swarm.failed,
+                      seconds=time.time() - result.pop("start"))
+        reactor.stop()
+
+    swarm.start(connected)
+    reactor.run()
+    return result
+
+
+def worker(arguments):
+    """Measure a swarm in a process started by run, and print the result
+    as JSON.
+
+    Args:
+        arguments: A string with the JSON encoded arguments of measure.
+    """
+    print json.dumps(measure(**json.loads(arguments)))
+
+
+def load(connections=CONNECTIONS, processes=1, seconds=SECONDS,
+         table_size=TABLE_SIZE, binary=True, matched=False, host=None,
+         port=None):
+    """Load test a server on the local machine, which must already be
+    running.
+
+    Args:
+        connections: An integer with the number of bots, split evenly
+            between the processes.
+        processes: An integer with the number of processes connecting bots.
+        seconds: A float with the seconds to measure for, once every bot
+            has connected.
+        table_size: An integer with the players at each table.
+        binary: A Boolean indicating whether bots use the binary protocol.
+        matched: A Boolean indicating whether the server seats players by
+            matchmaking.
+        host: A string with the host of the server, or None for the host
+            given by config.ini.
+        port: An integer with the port of the server, or None for the port
+            given by config.ini.
+
+    Returns:
+        A dictionary with the actions, rounds and games per second, the
+        failed connections, and a list of the latency percentiles given by
+        PERCENTILES in seconds, empty if no action was timed.
+    """
+    children = []
+    for i in xrange(processes):
+        arguments = json.dumps(dict(
+            host=host or config_parse.host, port=port or config_parse.port,
+            connections=connections // processes +
+            (i < connections % processes),
+            seconds=seconds, table_size=table_size, binary=binary,
+            matched=matched,
+            name="swarm%d" % i))
+        children.append(subprocess.Popen(
+            [sys.executable, "-c", "from liars_dice.benchmark import swarm; "
+             "swarm.worker(%r)" % arguments], stdout=subprocess.PIPE))
+    results = [json.loads(child.communicate()[0]) for child in children]
+
+    latencies = sorted(latency for result in results
+                       for latency in result["latencies"])
+    elapsed = max(result["seconds"] for result in results)
+    return dict(
+        actions=len(latencies) / elapsed,
+        rounds=sum(result["rounds"] for result in results) / elapsed,
+        games=sum(result["games"] for result in results) / elapsed,
+        failed=sum(result["failed"] for result in results),
+        percentiles=[percentile(latencies, fraction)
+                     for fraction in PERCENTILES] if latencies else [])
+
+
+def run(connections=CONNECTIONS, processes=1, seconds=SECONDS,
+        table_size=TABLE_SIZE, binary=True, matched=False, port=None):
+    """Load test the server given by config.ini, and print the results.
+
+    The server must already be running, on the local machine.
+
+    Args:
+        connections, processes, seconds, table_size, binary, matched, port:
+            As taken by load.
+    """
+    result = load(connections, processes, seconds, table_size, binary,
+                  matched, port=port)
+    print "Connections\tProcesses\tActions/s\tRounds/s\tGames/s"
+    print "%d\t\t%d\t\t%.0f\t\t%.1f\t\t%.2f" % (
+        connections, processes, result["actions"], result["rounds"],
+        result["games"])
+    if result["failed"]:
+        print "Failed connections: %d" % result["failed"]
+    if result["percentiles"]:
+        print "Latency\t" + "\t".join("p%g" % (fraction * 100)
+                                      for fraction in PERCENTILES)
+        print "ms\t" + "\t".join("%.2f" % (value * 1000)
+                                 for value in result["percentiles"])
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+"""
+
+Load test a single server process hosting thousands of tables at once.
+
+Clients are connected to LiarGameFactory through in-memory transports, so the
+test measures the server rather than the network. Every table plays Simple
+Bot moves in turn, each in its own reactor turn, and whenever a game is won
+its players reconnect, keeping the number of concurrent tables constant.
+
+"""
+import random
+import resource
+import time
+from twisted.internet.task import Clock
+from twisted.test.proto_helpers import StringTransport
+from liars_dice import network_command
+from liars_dice.server.game_server import LiarGameFactory
+
+TABLE_COUNTS = (1000, 5000)
+PLAYERS = 4
+PASSES = 40
+
+
+def connect(factory, username, transport_class=StringTransport):
+    """Connect a client and send its username.
+
+    Args:
+        factory: The LiarGameFactory to connect to.
+        username: A string with the client's username.
+        transport_class: The class of in-memory transport to connect with.
+
+    Returns:
+        The LiarsGame protocol serving the client.
+    """
+    protocol = factory.buildProtocol(None)
+    protocol.makeConnection(transport_class())
+    protocol.lineReceived(network_command.USERNAME +
+                          network_command.DELIMITER + username)
+    return protocol
+
+
+def open_table(factory, name, players=PLAYERS,
+               transport_class=StringTransport):
+    """Seat a full table of clients and start its game.
+
+    Returns:
+        The Table the clients were seated at.
+    """
+    clients = [connect(factory, name + "-" + str(i), transport_class)
+               for i in xrange(players)]
+    clients[0].lineReceived(network_command.START)
+    return clients[0].table
+
+
+def play_turn(table):
+    """Send the next move of a table's turn player.
+
+    Returns:
+        A Boolean indicating whether the move ended the game.
+    """
+    game = table.game
+    player = game.turn_player()
+    client = table.clients[player]
+    previous = game.previous_bid
+    if previous is not None and random.random() < 0.5:
+        client.lineReceived(network_command.LIAR)
+    else:
+        face, number = previous or (0, 1)
+        if face < 6:
+            face += 1
+        else:
+            face, number = 1, number + 1
+        client.lineReceived(network_command.BID + network_command.DELIMITER +
+                            str(face) + "," + str(number))
+
+    # The game was won if the clients were unseated
+    return client.table is None
+
+
+def benchmark(table_count, server_log=None, checkpoints=None):
+    """Open table_count tables, then play PASSES moves at each.
+
+    Args:
+        table_count: An integer with the number of concurrent tables.
+        server_log: The ServerLog the server records events in, or None to
+            discard them.
+        checkpoints: The CheckpointFile the server saves games in, or None
+            to not save them.
+
+    Returns:
+        A tuple composed of the tables opened per second, the moves played
+        per second (including reseating the players of won games), the
+        number of games won, and the number of Table objects created.
+    """
+    clock = Clock()
+    factory = LiarGameFactory(clock, server_log, checkpoints)
+    start = time.time()
+    tables = [open_table(factory, "t" + str(i)) for i in xrange(table_count)]
+    clock.advance(0)
+    open_rate = table_count / (time.time() - start)
+
+    games_won = 0
+    start = time.time()
+    for _ in xrange(PASSES):
+        for i, table in enumerate(tables):
+            won = play_turn(table)
+            if won:
+                games_won += 1
+                tables[i] = open_table(factory, "t" + str(i))
+
+            # End the reactor turn, writing the queued lines
+            clock.advance(0)
+            if not won:
+                for client in table.clients.itervalues():
+                    client.transport.clear()
+    move_rate = table_count * PASSES / (time.time() - start)
+    return open_rate, move_rate, games_won, len(factory.tables.tables)
+
+
+def run():
+    """Run the benchmark and print the results."""
+    print "Tables\tTables/s\tMoves/s\tGames won\tTables created\tPeak RSS"
+    for table_count in TABLE_COUNTS:
+        open_rate, move_rate, games_won, created = benchmark(table_count)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+        print "%d\t%.0f\t\t%.0f\t%d\t\t%d\t\t%.1fMB" % (
+            table_count, open_rate, move_rate, games_won, created, peak)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+"""
+
+Compare the server's timer wheel with the reactor's callLater, with 100,000
+timers armed, as there would be with one turn timeout per table.
+
+For each, times arming the timers, re-arming them (cancelling a timer and
+scheduling another, as every turn does), and running them once due. The
+reactor is a real SelectReactor, which keeps its calls in a heap, with its
+clock replaced so that no time passes while it is timed.
+
+"""
+import random
+import time
+from twisted.internet.selectreactor import SelectReactor
+from twisted.internet.task import Clock
+from liars_dice.server.timer_wheel import TimerWheel
+
+TIMERS = 100000
+REARMS = 500000
+MAX_DELAY = 120.0
+RESOLUTION = 0.1
+
+
+def noop():
+    pass
+
+
+def rate(operations, start):
+    """Returns: The microseconds per operation since start."""
+    return (time.time() - start) / operations * 1e6
+
+
+def benchmark_wheel(delays):
+    """Time the TimerWheel.
+
+    Args:
+        delays: A list of floats with the delay of each timer.
+
+    Returns:
+        A tuple composed of the microseconds per timer armed, re-armed and
+        run.
+    """
+    clock = Clock()
+    wheel = TimerWheel(clock, RESOLUTION)
+    start = time.time()
+    timers = [wheel.schedule(delay, noop) for delay in delays]
+    arm = rate(len(delays), start)
+
+    start = time.time()
+    for i in xrange(REARMS):
+        index = i % len(timers)
+        timers[index].cancel()
+        timers[index] = wheel.schedule(delays[index], noop)
+    rearm = rate(REARMS, start)
+
+    start = time.time()
+    for _ in xrange(int(MAX_DELAY / RESOLUTION) + 1):
+        clock.advance(RESOLUTION)
+    assert wheel.armed == 0
+    run = rate(len(delays), start)
+    return arm, rearm, run
+
+
+def benchmark_reactor(delays):
+    """Time the reactor's callLater (see benchmark_wheel)."""
+    reactor = SelectReactor()
+    now = [0.0]
+    reactor.seconds = lambda: now[0]
+    start = time.time()
+    calls = [reactor.callLater(delay, noop) for delay in delays]
+    arm = rate(len(delays), start)
+
+    start = time.time()
+    for i in xrange(REARMS):
+        index = i % len(calls)
+        calls[index].cancel()
+        calls[index] = reactor.callLater(delays[index], noop)
+    rearm = rate(REARMS, start)
+
+    start = time.time()
+    for _ in xrange(int(MAX_DELAY / RESOLUTION) + 1):
+        now[0] += RESOLUTION
+        reactor.runUntilCurrent()
+    assert not reactor.getDelayedCalls()
+    run = rate(len(delays), start)
+    return arm, rearm, run
+
+
+def run():
+    """Run the benchmark and print the results."""
+    random.seed(0)
+    delays = [random.uniform(1, MAX_DELAY) for _ in xrange(TIMERS)]
+    print "%d timers\tus/arm\tus/re-arm\tus/run" % TIMERS
+    for name, benchmark in (("TimerWheel", benchmark_wheel),
+                            ("callLater", benchmark_reactor)):
+        print "%-10s\t%.2f\t%.2f\t\t%.2f" % ((name,) + benchmark(delays))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+"""
+
+Compare the text and binary protocols, by the size of a round's messages and
+the time taken to encode them on the server and to decode and dispatch them
+on the client.
+
+"""
+import timeit
+from twisted.test.proto_helpers import StringTransport
+from liars_dice import binary_command, network_command
+from liars_dice.benchmark.common import round_messages
+from liars_dice.benchmark.dispatch import SilentPlayer
+from liars_dice.server.session import Message
+
+TABLE_SIZES = (4, 20)
+BIDS = 8
+REPEATS = 2000
+
+
+def make_client(binary):
+    """Create a client, switched to the binary protocol if binary is True."""
+    client = SilentPlayer()
+    client.use_binary_protocol = binary
+    client.makeConnection(StringTransport())
+    client.lineReceived(network_command.USERNAME + network_command.DELIMITER +
+                        binary_command.PROTOCOL)
+    return client
+
+
+def benchmark(players):
+    """Time a round of messages in each protocol.
+
+    Returns:
+        A list of (protocol name, bytes per round, server encoding
+        microseconds per round, client decoding microseconds per round)
+        tuples.
+    """
+    messages = round_messages(["player" + str(i) for i in xrange(players)],
+                              BIDS, hand=[3, 1, 6, 2, 2])
+    results = []
+    for name, binary in (("text", False), ("binary", True)):
+        encoding = "binary" if binary else "text"
+
+        def encode():
+            return "".join(getattr(Message(command, *arguments), encoding)()
+                           for command, arguments in messages)
+
+        data = encode()
+        client = make_client(binary)
+        received = client.dataReceived
+
+        def decode():
+            received(data)
+
+        results.append((
+            name, len(data),
+            timeit.timeit(encode, number=REPEATS) / REPEATS * 1e6,
+            timeit.timeit(decode, number=REPEATS) / REPEATS * 1e6))
+    return results
+
+
+def run():
+    """Run the benchmark and print the results."""
+    print "Players\tProtocol\tBytes/round\tEncode us\tDecode us"
+    for players in TABLE_SIZES:
+        for name, size, encode, decode in benchmark(players):
+            print "%d\t%-8s\t%d\t\t%.1f\t\t%.1f" % (players, name, size,
+                                                    encode, decode)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,102 @@
+"""
+
+Integer codes for bids, shared by the server and clients.
+
+Codes are ordered by the strength of the bid: a bid may follow another if and
+only if its code is greater. The code of a bid of (face, number) is
+(number - 1) * 6 + face - 1, so bids of 1 die take codes 0 - 5, bids of 2
+dice take codes 6 - 11 and so on. NO_BID is less than every code, so any bid
+may follow it.
+
+"""
+FACES_PER_DIE = 6
+NO_BID = -1
+
+# Decoded bids for up to this many dice are looked up rather than computed
+TABLE_DICE = 200
+
+# (face, number) tuples, indexed by code
+BIDS = tuple((face, number) for number in xrange(1, TABLE_DICE + 1)
+             for face in xrange(1, FACES_PER_DIE + 1))
+
+
+def encode(face, number):
+    """Encode a bid.
+
+    Args:
+        face: An integer between 1 - 6 (inclusive) with the die value bid.
+        number: A positive integer with the number of dice bid.
+
+    Returns:
+        An integer with the code of the bid.
+    """
+    return (number - 1) * FACES_PER_DIE + face - 1
+
+
+def decode(code):
+    """Decode a bid.
+
+    Args:
+        code: A non-negative integer with the code of a bid.
+
+    Returns:
+        A (face, number) tuple of integers with the bid.
+    """
+    try:
+        return BIDS[code]
+    except IndexError:
+        number, face = divmod(code, FACES_PER_DIE)
+        return face + 1, number + 1
+
+
+def is_valid(face, number, total_dice):
+    """Determine whether a bid is within the valid range of faces and dice.
+
+    Bids for more dice than are in play can never be correct, and are not
+    valid. The arguments may also be NumPy arrays, which are compared
+    element-wise.
+
+    Args:
+        face: An integer with the die value bid.
+        number: An integer with the number of dice bid.
+        total_dice: An integer with the number of dice held by all players.
+
+    Returns:
+        A Boolean indicating whether the bid is valid.
+    """
+    return ((number >= 1) & (number <= total_dice) &
+            (face >= 1) & (face <= FACES_PER_DIE))
+
+
+def successors(previous_code, total_dice):
+    """Provide the codes of every bid that may follow a bid.
+
+    Bids are limited to at most total_dice dice, as larger bids can never be
+    correct.
+
+    Args:
+        previous_code: An integer with the code of the previous bid, or
+            NO_BID.
+        total_dice: An integer with the number of dice held by all players.
+
+    Returns:
+        An xrange of the codes, from the weakest bid to the strongest.
+    """
+    return xrange(previous_code + 1, total_dice * FACES_PER_DIE)
+
+
+def successor_bids(previous_code, total_dice):
+    """Provide every bid that may follow a bid.
+
+    Args:
+        previous_code: An integer with the code of the previous bid, or
+            NO_BID.
+        total_dice: An integer with the number of dice held by all players.
+
+    Returns:
+        A sequence of (face, number) tuples of integers, from the weakest bid
+        to the strongest, as given by successors.
+    """
+    if total_dice <= TABLE_DICE:
+        return BIDS[previous_code + 1:total_dice * FACES_PER_DIE]
+    return [decode(code) for code in successors(previous_code, total_dice)]
@@ -0,0 +1,245 @@
+"""
+
+A compact binary encoding of the commands in network_command, which clients
+can choose over the text protocol.
+
+The server offers the binary protocol by listing its name (PROTOCOL) in the
+comma separated content of USERNAME requests. A client accepts by replying
+with the text line network_command.PROTOCOL + network_command.DELIMITER +
+PROTOCOL, after which both sides send only binary frames. Clients which
+ignore the offer continue to use the text protocol.
+
+Each frame is a 2 byte big-endian length, followed by that many bytes: an
+opcode identifying the command, then the command's packed arguments.
+
+"""
+import struct
+from liars_dice import network_command
+from liars_dice.network_command import CommandRegistry
+
+PROTOCOL = "bin1"
+
+LENGTH = struct.Struct("!H")
+BID = struct.Struct("!BH")  # face, number
+
+MAX_FRAME = 0xffff
+MAX_STRING = 0xff  # longest username in PLAYER_STATUS and CHAT frames
+
+OPCODES = dict((command, opcode) for opcode, command in enumerate([
+    network_command.USERNAME,
+    network_command.SPECTATE,
+    network_command.PROTOCOL,
+    network_command.PLAYER_LEFT,
+    network_command.PLAYER_JOINED,
+    network_command.CAN_START,
+    network_command.START,
+    network_command.NEXT_ROUND,
+    network_command.NEXT_TURN,
+    network_command.PLAY,
+    network_command.WINNER,
+    network_command.PLAYER_LOST_DIE,
+    network_command.PLAYER_ELIMINATED,
+    network_command.PLAYER_HAND,
+    network_command.PLAYER_STATUS,
+    network_command.BID,
+    network_command.LIAR,
+    network_command.SPOT_ON,
+    network_command.CHAT,
+    network_command.QUEUE,
+], 1))
+
+# Opcodes as the bytes sent
+_OPCODE_BYTES = dict((command, chr(opcode))
+                     for command, opcode in OPCODES.iteritems())
+_pack_length = LENGTH.pack
+
+
+# Codecs for the arguments of commands. Each is a tuple of a function packing
+# the arguments into a string, and a function unpacking a string into a tuple
+# of the arguments, as given by the parsers in network_command. Malformed
+# frames raise ValueError.
+
+def _encode_none():
+    return ""
+
+
+def _decode_none(payload):
+    if payload:
+        raise ValueError("unexpected arguments")
+    return ()
+
+
+def _encode_string(content):
+    return content
+
+
+def _decode_string(payload):
+    return payload,
+
+
+def _encode_bid(face, number):
+    return BID.pack(face, number)
+
+
+def _decode_bid(payload):
+    try:
+        return BID.unpack(payload)
+    except struct.error:
+        raise ValueError("malformed bid")
+
+
+def _encode_hand(hand):
+    return "".join(map(chr, hand))
+
+
+def _decode_hand(payload):
+    return sorted(bytearray(payload)),
+
+
+def _encode_player_status(players):
+    return "".join(chr(len(username)) + username + chr(dice)
+                   for username, dice in players)
+
+
+def _decode_player_status(payload):
+    players = []
+    position = 0
+    end = len(payload)
+    while position < end:
+        name_end = position + 1 + ord(payload[position])
+        if name_end >= end:
+            raise ValueError("malformed player status")
+        players.append((payload[position + 1:name_end],
+                        ord(payload[name_end])))
+        position = name_end + 1
+    return players,
+
+
+def _encode_chat(username, message):
+    return chr(len(username)) + username + message
+
+
+def _decode_chat(payload):
+    if not payload:
+        raise ValueError("malformed chat message")
+    name_end = 1 + ord(payload[0])
+    if name_end > len(payload):
+        raise ValueError("malformed chat message")
+    return payload[1:name_end], payload[name_end:]
+
+
+def _encode_queue(kind, rating):
+    return network_command.format_queue(kind, rating)
+
+
+def _decode_queue(payload):
+    return network_command.parse_queue(payload)
+
+
+NONE = (_encode_none, _decode_none)
+STRING = (_encode_string, _decode_string)
+
+# Codecs of the commands sent by the server
+SERVER_CODECS = {
+    network_command.USERNAME: STRING,
+    network_command.PLAYER_LEFT: STRING,
+    network_command.PLAYER_JOINED: STRING,
+    network_command.CAN_START: NONE,
+    network_command.NEXT_ROUND: NONE,
+    network_command.NEXT_TURN: STRING,
+    network_command.PLAY: NONE,
+    network_command.WINNER: STRING,
+    network_command.PLAYER_LOST_DIE: STRING,
+    network_command.PLAYER_ELIMINATED: STRING,
+    network_command.PLAYER_HAND: (_encode_hand, _decode_hand),
+    network_command.PLAYER_STATUS: (_encode_player_status,
+                                    _decode_player_status),
+    network_command.BID: (_encode_bid, _decode_bid),
+    network_command.LIAR: NONE,
+    network_command.SPOT_ON: NONE,
+    network_command.CHAT: (_encode_chat, _decode_chat),
+}
+
+# Codecs of the commands sent by clients
+CLIENT_CODECS = {
+    network_command.USERNAME: STRING,
+    network_command.SPECTATE: STRING,
+    network_command.QUEUE: (_encode_queue, _decode_queue),
+    network_command.START: NONE,
+    network_command.BID: (_encode_bid, _decode_bid),
+    network_command.LIAR: NONE,
+    network_command.SPOT_ON: NONE,
+    network_command.CHAT: STRING,
+}
+
+
+def encode(codecs, command, arguments):
+    """Encode a command as a frame.
+
+    Args:
+        codecs: SERVER_CODECS or CLIENT_CODECS.
+        command: A string with the command.
+        arguments: A tuple of the command's arguments, as given by the
+            parsers in network_command.
+
+    Returns:
+        A string with the frame.
+
+    Raises:
+        ValueError: The frame would be longer than MAX_FRAME.
+    """
+    payload = codecs[command][0](*arguments)
+    if len(payload) >= MAX_FRAME:
+        raise ValueError("frame too long for " + command)
+    return _pack_length(len(payload) + 1) + _OPCODE_BYTES[command] + payload
+
+
+def registry(text_registry, codecs):
+    """Create a registry of the handlers of a text registry, by opcode.
+
+    Args:
+        text_registry: A CommandRegistry for the text protocol.
+        codecs: The codecs of the commands received, SERVER_CODECS or
+            CLIENT_CODECS.
+
+    Returns:
+        A CommandRegistry of opcodes to the decoder of the command's
+        arguments and the handler used by text_registry.
+    """
+    return CommandRegistry(dict(
+        (OPCODES[command], (codecs[command][1], name))
+        for command, (parser, name) in text_registry.commands.iteritems()
+        if command in codecs))
+
+
+class FrameReader:
+    """Split received data into frames."""
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, data):
+        """Add received data.
+
+        Args:
+            data: A string with the data received.
+
+        Returns:
+            A list of (opcode, payload) tuples for each frame completed.
+        """
+        buffer = self._buffer + data if self._buffer else data
+        frames = []
+        position = 0
+        end = len(buffer)
+        unpack = LENGTH.unpack_from
+        while position + 2 <= end:
+            length, = unpack(buffer, position)
+            frame_end = position + 2 + length
+            if frame_end > end:
+                break
+            if length:
+                frames.append((ord(buffer[position + 2]),
+                               buffer[position + 3:frame_end]))
+            position = frame_end
+        self._buffer = buffer[position:]
+        return frames
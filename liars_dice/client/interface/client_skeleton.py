@@ -31,6 +31,10 @@ class YourClientName(Player):
         #   liar --> self.send_liar()
         #   spot on --> self.send_spot_on()
         #   bid --> self.send_bid(face, number)
+        #
+        # Bids may also be sent by their code with self.send_bid_code(code).
+        # The codes of every bid which may follow the previous bid are given
+        # by liars_dice.bids.successors(self.previous_bid_code, total_dice).
         raise NotImplementedError
 
     def notification_next_turn(self, player):
@@ -20,6 +20,8 @@ class ConsoleHuman(Player):
         can_start: A Boolean indicating whether the player can start the game.
     """
 
+    match_kind = "human"
+
     def __init__(self):
         Player.__init__(self)
 
@@ -47,6 +47,9 @@ class SimpleBot(Player):
     MAX_FACE = 6
     FACES_PER_DIE = 6
 
+    use_binary_protocol = True
+    match_kind = "bot"
+
     def __init__(self):
         Player.__init__(self)
         self.previous_face = None
@@ -413,6 +413,8 @@ class UsernameWindow(Toplevel):
 class App(Player):
     """Tkinter GUI and server connection."""
 
+    match_kind = "human"
+
     def __init__(self, master):
         """
         Args:
@@ -6,7 +6,7 @@ Functionality common to all players.
 from twisted.internet.protocol import ClientFactory
 
 from twisted.protocols.basic import LineReceiver
-from liars_dice import network_command, config_parse
+from liars_dice import binary_command, bids, network_command, config_parse
 
 
 class Player(LineReceiver):
@@ -18,79 +18,114 @@ class Player(LineReceiver):
     Attributes:
         username: A string with the player's username, or None if the player
             does not have one.
+        previous_bid_code: An integer with the code (see liars_dice/bids.py)
+            of the previous bid this round, or bids.NO_BID if there is none.
+        use_binary_protocol: A Boolean indicating whether to switch to the
+            binary protocol (see liars_dice/binary_command.py) if the server
+            offers it. This saves encoding and parsing, so is best suited to
+            bots.
+        match_kind: A string with the kind of player, such as "bot" or
+            "human", servers with matchmaking seat the player with, or None
+            to not say. It is only sent to servers offering the QUEUE
+            command.
+        match_rating: An integer with the player's rating, which servers
+            with matchmaking may also seat the player by, or None if the
+            player has none.
     """
 
+    use_binary_protocol = False
+    match_kind = None
+    match_rating = None
+
     def __init__(self):
         self.username = None
+        self.previous_bid_code = bids.NO_BID
         self._allow_username_change = True
 
-    def lineReceived(self, line):
-
-        # Parse the received message
-        try:
-            divide = line.index(network_command.DELIMITER)
-            command = line[:divide]
-            extra = line[divide + 1:]
-        except ValueError:
-            command = line
-            extra = None
-
-        # Delegate to the appropriate method
-        if command == network_command.PLAYER_HAND:
-            hand = sorted([int(die) for die in extra.split(",")])
-            self.notification_hand(hand)
-
-        elif command == network_command.PLAYER_STATUS:
-            player_data = [(username, int(amount)) for username, amount in
-                           (player.split("=") for player in extra.split(","))]
-            self.notification_player_status(player_data)
-
-        elif command == network_command.NEXT_TURN:
-            self.notification_next_turn(extra)
-
-        elif command == network_command.PLAYER_LEFT:
-            self.notification_player_left(extra)
-
-        elif command == network_command.PLAYER_JOINED:
-            self.notification_player_joined(extra)
-
-        elif command == network_command.CAN_START:
-            self.notification_can_start()
-
-        elif command == network_command.USERNAME:
-            self._allow_username_change = True
-            self.notification_username_request()
-
-        elif command == network_command.PLAY:
-            self.notification_play_request()
+        # Parsers and handlers of the commands received from the server
+        self._commands = COMMANDS.table(self.__class__)
 
-        elif command == network_command.BID:
-            face, number = [int(n) for n in extra.split(",")]
-            self.notification_bid(face, number)
+        # Whether the binary protocol is used, and the frames received in it
+        self._binary = False
+        self._frames = None
 
-        elif command == network_command.SPOT_ON:
-            self.notification_spot_on()
+        # Whether the server offers the QUEUE command, for matchmaking
+        self._queue_offered = False
 
-        elif command == network_command.LIAR:
-            self.notification_liar()
-
-        elif command == network_command.PLAYER_LOST_DIE:
-            self.notification_player_lost_die(extra)
-
-        elif command == network_command.PLAYER_ELIMINATED:
-            self.notification_eliminated(extra)
-
-        elif command == network_command.NEXT_ROUND:
-            self.notification_new_round()
+    def lineReceived(self, line):
 
-        elif command == network_command.WINNER:
-            self.notification_winner(extra)
+        # Parse the received message, and delegate to the appropriate method
+        command, delimiter, content = line.partition(network_command.DELIMITER)
+        try:
+            parse, handle = self._commands[command]
+        except KeyError:
+            return
+        handle(self, *parse(content if delimiter else None))
+
+    def rawDataReceived(self, data):
+
+        # Decode the received frames, and delegate to the appropriate method
+        commands = self._commands
+        for opcode, payload in self._frames.feed(data):
+            try:
+                decode, handle = commands[opcode]
+            except KeyError:
+                continue
+            handle(self, *decode(payload))
+
+    def _received_username_request(self, protocols):
+        # Switch to the binary protocol if it is wanted and offered, then
+        # allow the username to be sent again, and ask for one.
+        #
+        # Args:
+        #     protocols: A string with the comma separated names of the
+        #         protocols and commands offered by the server, or None if
+        #         there are none.
+
+        offered = protocols.split(",") if protocols else []
+        self._queue_offered = network_command.QUEUE in offered
+        if (self.use_binary_protocol and not self._binary and
+                binary_command.PROTOCOL in offered):
+            self.sendLine(network_command.PROTOCOL +
+                          network_command.DELIMITER + binary_command.PROTOCOL)
+            self._binary = True
+            self._frames = binary_command.FrameReader()
+            self._commands = BINARY_COMMANDS.table(self.__class__)
+            self.setRawMode()
 
-        elif command == network_command.CHAT:
-            delim = extra.index(",")
-            username = extra[:delim]
-            message = extra[delim + 1:]
-            self.notification_chat(username, message)
+        self._allow_username_change = True
+        self.notification_username_request()
+
+    def _send(self, command, *arguments):
+        # Send a command to the server in the protocol in use.
+        #
+        # Args:
+        #     command: A string with the command.
+        #     *arguments: The arguments of the command, as given by its
+        #         parser in network_command.
+
+        if self._binary:
+            self.transport.write(binary_command.encode(
+                binary_command.CLIENT_CODECS, command, arguments))
+        else:
+            self.sendLine(network_command.format_message(
+                network_command.CLIENT_FORMATTERS, command, arguments))
+
+    def _received_bid(self, face, number):
+        # Track the previous bid, then notify of it.
+        #
+        # Args:
+        #     face: An integer with the die value bid.
+        #     number: An integer with the number of dice bid.
+
+        self.previous_bid_code = bids.encode(face, number)
+        self.notification_bid(face, number)
+
+    def _received_new_round(self):
+        # Reset the previous bid, then notify of the new round.
+
+        self.previous_bid_code = bids.NO_BID
+        self.notification_new_round()
 
     def send_username(self, username):
         """Register the player's username with the server.
@@ -99,18 +134,20 @@ class Player(LineReceiver):
             username: A string with the player's username.
         """
         if self._allow_username_change:
-            self.sendLine(network_command.USERNAME +
-                          network_command.DELIMITER + username)
+            if self.match_kind is not None and self._queue_offered:
+                self._send(network_command.QUEUE, self.match_kind,
+                           self.match_rating)
+            self._send(network_command.USERNAME, username)
             self.username = username
             self._allow_username_change = False
 
     def send_liar(self):
         """Send the server a "Liar" action."""
-        self.sendLine(network_command.LIAR)
+        self._send(network_command.LIAR)
 
     def send_spot_on(self):
         """Send the server a "Spot On" action."""
-        self.sendLine(network_command.SPOT_ON)
+        self._send(network_command.SPOT_ON)
 
     def send_bid(self, face, number):
         """Send the server the player's bid.
@@ -119,8 +156,16 @@ class Player(LineReceiver):
             face: An integer with the die value bid.
             number: An integer with the number of dice bid.
         """
-        self.sendLine(network_command.BID + network_command.DELIMITER + str(
-            face) + "," + str(number))
+        self._send(network_command.BID, face, number)
+
+    def send_bid_code(self, code):
+        """Send the server the player's bid, given by its code.
+
+        Args:
+            code: An integer with the code of the bid, as given by
+                liars_dice/bids.py.
+        """
+        self.send_bid(*bids.decode(code))
 
     def send_start(self):
         """Send a message to the server to start the game.
@@ -129,12 +174,11 @@ class Player(LineReceiver):
         if there are not at least two players participating in the game.
         """
         # Checking the conditions for starting the game is done server-side
-        self.sendLine(network_command.START)
+        self._send(network_command.START)
 
     def send_chat(self, message):
         """Send a chat message to the server."""
-        self.sendLine(network_command.CHAT + network_command.DELIMITER +
-                      message)
+        self._send(network_command.CHAT, message)
 
     def notification_player_status(self, player_data):
         """Respond to being provided with game status.
@@ -253,6 +297,48 @@ class Player(LineReceiver):
         pass
 
 
+# Commands received from the server, with their parsers and the methods of
+# Player handling them
+COMMANDS = network_command.CommandRegistry({
+    network_command.PLAYER_HAND:
+        (network_command.parse_hand, "notification_hand"),
+    network_command.PLAYER_STATUS:
+        (network_command.parse_player_status, "notification_player_status"),
+    network_command.NEXT_TURN:
+        (network_command.parse_string, "notification_next_turn"),
+    network_command.PLAYER_LEFT:
+        (network_command.parse_string, "notification_player_left"),
+    network_command.PLAYER_JOINED:
+        (network_command.parse_string, "notification_player_joined"),
+    network_command.CAN_START:
+        (network_command.parse_none, "notification_can_start"),
+    network_command.USERNAME:
+        (network_command.parse_string, "_received_username_request"),
+    network_command.PLAY:
+        (network_command.parse_none, "notification_play_request"),
+    network_command.BID:
+        (network_command.parse_bid, "_received_bid"),
+    network_command.SPOT_ON:
+        (network_command.parse_none, "notification_spot_on"),
+    network_command.LIAR:
+        (network_command.parse_none, "notification_liar"),
+    network_command.PLAYER_LOST_DIE:
+        (network_command.parse_string, "notification_player_lost_die"),
+    network_command.PLAYER_ELIMINATED:
+        (network_command.parse_string, "notification_eliminated"),
+    network_command.NEXT_ROUND:
+        (network_command.parse_none, "_received_new_round"),
+    network_command.WINNER:
+        (network_command.parse_string, "notification_winner"),
+    network_command.CHAT:
+        (network_command.parse_chat, "notification_chat"),
+})
+
+# The same commands, received as frames of the binary protocol
+BINARY_COMMANDS = binary_command.registry(COMMANDS,
+                                          binary_command.SERVER_CODECS)
+
+
 class PlayerFactory(ClientFactory):
     """Handle client connections."""
 
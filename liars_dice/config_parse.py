@@ -12,9 +12,59 @@ import os.path
 current_dir = os.path.abspath(os.path.dirname(__file__))
 config_location = os.path.join(current_dir, "config.ini")
 
-config = ConfigParser.ConfigParser({"host": "localhost", "port": 9637})
+config = ConfigParser.ConfigParser({"host": "localhost", "port": 9637,
+                                    "dice": "pseudorandom",
+                                    "event_log_dir": "", "log_file": "",
+                                    "log_level": "info",
+                                    "log_rotate_bytes": "10000000",
+                                    "log_sample_rate": "1.0",
+                                    "write_high_water": "65536",
+                                    "max_held_bytes": "1048576",
+                                    "slow_client_timeout": "30",
+                                    "slow_client_drop_chat": "true",
+                                    "slow_client_collapse_status": "true",
+                                    "turn_timeout": "60",
+                                    "turn_timeout_action": "liar",
+                                    "lobby_timeout": "120",
+                                    "metrics_port": "9638",
+                                    "profile_dir": "",
+                                    "checkpoint_file": "",
+                                    "reattach_timeout": "120",
+                                    "match_size": "0",
+                                    "match_wait": "30",
+                                    "match_rating_band": "0"})
 config.read(config_location)
 
 host = config.get("Client", "host")
 
+dice = config.get("Server", "dice")
+
+event_log_dir = config.get("Server", "event_log_dir")
+
+log_file = config.get("Server", "log_file")
+log_level = config.get("Server", "log_level")
+log_rotate_bytes = int(config.get("Server", "log_rotate_bytes"))
+log_sample_rate = float(config.get("Server", "log_sample_rate"))
+
+write_high_water = config.getint("Server", "write_high_water")
+max_held_bytes = config.getint("Server", "max_held_bytes")
+slow_client_timeout = config.getfloat("Server", "slow_client_timeout")
+slow_client_drop_chat = config.getboolean("Server", "slow_client_drop_chat")
+slow_client_collapse_status = config.getboolean("Server",
+                                                "slow_client_collapse_status")
+
+turn_timeout = config.getfloat("Server", "turn_timeout")
+turn_timeout_action = config.get("Server", "turn_timeout_action")
+lobby_timeout = config.getfloat("Server", "lobby_timeout")
+
+metrics_port = config.getint("Server", "metrics_port")
+profile_dir = config.get("Server", "profile_dir")
+
+checkpoint_file = config.get("Server", "checkpoint_file")
+reattach_timeout = config.getfloat("Server", "reattach_timeout")
+
+match_size = config.getint("Server", "match_size")
+match_wait = config.getfloat("Server", "match_wait")
+match_rating_band = config.getint("Server", "match_rating_band")
+
 port = int(config.get("Shared", "port"))
\ No newline at end of file
@@ -4,10 +4,14 @@ Constants for distinguishing message types passed and received by servers and
 clients.
 
 """
+import re
 
 DELIMITER = ":"  # delimiter between the command and the content
 
 USERNAME = "username"
+SPECTATE = "spectate"
+QUEUE = "queue"
+PROTOCOL = "protocol"
 PLAYER_LEFT = "left"
 PLAYER_JOINED = "joined"
 CAN_START = "can_start"
@@ -28,3 +32,182 @@ LIAR = "liar"
 SPOT_ON = "spot_on"
 
 CHAT = "chat"
+
+
+# Formatters for the content of commands, the inverse of the parsers below.
+# Each takes the arguments of the command, and returns a string with the
+# content, or None if the command has no content.
+
+
+def format_none():
+    """Format a command without arguments."""
+    return None
+
+
+def format_string(content):
+    """Format a command with a single string argument."""
+    return content
+
+
+def format_bid(face, number):
+    """Format BID content."""
+    return str(face) + "," + str(number)
+
+
+def format_player_status(players):
+    """Format PLAYER_STATUS content from (username, dice) tuples."""
+    return ",".join(username + "=" + str(dice) for username, dice in players)
+
+
+def format_hand(hand):
+    """Format PLAYER_HAND content from a list of die faces."""
+    return ",".join(map(str, hand))
+
+
+def format_chat(username, message):
+    """Format CHAT content relayed by the server."""
+    return username + "," + message
+
+
+def format_queue(kind, rating=None):
+    """Format QUEUE content from a kind of player and an optional rating."""
+    return kind if rating is None else kind + "," + str(rating)
+
+
+def format_message(formatters, command, arguments):
+    """Format a line of the text protocol.
+
+    Args:
+        formatters: SERVER_FORMATTERS or CLIENT_FORMATTERS.
+        command: A string with the command.
+        arguments: A tuple of the arguments for the command's formatter.
+
+    Returns:
+        A string with the line, without a line delimiter.
+    """
+    content = formatters[command](*arguments)
+    if content is None:
+        return command
+    return command + DELIMITER + content
+
+
+# Formatters of the commands sent by the server
+SERVER_FORMATTERS = {
+    USERNAME: format_string,
+    PLAYER_LEFT: format_string,
+    PLAYER_JOINED: format_string,
+    CAN_START: format_none,
+    NEXT_ROUND: format_none,
+    NEXT_TURN: format_string,
+    PLAY: format_none,
+    WINNER: format_string,
+    PLAYER_LOST_DIE: format_string,
+    PLAYER_ELIMINATED: format_string,
+    PLAYER_HAND: format_hand,
+    PLAYER_STATUS: format_player_status,
+    BID: format_bid,
+    LIAR: format_none,
+    SPOT_ON: format_none,
+    CHAT: format_chat,
+}
+
+# Formatters of the commands sent by clients
+CLIENT_FORMATTERS = {
+    USERNAME: format_string,
+    SPECTATE: format_string,
+    QUEUE: format_queue,
+    PROTOCOL: format_string,
+    START: format_none,
+    BID: format_bid,
+    LIAR: format_none,
+    SPOT_ON: format_none,
+    CHAT: format_string,
+}
+
+
+# Parsers for the content of commands. Each takes a string with everything
+# after the DELIMITER, or None if the line has no DELIMITER, and returns a
+# tuple of the arguments for the command's handler. Malformed content raises
+# ValueError.
+
+_find_player_status = re.compile(r"([^,=]*)=(\d+)(?:,|\Z)").findall
+
+
+def parse_none(content):
+    """Parse a command without arguments."""
+    return ()
+
+
+def parse_string(content):
+    """Parse a command with the content as its single argument."""
+    return content,
+
+
+def parse_bid(content):
+    """Parse BID content into (face, number)."""
+    face, number = (content or "").split(",")
+    return int(face), int(number)
+
+
+def parse_queue(content):
+    """Parse QUEUE content into (kind, rating), where rating is None if the
+    client gave none."""
+    kind, delimiter, rating = (content or "").partition(",")
+    return kind, int(rating) if delimiter else None
+
+
+def parse_player_status(content):
+    """Parse PLAYER_STATUS content into a list of (username, dice) tuples."""
+    return [(username, int(dice))
+            for username, dice in _find_player_status(content or "")],
+
+
+def parse_hand(content):
+    """Parse PLAYER_HAND content into a sorted list of die faces."""
+    return sorted(map(int, (content or "").split(","))),
+
+
+def parse_chat(content):
+    """Parse CHAT content relayed by the server into (username, message)."""
+    username, delimiter, message = (content or "").partition(",")
+    if not delimiter:
+        raise ValueError("malformed chat message: " + str(content))
+    return username, message
+
+
+class CommandRegistry:
+    """Map commands to their parsers and handlers.
+
+    Each handler is resolved once per protocol class, so dispatching a line
+    takes a single dictionary lookup.
+
+    Args:
+        commands: A dictionary of commands to (parser, handler name) tuples.
+            The handler is the method of the protocol called with the
+            arguments returned by the parser.
+
+    Attributes:
+        commands: The dictionary of commands the registry was created with.
+    """
+
+    def __init__(self, commands):
+        self.commands = commands
+        self._tables = {}
+
+    def table(self, protocol_class):
+        """Find the parsers and handlers for a protocol class.
+
+        Args:
+            protocol_class: The class of the protocol receiving commands.
+
+        Returns:
+            A dictionary of commands to (parser, handler function) tuples,
+            where the function takes the protocol as its first argument.
+        """
+        try:
+            return self._tables[protocol_class]
+        except KeyError:
+            table = self._tables[protocol_class] = dict(
+                (command, (parser, getattr(protocol_class, name).__func__))
+                for command, (parser, name) in self.commands.iteritems())
+            return table
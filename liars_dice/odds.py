@@ -0,0 +1,182 @@
+"""
+
+Probabilities of bids being correct, for bots deciding whether to bid, or to
+declare 'Liar!' or 'Spot On!'.
+
+A bid of (face, number) is correct when at least number dice show face, and
+is exactly right (as required by 'Spot On!') when precisely number dice do.
+From a player's perspective, the dice in their own hand are known, and each of
+the remaining dice shows the face with probability 1/6.
+
+"""
+import collections
+import math
+from liars_dice import bids
+
+FACE_PROBABILITY = 1.0 / bids.FACES_PER_DIE
+
+
+class BidOdds:
+    """Look up binomial probabilities for bids from precomputed tables.
+
+    Args:
+        max_dice: An integer with the largest number of unknown dice covered
+            by the tables. Larger counts are computed on demand and cached.
+        cache_size: An integer with the number of probabilities computed on
+            demand to keep, most recently used first.
+    """
+    DEFAULT_MAX_DICE = 100
+
+    def __init__(self, max_dice=DEFAULT_MAX_DICE, cache_size=4096):
+        self.max_dice = max_dice
+        self._cache_size = cache_size
+        self._cache = collections.OrderedDict()
+
+        # _exactly[unknown][needed] and _at_least[unknown][needed], built a
+        # row at a time from the row for one fewer die.
+        self._exactly = [[1.0]]
+        for unknown in xrange(1, max_dice + 1):
+            previous = self._exactly[-1] + [0.0]
+            self._exactly.append(
+                [previous[0] * (1 - FACE_PROBABILITY)] +
+                [previous[k] * (1 - FACE_PROBABILITY) +
+                 previous[k - 1] * FACE_PROBABILITY
+                 for k in xrange(1, unknown + 1)])
+
+        self._at_least = []
+        for row in self._exactly:
+            tail = [0.0] * (len(row) + 1)
+            for k in xrange(len(row) - 1, -1, -1):
+                tail[k] = min(tail[k + 1] + row[k], 1.0)
+            self._at_least.append(tail)
+
+    def at_least(self, unknown, needed):
+        """Find the probability that at least needed unknown dice show a face.
+
+        Args:
+            unknown: An integer with the number of unknown dice.
+            needed: An integer with the number of those dice that must show
+                the face.
+
+        Returns:
+            A floating point number with the probability.
+        """
+        if needed <= 0:
+            return 1.0
+        elif needed > unknown:
+            return 0.0
+        elif unknown <= self.max_dice:
+            return self._at_least[unknown][needed]
+        return self._cached(unknown, needed)[0]
+
+    def exactly(self, unknown, needed):
+        """Find the probability that exactly needed unknown dice show a face.
+
+        Args:
+            unknown: An integer with the number of unknown dice.
+            needed: An integer with the number of those dice that must show
+                the face.
+
+        Returns:
+            A floating point number with the probability.
+        """
+        if needed < 0 or needed > unknown:
+            return 0.0
+        elif unknown <= self.max_dice:
+            return self._exactly[unknown][needed]
+        return self._cached(unknown, needed)[1]
+
+    def bid(self, hand, face, number, total_dice):
+        """Find the probabilities of a bid from a player's perspective.
+
+        Args:
+            hand: A sequence of integers with the faces of the player's dice.
+            face: An integer with the die value bid.
+            number: An integer with the number of dice bid.
+            total_dice: An integer with the number of dice held by all
+                players.
+
+        Returns:
+            A tuple of floating point numbers with the probabilities of the
+            bid being correct, and of it being exactly right.
+        """
+        unknown = total_dice - len(hand)
+        needed = number - list(hand).count(face)
+        return (self.at_least(unknown, needed),
+                self.exactly(unknown, needed))
+
+    def score_bids(self, hand, previous_bid, total_dice):
+        """Score every bid that may follow the previous bid.
+
+        Bids are limited to at most total_dice dice, as larger bids can never
+        be correct.
+
+        Args:
+            hand: A sequence of integers with the faces of the player's dice.
+            previous_bid: A (face, number) tuple of integers with the previous
+                bid, or None if no bid has been made this round.
+            total_dice: An integer with the number of dice held by all
+                players.
+
+        Returns:
+            A list of (face, number, probability of being correct,
+            probability of being exactly right) tuples, from the weakest bid
+            to the strongest.
+        """
+        hand = list(hand)
+        unknown = total_dice - len(hand)
+        if unknown <= self.max_dice:
+            at_least = self._at_least[unknown]
+            exactly = self._exactly[unknown]
+        else:
+            at_least = [self.at_least(unknown, k)
+                        for k in xrange(unknown + 1)]
+            exactly = [self.exactly(unknown, k) for k in xrange(unknown + 1)]
+        known = [0] + [hand.count(face) for face in xrange(1, 7)]
+
+        if previous_bid is None:
+            previous_code = bids.NO_BID
+        else:
+            previous_code = bids.encode(*previous_bid)
+
+        scores = []
+        for face, number in bids.successor_bids(previous_code, total_dice):
+            needed = number - known[face]
+            if needed < 0:
+                scores.append((face, number, 1.0, 0.0))
+            elif needed > unknown:
+                scores.append((face, number, 0.0, 0.0))
+            else:
+                scores.append((face, number, at_least[needed],
+                               exactly[needed]))
+        return scores
+
+    def _cached(self, unknown, needed):
+        # Compute the at_least and exactly probabilities beyond the tables,
+        # keeping the most recently used.
+        #
+        # Returns:
+        #     A tuple of floating point numbers with the probabilities.
+
+        key = unknown, needed
+        try:
+            probabilities = self._cache.pop(key)
+        except KeyError:
+            exactly = _binomial(unknown, needed)
+            at_least = min(sum(_binomial(unknown, k)
+                               for k in xrange(needed, unknown + 1)), 1.0)
+            probabilities = at_least, exactly
+            if len(self._cache) >= self._cache_size:
+                self._cache.popitem(last=False)
+        self._cache[key] = probabilities
+        return probabilities
+
+
+def _binomial(unknown, needed):
+    # Probability that exactly needed of unknown dice show a face.
+
+    log_combinations = (math.lgamma(unknown + 1) - math.lgamma(needed + 1) -
+                        math.lgamma(unknown - needed + 1))
+    return math.exp(log_combinations +
+                    needed * math.log(FACE_PROBABILITY) +
+                    (unknown - needed) * math.log(1 - FACE_PROBABILITY))
@@ -0,0 +1,502 @@
+#!/usr/bin/env python
+
+"""
+
+Server to run the game, with clients connected through asyncore.
+
+The same Sessions and GameServer as the Twisted server in
+liars_dice/server/game_server.py are served by the standard library's
+asyncore dispatchers, with a small event loop polling them with epoll where
+the platform has it, or with poll otherwise. Clients cannot tell the two
+front ends apart, and the front_ends benchmark compares them under the same
+load, so a deployment can run whichever is faster.
+
+The metrics and profiling endpoints are served by Twisted's web server, so
+are only offered by the Twisted front end.
+
+"""
+import asyncore
+import errno
+import heapq
+import itertools
+import select
+import socket
+import time
+from twisted.python import log
+from liars_dice import config_parse
+from liars_dice.server.checkpoint import CheckpointFile
+from liars_dice.server.server_log import open_server_log
+from liars_dice.server.session import GameServer, LINE_DELIMITER, Session
+
+READ_SIZE = 65536
+MAX_LINE_LENGTH = 16384  # As Twisted's LineReceiver
+BUFFER_SIZE = 65536  # Bytes waiting to be sent before pausing the producer
+ACCEPTS = 100  # Connections accepted each time the listener is readable
+BACKLOG = 50
+
+
+class DelayedCall:
+    """A call scheduled by a Scheduler, which can be cancelled until made.
+
+    Attributes:
+        time: A float with the time the call is due.
+    """
+
+    def __init__(self, time, function, args, kwargs):
+        self.time = time
+        self._function = function
+        self._args = args
+        self._kwargs = kwargs
+        self._cancelled = False
+        self._called = False
+
+    def cancel(self):
+        """Cancel the call."""
+        self._cancelled = True
+
+    def active(self):
+        """Returns: A Boolean indicating whether the call has been neither
+        made nor cancelled."""
+        return not (self._cancelled or self._called)
+
+    def call(self):
+        """Make the call, unless it was cancelled."""
+        if self.active():
+            self._called = True
+            self._function(*self._args, **self._kwargs)
+
+
+class Scheduler:
+    """Schedule calls, providing the methods of Twisted's IReactorTime used
+    by the GameServer."""
+
+    def __init__(self):
+
+        # A heap of (time, order scheduled, DelayedCall) tuples
+        self._calls = []
+        self._order = itertools.count()
+
+    def seconds(self):
+        """Returns: A float with the current time."""
+        return time.time()
+
+    def callLater(self, delay, function, *args, **kwargs):
+        """Schedule a call.
+
+        Args:
+            delay: A float with the seconds until the call.
+            function: The function to call.
+            *args, **kwargs: The arguments to call the function with.
+
+        Returns:
+            A DelayedCall, which can be cancelled.
+        """
+        call = DelayedCall(time.time() + delay, function, args, kwargs)
+        heapq.heappush(self._calls, (call.time, next(self._order), call))
+        return call
+
+    def timeout(self):
+        """Returns: A float with the seconds until the next call is due, or
+        None if no call is scheduled."""
+        calls = self._calls
+        while calls and not calls[0][2].active():
+            heapq.heappop(calls)
+        if not calls:
+            return None
+        return max(calls[0][0] - time.time(), 0.0)
+
+    def run_due(self):
+        """Make every call which was due when called, in the order they are
+        due. Calls scheduled by them wait for the next run."""
+        calls = self._calls
+        now = time.time()
+        while calls and calls[0][0] <= now:
+            _, _, call = heapq.heappop(calls)
+            try:
+                call.call()
+            except Exception:
+                log.err(None, "Scheduled call failed")
+
+
+class EventLoop:
+    """Poll dispatchers, and make their scheduled calls, until stopped.
+
+    Args:
+        scheduler: The Scheduler whose calls are made.
+
+    Attributes:
+        map: The asyncore socket map of the dispatchers polled.
+        scheduler: The Scheduler.
+        running: A Boolean indicating whether the loop is running.
+    """
+
+    def __init__(self, scheduler=None):
+        self.map = {}
+        self.scheduler = scheduler if scheduler is not None else Scheduler()
+        self.running = False
+
+        # The epoll object polling the dispatchers, or None to poll with
+        # asyncore's own loop
+        self._epoll = select.epoll() if hasattr(select, "epoll") else None
+
+    def add(self, dispatcher):
+        """Start polling a dispatcher, which must already be in map.
+
+        Args:
+            dispatcher: An asyncore dispatcher, readable until removed.
+        """
+        if self._epoll is not None:
+            self._epoll.register(dispatcher.fileno(), select.EPOLLIN)
+
+    def set_writing(self, dispatcher, writing):
+        """Poll whether a dispatcher can be written to, or stop doing so.
+
+        Args:
+            dispatcher: An asyncore dispatcher added to the loop.
+            writing: A Boolean indicating whether it has data to write.
+        """
+        if self._epoll is not None:
+            self._epoll.modify(dispatcher.fileno(), select.EPOLLIN |
+                               (select.EPOLLOUT if writing else 0))
+
+    def remove(self, dispatcher):
+        """Stop polling a dispatcher, before it is closed.
+
+        Args:
+            dispatcher: An asyncore dispatcher added to the loop.
+        """
+        if self._epoll is not None:
+            self._epoll.unregister(dispatcher.fileno())
+
+    def iterate(self, timeout=None):
+        """Handle the dispatchers which are ready, then the calls due.
+
+        Args:
+            timeout: A float with the most seconds to wait for a dispatcher
+                to be ready, or None to wait until the next call is due.
+        """
+        scheduler = self.scheduler
+        if timeout is None:
+            timeout = scheduler.timeout()
+        if self._epoll is None:
+            asyncore.poll2(timeout, self.map)
+        else:
+            try:
+                events = self._epoll.poll(-1 if timeout is None else timeout)
+            except IOError as error:
+                if error.errno != errno.EINTR:
+                    raise
+                events = []
+            socket_map = self.map
+            for fd, flags in events:
+                dispatcher = socket_map.get(fd)
+                if dispatcher is not None:
+                    asyncore.readwrite(dispatcher, flags)
+        scheduler.run_due()
+
+    def run(self):
+        """Run the loop until stop is called."""
+        self.running = True
+        while self.running:
+            self.iterate()
+
+    def stop(self):
+        """Stop the loop once the current iteration is done."""
+        self.running = False
+
+
+class Connection(asyncore.dispatcher):
+    """A client's connection, acting as the transport of their session.
+
+    Data is written to the socket at once if it can be, and buffered until
+    the socket is writable otherwise. Like Twisted's transports, the
+    connection pauses its streaming producer once more than bufferSize
+    bytes are buffered, and resumes it once the buffer has drained.
+
+    Args:
+        sock: The connected socket.
+        session: The AsyncoreGame served.
+        loop: The EventLoop polling the connection.
+
+    Attributes:
+        bufferSize: An integer with the bytes buffered before the producer
+            is paused.
+    """
+
+    bufferSize = BUFFER_SIZE
+
+    def __init__(self, sock, session, loop):
+        asyncore.dispatcher.__init__(self, sock, loop.map)
+        self._session = session
+        self._loop = loop
+
+        # Data waiting to be sent, and its length
+        self._buffer = []
+        self._buffered = 0
+
+        # Received data not yet ending a line, and whether data is passed to
+        # the session without being split into lines
+        self._partial = ""
+        self._raw = False
+
+        # The registered producer, and whether it is paused
+        self._producer = None
+        self._producer_paused = False
+
+        # Whether the connection closes once the buffer has drained, and
+        # whether it has closed
+        self._disconnecting = False
+        self._closed = False
+
+        loop.add(self)
+
+    def write(self, data):
+        """Send data to the client.
+
+        Args:
+            data: A string with the data.
+        """
+        if not data or self._closed or self._disconnecting:
+            return
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if len(self._buffer) == 1:
+            self._send()
+            if self._buffer:
+                self._loop.set_writing(self, True)
+        if (self._buffered > self.bufferSize and
+                self._producer is not None and not self._producer_paused):
+            self._producer_paused = True
+            self._producer.pauseProducing()
+
+    def writeSequence(self, data):
+        """Send a list of strings to the client.
+
+        Args:
+            data: A list of strings, sent in order.
+        """
+        self.write("".join(data))
+
+    def buffered_bytes(self):
+        """Returns: An integer with the bytes waiting to be sent."""
+        return self._buffered
+
+    def loseConnection(self):
+        """Close the connection once the data buffered has been sent."""
+        if not self._buffer:
+            self._close()
+        else:
+            self._disconnecting = True
+
+    def abortConnection(self):
+        """Close the connection at once, discarding any data buffered."""
+        self._close()
+
+    def registerProducer(self, producer, streaming):
+        """Register a streaming producer, paused while the buffer is full.
+
+        Args:
+            producer: An object with pauseProducing, resumeProducing and
+                stopProducing methods.
+            streaming: True. Producers which are not streaming are not
+                supported.
+        """
+        self._producer = producer
+
+    def unregisterProducer(self):
+        """Stop pausing and resuming the producer."""
+        self._producer = None
+        self._producer_paused = False
+
+    def set_raw_mode(self):
+        """Pass the data received after the current line to the session's
+        rawDataReceived, instead of splitting it into lines."""
+        self._raw = True
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return bool(self._buffer)
+
+    def handle_read(self):
+        data = self.recv(READ_SIZE)
+        if data and not self._closed:
+            self._received(data)
+
+    def handle_write(self):
+        self._send()
+        if not self._buffer and not self._closed:
+            self._loop.set_writing(self, False)
+
+    def handle_close(self):
+        self._close()
+
+    def handle_error(self):
+        log.err(None, "Connection failed")
+        self._close()
+
+    def _received(self, data):
+        # Pass the data received to the session, line by line until it
+        # switches to raw mode.
+
+        session = self._session
+        if self._raw:
+            session.rawDataReceived(data)
+            return
+        lines = (self._partial + data).split(LINE_DELIMITER)
+        self._partial = lines.pop()
+        for index, line in enumerate(lines):
+            if self._closed:
+                return
+            if len(line) > MAX_LINE_LENGTH:
+                self.loseConnection()
+                return
+            session.lineReceived(line)
+            if self._raw:
+                rest = LINE_DELIMITER.join(lines[index + 1:] +
+                                           [self._partial])
+                self._partial = ""
+                if rest and not self._closed:
+                    session.rawDataReceived(rest)
+                return
+        if len(self._partial) > MAX_LINE_LENGTH:
+            self.loseConnection()
+
+    def _send(self):
+        # Send as much of the buffer as the socket takes, resuming the
+        # producer and finishing a disconnection once it has all been sent.
+
+        if not self._buffer:
+            return
+        data = "".join(self._buffer)
+        sent = self.send(data)
+        if self._closed:
+            return
+        if sent < len(data):
+            self._buffer = [data[sent:]]
+            self._buffered = len(data) - sent
+            return
+        self._buffer = []
+        self._buffered = 0
+        if self._producer_paused:
+            self._producer_paused = False
+            self._producer.resumeProducing()
+        if self._disconnecting:
+            self._close()
+
+    def _close(self):
+        # Close the socket, and tell the session once the current
+        # iteration's handlers are done, as Twisted does.
+
+        if self._closed:
+            return
+        self._closed = True
+        self._buffer = []
+        self._buffered = 0
+        self._loop.remove(self)
+        self.close()
+        self._loop.scheduler.callLater(0, self._session.connectionLost)
+
+
+class AsyncoreGame(Session):
+    """Serve a client's Session over a Connection."""
+
+    def setRawMode(self):
+        self.transport.set_raw_mode()
+
+
+class AsyncoreServer(GameServer):
+    """A GameServer whose clients connect through an EventLoop.
+
+    Args:
+        loop: The EventLoop polling clients, whose Scheduler times the
+            server's calls.
+        server_log, checkpoints: As taken by GameServer.
+    """
+
+    protocol = AsyncoreGame
+
+    def __init__(self, loop, server_log=None, checkpoints=None):
+        GameServer.__init__(self, loop.scheduler, server_log, checkpoints)
+        self.loop = loop
+
+    def listen(self, port, interface="", backlog=BACKLOG):
+        """Accept clients on a port.
+
+        Args:
+            port: An integer with the port, or 0 for any free port.
+            interface: A string with the address to listen on, or an empty
+                string for every address.
+            backlog: An integer with the connections queued until accepted.
+
+        Returns:
+            The Listener accepting clients.
+        """
+        return Listener(self, port, interface, backlog)
+
+
+class Listener(asyncore.dispatcher):
+    """Accept clients, serving each with a session of a server.
+
+    Args:
+        server: The AsyncoreServer clients connect to.
+        port, interface, backlog: As taken by AsyncoreServer.listen.
+    """
+
+    def __init__(self, server, port, interface="", backlog=BACKLOG):
+        asyncore.dispatcher.__init__(self, map=server.loop.map)
+        self._server = server
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind((interface, port))
+        self.listen(backlog)
+        server.loop.add(self)
+
+    def port(self):
+        """Returns: An integer with the port listened on."""
+        return self.socket.getsockname()[1]
+
+    def writable(self):
+        return False
+
+    def handle_accept(self):
+        server = self._server
+        for _ in xrange(ACCEPTS):
+            accepted = self.accept()
+            if accepted is None:
+                return
+            session = server.protocol()
+            session.factory = server
+            session.transport = Connection(accepted[0], session, server.loop)
+            session.connectionMade()
+
+    def handle_error(self):
+        log.err(None, "Accepting a client failed")
+
+
+def run():
+    """Run the server."""
+    server_log = open_server_log(
+        config_parse.log_file, config_parse.log_level,
+        config_parse.log_rotate_bytes, config_parse.log_sample_rate)
+    log.startLoggingWithObserver(server_log.observe_twisted,
+                                 setStdout=False)
+    checkpoints = None
+    if config_parse.checkpoint_file:
+        checkpoints = CheckpointFile(config_parse.checkpoint_file)
+
+    loop = EventLoop()
+    server = AsyncoreServer(loop, server_log, checkpoints)
+    server.listen(config_parse.port)
+    try:
+        loop.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if checkpoints is not None:
+            checkpoints.close()
+        server_log.close()
+
+if __name__ == "__main__":
+    run()
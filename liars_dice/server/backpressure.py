@@ -0,0 +1,195 @@
+"""
+
+Hold the messages of clients which are not reading them.
+
+A client's transport pauses its producer once more than the high-water mark
+of data is waiting to be written, and resumes it once the data has drained.
+While a client is paused, the server holds its messages itself rather than
+buffering them in the transport, and a policy keeps them small: chat can be
+dropped, and a PLAYER_STATUS superseded by a newer one discarded. Clients
+which stay paused too long, or whose held messages grow too large, are
+disconnected, so one slow client cannot exhaust the server's memory.
+
+"""
+from liars_dice import network_command
+
+
+class SlowClientPolicy:
+    """How the server treats clients which are not reading their messages.
+
+    Args:
+        high_water: An integer with the bytes waiting to be written to a
+            client at which the client is paused.
+        max_held_bytes: An integer with the most bytes held for a paused
+            client, after which it is disconnected.
+        timeout: A float with the seconds a client may stay paused before it
+            is disconnected, or 0 to never disconnect paused clients.
+        drop_chat: A Boolean indicating whether chat sent to paused clients
+            is dropped.
+        collapse_status: A Boolean indicating whether a PLAYER_STATUS held
+            for a paused client is discarded when a newer one is sent.
+    """
+
+    def __init__(self, high_water=65536, max_held_bytes=1048576, timeout=30.0,
+                 drop_chat=True, collapse_status=True):
+        self.high_water = high_water
+        self.max_held_bytes = max_held_bytes
+        self.timeout = timeout
+        self.drop_chat = drop_chat
+        self.collapse_status = collapse_status
+
+
+class OutboundStats:
+    """Counters of the messages held for slow clients, across a server.
+
+    Attributes:
+        held_bytes: An integer with the bytes currently held for paused
+            clients.
+        paused_clients: An integer with the number of clients currently
+            paused.
+        dropped_messages: An integer with the number of chat messages
+            dropped.
+        collapsed_messages: An integer with the number of superseded
+            PLAYER_STATUS messages discarded.
+        disconnects: An integer with the number of clients disconnected for
+            being too slow.
+    """
+
+    def __init__(self):
+        self.held_bytes = 0
+        self.paused_clients = 0
+        self.dropped_messages = 0
+        self.collapsed_messages = 0
+        self.disconnects = 0
+
+
+def transport_buffered(transport):
+    """Find the bytes waiting to be written by a transport.
+
+    Args:
+        transport: A transport, such as a twisted TCP connection or a
+            Connection of the asyncore front end.
+
+    Returns:
+        An integer with the bytes buffered by the transport, or 0 if the
+        transport does not say.
+    """
+    buffered_bytes = getattr(transport, "buffered_bytes", None)
+    if buffered_bytes is not None:
+        return buffered_bytes()
+
+    # Twisted's FileDescriptor keeps the data in two buffers, of which the
+    # first has been partially written up to offset
+    return (len(getattr(transport, "dataBuffer", "")) -
+            getattr(transport, "offset", 0) +
+            getattr(transport, "_tempDataLen", 0))
+
+
+class OutboundBuffer:
+    """Hold a client's data while its transport is paused.
+
+    The buffer is registered as the streaming producer of the client's
+    transport, which pauses it when the client falls behind.
+
+    Args:
+        transport: The transport of the client.
+        policy: The SlowClientPolicy to apply.
+        stats: The OutboundStats of the server.
+        clock: The IReactorTime timing how long the client is paused.
+        disconnect: A function called with a string with the reason, either
+            "timeout" or "held_bytes", when the client should be
+            disconnected.
+
+    Attributes:
+        paused: A Boolean indicating whether the client's data is held.
+        held_bytes: An integer with the bytes held for the client.
+    """
+
+    def __init__(self, transport, policy, stats, clock, disconnect):
+        self._transport = transport
+        self._policy = policy
+        self._stats = stats
+        self._clock = clock
+        self._disconnect = disconnect
+        self.paused = False
+        self.held_bytes = 0
+
+        # The held data, with discarded messages replaced by empty strings
+        self._held = []
+
+        # Index in _held of the last PLAYER_STATUS, if one is held
+        self._status = None
+
+        # Call disconnecting the client once the timeout has elapsed
+        self._timeout_call = None
+
+        transport.registerProducer(self, True)
+        if hasattr(transport, "bufferSize"):
+            transport.bufferSize = policy.high_water
+
+    def hold(self, data, command=None):
+        """Hold data for the paused client, applying the policy.
+
+        Args:
+            data: A string with the encoded data.
+            command: A string with the command of the message encoded, or
+                None if the data is not a single message.
+        """
+        policy = self._policy
+        if command == network_command.CHAT and policy.drop_chat:
+            self._stats.dropped_messages += 1
+            return
+        if command == network_command.PLAYER_STATUS and policy.collapse_status:
+            if self._status is not None:
+                self._add_bytes(-len(self._held[self._status]))
+                self._held[self._status] = ""
+                self._stats.collapsed_messages += 1
+            self._status = len(self._held)
+        self._held.append(data)
+        self._add_bytes(len(data))
+        if self.held_bytes > policy.max_held_bytes:
+            self._disconnect("held_bytes")
+
+    def buffered_bytes(self):
+        """Returns: An integer with the bytes held for, or waiting to be
+        written to, the client."""
+        return self.held_bytes + transport_buffered(self._transport)
+
+    def pauseProducing(self):
+        """Start holding the client's data."""
+        if self.paused:
+            return
+        self.paused = True
+        self._stats.paused_clients += 1
+        if self._policy.timeout:
+            self._timeout_call = self._clock.callLater(
+                self._policy.timeout, self._disconnect, "timeout")
+
+    def resumeProducing(self):
+        """Write the held data, and stop holding the client's data."""
+        if not self.paused:
+            return
+        held = [data for data in self._held if data]
+        self.stopProducing()
+        if held:
+            self._transport.writeSequence(held)
+
+    def stopProducing(self):
+        """Discard the held data, and stop holding the client's data."""
+        if not self.paused:
+            return
+        self.paused = False
+        self._stats.paused_clients -= 1
+        self._add_bytes(-self.held_bytes)
+        self._held = []
+        self._status = None
+        if self._timeout_call is not None:
+            if self._timeout_call.active():
+                self._timeout_call.cancel()
+            self._timeout_call = None
+
+    def _add_bytes(self, count):
+        # Count bytes held, or released if count is negative.
+
+        self.held_bytes += count
+        self._stats.held_bytes += count
@@ -0,0 +1,300 @@
+"""
+
+Checkpoint the state of every table to a memory-mapped file, so that games
+in progress survive a restart of the server.
+
+Each table has two fixed-size slots in the file, which are written in turn.
+A record holds a sequence number, a checksum and the table's game: the
+players in turn order, their hands, the round and turn players and the
+previous bid. The players and their hands are only encoded once per round,
+as most commands change the turn and the bid alone.
+
+Saving a table copies its record into the mapped pages, which the operating
+system writes back by itself, so checkpoints make no system calls while
+games are played. If the server dies while writing a record, its checksum
+no longer matches, and the table is restored from its other slot instead.
+
+Checkpoints survive the server process dying, but not the machine losing
+power before the pages are written back.
+
+"""
+import array
+import mmap
+import os
+import struct
+import zlib
+
+MAGIC = "LDCK"
+VERSION = 1
+
+# magic, version, slot size
+HEADER = struct.Struct("<4sB3xI")
+
+# sequence, checksum, payload length
+RECORD = struct.Struct("<QIH")
+
+# players, round player, turn player, bid face (0 if none), bid number
+GAME = struct.Struct("<HHHBH")
+
+SLOT_SIZE = 512
+INITIAL_TABLES = 1024
+
+NO_PLAYER = 0xffff
+
+
+def encode_players(game):
+    """Encode the players of a game and their hands.
+
+    Args:
+        game: A GameStatus.
+
+    Returns:
+        A tuple composed of a list of the usernames of the players in turn
+        order, and a string encoding them and their hands.
+    """
+    hands = list(game.get_player_hands())
+    order = [player for player, _ in hands]
+    return order, "".join((
+        "".join([chr(len(player)) + player for player in order]),
+        array.array("B", [len(hand) for _, hand in hands]).tostring(),
+        array.array("B", [face for _, hand in hands
+                          for face in hand]).tostring()))
+
+
+def encode_table(table, players=None):
+    """Encode the game of a table.
+
+    Args:
+        table: A Table from liars_dice/server/table.py.
+        players: The tuple returned by encode_players for the table's game,
+            if its players and hands have not changed since, or None.
+
+    Returns:
+        A string with the encoded game, or an empty string if the table
+        has no game in progress.
+    """
+    game = table.game
+    if not table.game_started or not game.game_running:
+        return ""
+    order, encoded = players or encode_players(game)
+    face, number = game.previous_bid or (0, 0)
+    return GAME.pack(len(order), _index(order, game.round_player()),
+                     _index(order, game.turn_player()), face,
+                     number) + encoded
+
+
+def _index(order, player):
+    # The position of a player in the turn order, or NO_PLAYER for None.
+
+    return NO_PLAYER if player is None else order.index(player)
+
+
+def decode_table(data):
+    """Decode a game encoded by encode_table.
+
+    Args:
+        data: A non-empty string returned by encode_table.
+
+    Returns:
+        A snapshot tuple, which can be given to GameStatus.restore.
+
+    Raises:
+        ValueError: The data is truncated or corrupt.
+    """
+    try:
+        players, round_index, turn_index, face, number = GAME.unpack_from(
+            data)
+        position = GAME.size
+        order = []
+        for _ in xrange(players):
+            length = ord(data[position])
+            order.append(data[position + 1:position + 1 + length])
+            position += 1 + length
+        order = tuple(order)
+        round_player = _player(order, round_index)
+        turn_player = _player(order, turn_index)
+    except (struct.error, IndexError):
+        raise ValueError("the game is truncated")
+    hand_sizes = data[position:position + players]
+    faces = data[position + players:]
+    if (len(hand_sizes) != players or
+            len(faces) != sum(array.array("B", hand_sizes))):
+        raise ValueError("the game is truncated")
+    return (order, hand_sizes, faces, round_player, turn_player,
+            (face, number) if face else None, True,
+            tuple(faces.count(chr(i)) for i in xrange(7)))
+
+
+def _player(order, index):
+    # The player at a position in the turn order, or None for NO_PLAYER.
+
+    return None if index == NO_PLAYER else order[index]
+
+
+def _checksum(payload, sequence):
+    # The checksum of a record, covering its sequence number and payload.
+
+    return zlib.crc32(payload, sequence & 0xffffffff) & 0xffffffff
+
+
+class CheckpointFile:
+    """Save and load the games of tables in a memory-mapped file.
+
+    Args:
+        path: A string with the path of the file, which is created if it
+            does not exist.
+        slot_size: An integer with the bytes given to each record. Games
+            which do not fit are not saved, and are not restored.
+
+    Attributes:
+        oversized: An integer with the number of games which did not fit in
+            a slot.
+
+    Raises:
+        ValueError: The file exists, but is not a checkpoint file with the
+            same slot size.
+    """
+
+    def __init__(self, path, slot_size=SLOT_SIZE):
+        self._slot_size = slot_size
+        self._sequence = 0
+        self.oversized = 0
+
+        # Table numbers to the value of rounds the players of their game
+        # were encoded at, and the tuple given by encode_players
+        self._players = {}
+
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, "r+b" if exists else "w+b")
+        if not exists:
+            self._file.write(HEADER.pack(MAGIC, VERSION, slot_size))
+            self._file.truncate(self._offset(2 * INITIAL_TABLES))
+            self._file.flush()
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, version, file_slot_size = HEADER.unpack_from(self._map)
+        if (magic, version, file_slot_size) != (MAGIC, VERSION, slot_size):
+            self.close()
+            raise ValueError(path + " is not a checkpoint file with " +
+                             str(slot_size) + " byte slots")
+
+        # Per table, the slot (0 or 1) to write next
+        self._next_slot = array.array("B", [0]) * self._capacity()
+
+        # The newest payload of each table, until loaded
+        self._saved = self._scan()
+
+    def save(self, table):
+        """Save the game of a table, replacing its previous checkpoint.
+
+        Args:
+            table: A Table with a number.
+        """
+        number = table.number
+        payload = ""
+        if table.game_started:
+            rounds, players = self._players.get(number, (None, None))
+            if rounds != table.rounds:
+                players = encode_players(table.game)
+                self._players[number] = table.rounds, players
+            payload = encode_table(table, players)
+        if len(payload) > self._slot_size - RECORD.size:
+            self.oversized += 1
+            table.log.warning("checkpoint_oversized", size=len(payload))
+            payload = ""
+        if number >= len(self._next_slot):
+            self._grow(number + 1)
+        slot = self._next_slot[number]
+        self._next_slot[number] = 1 - slot
+        self._sequence += 1
+
+        # The payload is written before the header, so that a record is only
+        # valid once complete
+        offset = self._offset(2 * number + slot)
+        start = offset + RECORD.size
+        self._map[start:start + len(payload)] = payload
+        RECORD.pack_into(self._map, offset, self._sequence,
+                         _checksum(payload, self._sequence), len(payload))
+
+    def load(self):
+        """Load the games saved in the file when it was opened.
+
+        Returns:
+            A list of (table number, snapshot) tuples for the tables which
+            had a game in progress, ordered by table number. Each snapshot
+            can be given to GameStatus.restore. Games which cannot be
+            decoded are skipped.
+        """
+        games = []
+        for number, payload in self._saved:
+            try:
+                games.append((number, decode_table(payload)))
+            except ValueError:
+                pass
+        self._saved = []
+        return games
+
+    def close(self):
+        """Write the file back, and close it."""
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+
+    def _scan(self):
+        # Find the newest record of every table, and continue the sequence
+        # after the newest of all.
+        #
+        # Returns:
+        #     A list of (table number, payload) tuples, ordered by table
+        #     number, for the tables whose newest payload is not empty.
+
+        saved = []
+        next_slot = self._next_slot
+        for number in xrange(self._capacity()):
+            newest = None
+            for slot in (0, 1):
+                record = self._read(2 * number + slot)
+                if record is not None and (newest is None or
+                                           record[0] > newest[0]):
+                    newest = record + (slot,)
+            if newest is None:
+                continue
+            sequence, payload, slot = newest
+            next_slot[number] = 1 - slot
+            self._sequence = max(self._sequence, sequence)
+            if payload:
+                saved.append((number, payload))
+        return saved
+
+    def _read(self, index):
+        # Read the record in a slot.
+        #
+        # Returns:
+        #     A (sequence, payload) tuple, or None if the slot holds no valid
+        #     record.
+
+        offset = self._offset(index)
+        sequence, checksum, length = RECORD.unpack_from(self._map, offset)
+        if not sequence or length > self._slot_size - RECORD.size:
+            return None
+        start = offset + RECORD.size
+        payload = self._map[start:start + length]
+        if _checksum(payload, sequence) != checksum:
+            return None
+        return sequence, payload
+
+    def _offset(self, index):
+        # The position in the file of a slot.
+
+        return HEADER.size + index * self._slot_size
+
+    def _capacity(self):
+        # The number of tables with slots in the file.
+
+        return (len(self._map) - HEADER.size) // (2 * self._slot_size)
+
+    def _grow(self, tables):
+        # Extend the file to hold slots for at least a number of tables.
+
+        capacity = max(tables, 2 * self._capacity())
+        self._map.resize(self._offset(2 * capacity))
+        self._next_slot.extend([0] * (capacity - len(self._next_slot)))
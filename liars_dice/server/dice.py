@@ -0,0 +1,134 @@
+"""
+
+Sources of die faces, generated in bulk.
+
+A DiceSource reads random bytes from a backend into a buffer, many at a time,
+and turns them into faces with a single string translation, so rolling a hand
+or a whole table costs a slice of the buffer rather than a function call per
+die.
+
+"""
+from array import array
+import binascii
+import os
+import random
+
+# Bytes below 252 are mapped to faces 1 - 6, the rest are discarded so each
+# face is equally likely.
+_FACE_TABLE = "".join(chr(b % 6 + 1) for b in xrange(256))
+_DISCARDED = "".join(chr(b) for b in xrange(252, 256))
+
+
+class PseudoRandomBackend:
+    """Generate reproducible random bytes with a seeded Mersenne Twister.
+
+    Args:
+        seed: A hashable object to seed the generator with, or None to seed
+            it from the operating system.
+    """
+
+    def __init__(self, seed=None):
+        self._random = random.Random(seed)
+
+    def read(self, size):
+        """Generate random bytes.
+
+        Args:
+            size: An integer with the number of bytes to generate.
+
+        Returns:
+            A string of size random bytes.
+        """
+        bits = self._random.getrandbits(size * 8)
+        return binascii.unhexlify("%0*x" % (size * 2, bits))
+
+
+class SystemRandomBackend:
+    """Generate random bytes with the operating system's CSPRNG.
+
+    Intended for ranked tables, where dice must not be predictable. Games
+    using this backend cannot be reproduced from a seed.
+
+    Args:
+        seed: Must be None.
+
+    Raises:
+        ValueError: A seed was given.
+    """
+
+    def __init__(self, seed=None):
+        if seed is not None:
+            raise ValueError("the system random backend cannot be seeded")
+
+    def read(self, size):
+        """Generate random bytes.
+
+        Args:
+            size: An integer with the number of bytes to generate.
+
+        Returns:
+            A string of size random bytes.
+        """
+        return os.urandom(size)
+
+
+# Backends by the name used to select them in config.ini
+BACKENDS = {
+    "pseudorandom": PseudoRandomBackend,
+    "system": SystemRandomBackend,
+}
+
+
+class DiceSource:
+    """Supply die faces from a buffer refilled in bulk.
+
+    Args:
+        seed: A hashable object to seed the backend with, or None. Two
+            sources with the same seed and backend roll the same faces.
+        backend: A backend class, such as PseudoRandomBackend or
+            SystemRandomBackend.
+    """
+    BUFFER_SIZE = 4096  # bytes drawn from the backend at a time
+
+    def __init__(self, seed=None, backend=PseudoRandomBackend):
+        self._backend = backend(seed)
+        self._buffer = ""
+        self._position = 0
+
+    def roll(self, count):
+        """Roll a number of dice.
+
+        Args:
+            count: An integer with the number of dice to roll.
+
+        Returns:
+            An array('B') of count integers between 1 - 6 (inclusive).
+        """
+        end = self._position + count
+        if end > len(self._buffer):
+            self._refill(count)
+            end = count
+        faces = array("B", self._buffer[self._position:end])
+        self._position = end
+        return faces
+
+    def _refill(self, count):
+        # Replace the buffer with fresh faces, keeping the unused ones.
+        #
+        # Args:
+        #     count: An integer with the minimum number of faces required.
+
+        faces = [self._buffer[self._position:]]
+        available = len(faces[0])
+        while available < count:
+            size = max(self.BUFFER_SIZE, count - available)
+            chunk = self._backend.read(size).translate(_FACE_TABLE,
+                                                       _DISCARDED)
+            faces.append(chunk)
+            available += len(chunk)
+        self._buffer = "".join(faces)
+        self._position = 0
+
+
+# Shared by all games not given a DiceSource of their own
+default_source = DiceSource()
@@ -0,0 +1,261 @@
+"""
+
+Record games as append-only logs of fixed-width binary records, and replay
+them.
+
+Every record is RECORD_SIZE bytes: an event type, a small argument, the seat
+of the player concerned and a large argument. Players are given seats in the
+order they join. A JOIN record is followed by the player's username, padded
+with null bytes to a whole number of records. A ROUND record is followed by a
+HAND record for each player in turn order, with the faces packed 3 bits each.
+
+"""
+import os
+import struct
+import tempfile
+import time
+from liars_dice.server.game import CompactGameStatus
+
+# Event types
+JOIN = 1  # large argument: username length
+ROUND = 2  # seat: round player
+HAND = 3  # argument: number of dice, large argument: packed faces
+BID = 4  # argument: face, large argument: number
+LIAR = 5
+SPOT_ON = 6
+DIE_LOST = 7
+ELIMINATED = 8
+LEFT = 9
+WINNER = 10
+
+# type, argument, seat, large argument
+RECORD = struct.Struct("<BBHI")
+RECORD_SIZE = RECORD.size
+
+FACE_BITS = 3
+
+
+class EventLog:
+    """Write the events of a single game to a log.
+
+    Args:
+        log_file: A file opened for writing in binary mode, or a function
+            opening one, which is called when the first event is written.
+            Writes are buffered by the file, and flushed at the start of
+            each round and when the game is won.
+    """
+
+    def __init__(self, log_file):
+        if callable(log_file):
+            self._open, self._file = log_file, None
+        else:
+            self._open, self._file = None, log_file
+        self._seats = {}
+
+    def join(self, player):
+        """Record a player joining the game."""
+        seat = self._seats[player] = len(self._seats)
+        padding = -len(player) % RECORD_SIZE
+        self._write(RECORD.pack(JOIN, 0, seat, len(player)) + player +
+                    "\0" * padding)
+
+    def new_round(self, status):
+        """Record the start of a round, including every player's hand.
+
+        Args:
+            status: The GameStatus after its next_round method was called.
+        """
+        records = [RECORD.pack(ROUND, 0, self._seats[status.turn_player()], 0)]
+        for player, hand in status.get_player_hands():
+            packed = 0
+            for face in reversed(hand):
+                packed = packed << FACE_BITS | face
+            records.append(RECORD.pack(HAND, len(hand), self._seats[player],
+                                       packed))
+        self._write("".join(records))
+        self._file.flush()
+
+    def bid(self, player, face, number):
+        """Record a valid bid."""
+        self._write(RECORD.pack(BID, face, self._seats[player], number))
+
+    def liar(self, player):
+        """Record a 'Liar!' declaration."""
+        self._write(RECORD.pack(LIAR, 0, self._seats[player], 0))
+
+    def spot_on(self, player):
+        """Record a 'Spot On!' declaration."""
+        self._write(RECORD.pack(SPOT_ON, 0, self._seats[player], 0))
+
+    def die_lost(self, player):
+        """Record a player losing a die."""
+        self._write(RECORD.pack(DIE_LOST, 0, self._seats[player], 0))
+
+    def eliminated(self, player):
+        """Record a player being eliminated."""
+        self._write(RECORD.pack(ELIMINATED, 0, self._seats[player], 0))
+
+    def left(self, player):
+        """Record a player leaving the game."""
+        self._write(RECORD.pack(LEFT, 0, self._seats[player], 0))
+
+    def winner(self, player):
+        """Record a player winning the game, and flush the log."""
+        self._write(RECORD.pack(WINNER, 0, self._seats[player], 0))
+        self._file.flush()
+
+    def close(self):
+        """Close the log, if it was opened."""
+        if self._file is not None:
+            self._file.close()
+
+    def _write(self, data):
+        # Append data to the log, opening it if this is the first event.
+
+        if self._file is None:
+            self._file = self._open()
+        self._file.write(data)
+
+
+class NullEventLog(EventLog):
+    """An EventLog which discards every event, for when logging is disabled."""
+
+    def __init__(self):
+        EventLog.__init__(self, None)
+
+    def join(self, player):
+        pass
+
+    def new_round(self, status):
+        pass
+
+    def bid(self, player, face, number):
+        pass
+
+    def liar(self, player):
+        pass
+
+    def spot_on(self, player):
+        pass
+
+    def die_lost(self, player):
+        pass
+
+    def eliminated(self, player):
+        pass
+
+    def left(self, player):
+        pass
+
+    def winner(self, player):
+        pass
+
+    def close(self):
+        pass
+
+
+def open_event_log(directory, table=None):
+    """Create a log for a new game.
+
+    The log's file is only created when its first event is written, with a
+    name unique to it, starting with the time and the table's number.
+
+    Args:
+        directory: A string with the directory to create the log in, or an
+            empty string if events should not be logged.
+        table: An integer with the number of the game's table, or None.
+
+    Returns:
+        An EventLog, or a NullEventLog if directory is empty.
+    """
+    if not directory:
+        return NullEventLog()
+
+    def create():
+        prefix = "game-%s-" % time.strftime("%Y%m%d-%H%M%S")
+        if table is not None:
+            prefix += "%d-" % table
+        descriptor, _ = tempfile.mkstemp(".log", prefix, directory)
+        return os.fdopen(descriptor, "wb")
+
+    return EventLog(create)
+
+
+def read_events(data):
+    """Decode the events of a log.
+
+    Args:
+        data: A string with the contents of a log.
+
+    Yields:
+        (event type, username, argument, large argument) tuples. For HAND
+        events, the large argument is a list of the faces of the hand.
+
+    Raises:
+        ValueError: The log is truncated or corrupt.
+    """
+    if len(data) % RECORD_SIZE:
+        raise ValueError("the log is truncated")
+    usernames = []
+    unpack = RECORD.unpack_from
+    position = 0
+    end = len(data)
+    while position < end:
+        event, argument, seat, large = unpack(data, position)
+        position += RECORD_SIZE
+
+        if event == JOIN:
+            usernames.append(data[position:position + large])
+            position += large + (-large % RECORD_SIZE)
+            yield event, usernames[seat], argument, large
+        elif event == HAND:
+            hand = [(large >> (FACE_BITS * i)) & 7 for i in xrange(argument)]
+            yield event, usernames[seat], argument, hand
+        elif event <= WINNER:
+            yield event, usernames[seat], argument, large
+        else:
+            raise ValueError("unknown event type: " + str(event))
+
+
+def replay(data, status_class=CompactGameStatus):
+    """Rebuild a game from its log.
+
+    Args:
+        data: A string with the contents of a log.
+        status_class: The GameStatus class (or subclass) to rebuild. The
+            default, CompactGameStatus, replays several times faster than
+            GameStatus.
+
+    Returns:
+        A status_class object in the state after the last event.
+
+    Raises:
+        ValueError: The log is truncated or corrupt, or a die was recorded
+            as lost by a different player to the one the rules give.
+    """
+    status = status_class()
+    loser = None
+    for event, player, argument, large in read_events(data):
+        if event == HAND:
+            status.set_hand(player, large)
+        elif event == BID:
+            status.handle_bid(argument, large)
+            status.next_turn()
+        elif event == LIAR:
+            loser, _ = status.handle_liar()
+        elif event == SPOT_ON:
+            loser, _ = status.handle_spot_on()
+        elif event == DIE_LOST:
+            if player != loser:
+                raise ValueError("die lost by " + player + " rather than " +
+                                 str(loser))
+        elif event == ROUND:
+            status.next_round()
+            status.previous_bid = None
+        elif event == JOIN:
+            status.add_player(player)
+        elif event == LEFT:
+            status.remove_player(player)
+        elif event == WINNER:
+            status.stop()
+    return status
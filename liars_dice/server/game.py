@@ -3,20 +3,30 @@
 Handle the actual game components.
 
 """
+from array import array
+from itertools import chain, izip
 from random import randint
 import collections
+import copy
+from liars_dice import bids
+from liars_dice.server.dice import default_source
 
 
 class Die:
     """Manage a single die.
 
+    Args:
+        face: An integer between 1 - 6 (inclusive) to give the die, or None
+            to roll it.
+
     Attributes:
         face: An integer between 1 - 6 (inclusive) with the die's value.
     """
 
-    def __init__(self):
-        self.face = None  # properly assigned in roll
-        self.roll()
+    def __init__(self, face=None):
+        self.face = face
+        if face is None:
+            self.roll()
 
     def roll(self):
         """Roll the die. Changes the value of the face attribute."""
@@ -26,15 +36,20 @@ class Die:
 class Hand:
     """Manage a player's hand.
 
+    Args:
+        faces: A sequence of integers with the face value of each die in the
+            hand, or None for INITIAL_HAND_SIZE rolled dice.
+
     Attributes:
         hand: A list containing the dice in a player's hand.
     """
     INITIAL_HAND_SIZE = 5
 
-    def __init__(self):
-        self.hand = []
-        for i in xrange(self.INITIAL_HAND_SIZE):
-            self.hand.append(Die())
+    def __init__(self, faces=None):
+        if faces is None:
+            self.hand = [Die() for _ in xrange(self.INITIAL_HAND_SIZE)]
+        else:
+            self.hand = [Die(face) for face in faces]
 
     def have_die(self):
         """Determine whether the player has at least 1 die in their hand.
@@ -58,28 +73,127 @@ class Hand:
         return [die.face for die in self.hand]
 
 
+class SeatRing:
+    """Seat players in turn order around a circular, doubly linked list.
+
+    Seating, unseating and finding the neighbours of a player all take
+    constant time, regardless of the number of players.
+
+    Attributes:
+        first: A string with the username of the earliest seated player still
+            at the table, or None if there are no players.
+    """
+
+    def __init__(self):
+        self.first = None
+        self._next = {}
+        self._previous = {}
+
+    def __len__(self):
+        return len(self._next)
+
+    def __contains__(self, player):
+        return player in self._next
+
+    def __iter__(self):
+        # Players in turn order, starting with the first player
+        player = self.first
+        for _ in xrange(len(self._next)):
+            yield player
+            player = self._next[player]
+
+    def seat(self, player):
+        """Seat a player, immediately before the first player.
+
+        Args:
+            player: A string with the username of the player to be seated.
+        """
+        if self.first is None:
+            self.first = player
+            self._next[player] = self._previous[player] = player
+        else:
+            last = self._previous[self.first]
+            self._next[last] = self._previous[self.first] = player
+            self._next[player] = self.first
+            self._previous[player] = last
+
+    def unseat(self, player):
+        """Remove a player from the table.
+
+        Args:
+            player: A string with the username of the player to be removed.
+        """
+        next_player = self._next.pop(player)
+        previous_player = self._previous.pop(player)
+        if next_player == player:
+            self.first = None
+        else:
+            self._next[previous_player] = next_player
+            self._previous[next_player] = previous_player
+            if self.first == player:
+                self.first = next_player
+
+    def copy(self):
+        """Copy the seating, such that changes to the copy do not affect the
+        original.
+
+        Returns:
+            A SeatRing with the same players in the same order.
+        """
+        seats = SeatRing()
+        seats.first = self.first
+        seats._next = self._next.copy()
+        seats._previous = self._previous.copy()
+        return seats
+
+    def next(self, player):
+        """Find the player seated after a player.
+
+        Args:
+            player: A string with the username of a seated player.
+
+        Returns:
+            A string with the username of the next player.
+        """
+        return self._next[player]
+
+    def previous(self, player):
+        """Find the player seated before a player.
+
+        Args:
+            player: A string with the username of a seated player.
+
+        Returns:
+            A string with the username of the previous player.
+        """
+        return self._previous[player]
+
+
 class GameStatus:
     """Provide functionality for manipulating the game's status.
 
     Args:
         players: A dictionary of strings of players mapping to their
             corresponding Hand object.
-        player_order: A list of players in turn order. However, the turn player
-            is not necessarily the first element.
+        seats: A SeatRing of players in turn order. However, the turn player
+            is not necessarily the first player.
         previous_bid: A tuple of 2 integers, indicating the die face and
             number of the previous bid.
         game_running: A Boolean indicating whether the game is still
             running.
+        dice: A DiceSource used to roll the dice of all players. Unless one
+            is given, a DiceSource shared by all games is used.
     """
 
-    def __init__(self):
+    def __init__(self, dice=None):
         self.players = {}
-        self.player_order = []
-        self._round_player_index = -1  # used in round-related methods
-        self._turn_player_index = -1  # used in round and turn-related methods
+        self.seats = SeatRing()
+        self._round_player = None  # player who started the round
+        self._turn_player = None  # set by next_round
         self._dice_count = collections.Counter()
         self.previous_bid = None  # after bids are made, will be (face, number)
         self.game_running = True
+        self.dice = dice if dice is not None else default_source
 
     def remove_die(self, player):
         """Remove a die from the player's hand.
@@ -107,8 +221,8 @@ class GameStatus:
         Args:
             player: A string with the username of the player to be added.
         """
-        self.players[player] = Hand()
-        self.player_order += (player,)
+        self.players[player] = Hand(self.dice.roll(Hand.INITIAL_HAND_SIZE))
+        self.seats.seat(player)
         self._dice_count += collections.Counter(self.players[player].die_face())
 
     def remove_player(self, player):
@@ -118,27 +232,47 @@ class GameStatus:
             player: A string with the username of the player to be removed.
         """
         self._dice_count -= collections.Counter(self.players[player].die_face())
+        self._unseat(player)
+
+    def _unseat(self, player):
+        # Remove the player from the turn order. If they were the turn or
+        # round player, the turn or round passes back to the previous player,
+        # so that the next turn or round goes to the player after them.
+        #
+        # Args:
+        #     player: A string with the username of the player to be removed.
 
-        # Adjust to handle turn being removed
-        if self.turn_player() == player:
-            self._turn_player_index -= 1
+        previous_player = self.seats.previous(player)
+        if previous_player == player:
+            previous_player = None  # no players remain
 
-        # Round players
-        round_index = self._round_player_index % len(self.player_order)
-        if self.player_order[round_index] == player:
-            self._round_player_index -= 1
+        if self._turn_player == player:
+            self._turn_player = previous_player
+        if self._round_player == player:
+            self._round_player = previous_player
 
         del self.players[player]
-        order_index = self.player_order.index(player)
-        self.player_order = (self.player_order[:order_index] +
-                             self.player_order[order_index + 1:])
+        self.seats.unseat(player)
 
     def roll_all(self):
         """Roll the hands of all players."""
-        self._dice_count = collections.Counter()
-        for hand in self.players.itervalues():
-            hand.roll()
-            self._dice_count += collections.Counter(hand.die_face())
+        hands = [self.players[player].hand for player in self.seats]
+        faces = self.dice.roll(sum(len(hand) for hand in hands))
+        for die, face in izip(chain.from_iterable(hands), faces):
+            die.face = face
+        self._dice_count = collections.Counter(faces)
+
+    def set_hand(self, player, faces):
+        """Replace the dice in a player's hand, such as when replaying a game.
+
+        Args:
+            player: A string with the username of the player.
+            faces: A sequence of integers with the face value of each die.
+        """
+        old_faces = self.players[player].die_face()
+        self._dice_count -= collections.Counter(old_faces)
+        self.players[player] = Hand(faces)
+        self._dice_count += collections.Counter(faces)
 
     def get_winner(self):
         """Determine the winner of the game, if any.
@@ -157,10 +291,19 @@ class GameStatus:
         """Determine the player whose turn it is.
 
         Returns:
-            A string with the username of the current turn player.
+            A string with the username of the current turn player, or None if
+            the game has not begun.
         """
-        i = self._turn_player_index % len(self.player_order)
-        return self.player_order[i]
+        return self._turn_player
+
+    def round_player(self):
+        """Determine the player who started the current round.
+
+        Returns:
+            A string with the username of the round player, or None if the
+            game has not begun.
+        """
+        return self._round_player
 
     def turn_player_previous(self):
         """Determine the player whose turn it was last turn.
@@ -171,8 +314,7 @@ class GameStatus:
         Returns:
             A string with the username of the previous turn player.
         """
-        i = (self._turn_player_index - 1) % len(self.player_order)
-        return self.player_order[i]
+        return self.seats.previous(self._turn_player)
 
     def get_player_hands(self):
         """Provide information on player hands.
@@ -182,7 +324,7 @@ class GameStatus:
             usernames and the face value of the dice in their hand.
         """
         return ((player, self.players[player].die_face())
-                for player in self.player_order)
+                for player in self.seats)
 
     def get_player_status(self):
         """Provide information on the current game state.
@@ -195,11 +337,20 @@ class GameStatus:
             necessarily correspond with the turn player.
         """
         return [(player, len(self.players[player].hand))
-                for player in self.player_order]
+                for player in self.seats]
+
+    def total_dice(self):
+        """Returns: An integer with the number of dice held by all
+        players."""
+        return sum(self._dice_count.itervalues())
 
     def handle_bid(self, face, number):
         """Resolve bids made by the turn player.
 
+        Bids for more dice than are in play can never be correct, and are
+        invalid, so every valid bid fits the binary protocol and the
+        checkpoints.
+
         Args:
             face: An integer with the die value bid.
             number: An integer with the number of dice bid.
@@ -209,17 +360,15 @@ class GameStatus:
         """
         # Grab previous bid
         if self.previous_bid is not None:
-            old_face, old_number = self.previous_bid
+            old_code = bids.encode(*self.previous_bid)
         else:
             # allows any combination of face and number that are in the
             # valid range
-            old_face, old_number = (-1, -1)
+            old_code = bids.NO_BID
 
         # Handle the current bid
-        valid_range = number >= 1 and 1 <= face <= 6
-        allowed_bid = (number > old_number or
-                       (face > old_face and number == old_number))
-        if valid_range and allowed_bid:
+        if (bids.is_valid(face, number, self.total_dice()) and
+                bids.encode(face, number) > old_code):
             self.previous_bid = (face, number)
             return True
         else:
@@ -272,15 +421,243 @@ class GameStatus:
         return player, eliminated
 
     def next_round(self):
-        """Move play to the next round."""
-        self._round_player_index += 1
-        self._turn_player_index = self._round_player_index
+        """Move play to the next round.
+
+        The round is started by the player after the one who started the
+        previous round, or by the first player if this is the first round.
+        """
+        if self._round_player is None:
+            self._round_player = self.seats.first
+        else:
+            self._round_player = self.seats.next(self._round_player)
+        self._turn_player = self._round_player
         self.roll_all()
 
     def next_turn(self):
         """Move play to the next turn."""
-        self._turn_player_index += 1
+        self._turn_player = self.seats.next(self._turn_player)
 
     def stop(self):
         """Stops the game."""
         self.game_running = False
+
+    def snapshot(self):
+        """Encode the game state.
+
+        The DiceSource is not included, as it is not owned by the game.
+
+        Returns:
+            A tuple of immutable values which can be given to restore. The
+            encoding is shared with CompactGameStatus, so either class can
+            restore the snapshot of the other.
+        """
+        order = tuple(self.seats)
+        hands = [self.players[player].die_face() for player in order]
+        return (order,
+                array("B", [len(hand) for hand in hands]).tostring(),
+                array("B", list(chain.from_iterable(hands))).tostring(),
+                self._round_player, self._turn_player, self.previous_bid,
+                self.game_running,
+                tuple(self._dice_count[face] for face in xrange(7)))
+
+    def restore(self, snapshot):
+        """Replace the game state with one encoded by snapshot.
+
+        Args:
+            snapshot: A tuple returned by snapshot.
+        """
+        (order, hand_sizes, faces, self._round_player, self._turn_player,
+         self.previous_bid, self.game_running, dice_count) = snapshot
+        self.seats = SeatRing()
+        for player in order:
+            self.seats.seat(player)
+        self._restore_dice(order, array("B", hand_sizes), array("B", faces),
+                           dice_count)
+
+    def _restore_dice(self, order, hand_sizes, faces, dice_count):
+        # Replace the hands and dice tally with those from a snapshot.
+        #
+        # Args:
+        #     order: A tuple of the usernames of the players in turn order.
+        #     hand_sizes: An array('B') with the number of dice of each
+        #         player, in turn order.
+        #     faces: An array('B') with the faces of all dice, in turn order.
+        #     dice_count: A tuple with the number of dice showing each face,
+        #         indexed by face.
+
+        self.players = {}
+        start = 0
+        for player, size in izip(order, hand_sizes):
+            self.players[player] = Hand(faces[start:start + size])
+            start += size
+        self._dice_count = collections.Counter(
+            dict((face, n) for face, n in enumerate(dice_count) if n))
+
+    def clone(self):
+        """Copy the game, such that changes to the copy do not affect the
+        original.
+
+        Returns:
+            An object of the same class with the same state, sharing the
+            DiceSource.
+        """
+        status = copy.copy(self)
+        status.seats = self.seats.copy()
+        self._clone_dice(status)
+        return status
+
+    def _clone_dice(self, status):
+        # Copy the hands and dice tally into another game.
+        #
+        # Args:
+        #     status: The GameStatus receiving the copies.
+
+        status.players = dict(
+            (player, Hand(hand.die_face()))
+            for player, hand in self.players.iteritems())
+        status._dice_count = self._dice_count.copy()
+
+
+class CompactGameStatus(GameStatus):
+    """A GameStatus storing all dice in flat arrays rather than Hand objects.
+
+    Intended for servers hosting many tables in a single process. Each player
+    is given a fixed slot of Hand.INITIAL_HAND_SIZE bytes in a single array of
+    faces, and the face tally is a fixed 7 element array indexed by face
+    (index 0 is unused). The public interface is identical to GameStatus,
+    except that players maps usernames to slot numbers instead of Hand
+    objects.
+
+    Args:
+        players: A dictionary of strings of players mapping to their slot
+            number in the face array.
+    """
+
+    def __init__(self, dice=None):
+        GameStatus.__init__(self, dice)
+        self._faces = array("B")  # Hand.INITIAL_HAND_SIZE bytes per slot
+        self._hand_sizes = array("B")  # number of dice held, per slot
+        self._dice_count = array("L", [0] * 7)
+
+    def remove_die(self, player):
+        slot = self.players[player]
+        size = self._hand_sizes[slot] - 1
+        removed = self._faces[slot * Hand.INITIAL_HAND_SIZE + size]
+        self._dice_count[removed] -= 1
+        self._hand_sizes[slot] = size
+
+        # Remove eliminated players
+        if size == 0:
+            self.remove_player(player)
+            return True
+        return False
+
+    def add_player(self, player):
+        slot = len(self._hand_sizes)
+        faces = self.dice.roll(Hand.INITIAL_HAND_SIZE)
+        self._faces.extend(faces)
+        self._hand_sizes.append(Hand.INITIAL_HAND_SIZE)
+        for face in faces:
+            self._dice_count[face] += 1
+
+        self.players[player] = slot
+        self.seats.seat(player)
+
+    def remove_player(self, player):
+        slot = self.players[player]
+        offset = slot * Hand.INITIAL_HAND_SIZE
+        for i in xrange(offset, offset + self._hand_sizes[slot]):
+            self._dice_count[self._faces[i]] -= 1
+        self._hand_sizes[slot] = 0
+        self._unseat(player)
+
+    def roll_all(self):
+        faces = self._faces
+        sizes = self._hand_sizes
+        slots = [self.players[player] for player in self.seats]
+        rolled = self.dice.roll(sum(sizes[slot] for slot in slots))
+
+        start = 0
+        for slot in slots:
+            offset = slot * Hand.INITIAL_HAND_SIZE
+            end = start + sizes[slot]
+            faces[offset:offset + sizes[slot]] = rolled[start:end]
+            start = end
+        self._dice_count = array(
+            "L", [0] + [rolled.count(face) for face in xrange(1, 7)])
+
+    def set_hand(self, player, faces):
+        """Replace the dice in a player's hand, such as when replaying a game.
+
+        Args:
+            player: A string with the username of the player.
+            faces: A sequence of integers with the face value of each die.
+
+        Raises:
+            ValueError: There are more dice than fit in a hand.
+        """
+        if len(faces) > Hand.INITIAL_HAND_SIZE:
+            raise ValueError("a hand holds at most " +
+                             str(Hand.INITIAL_HAND_SIZE) + " dice")
+        slot = self.players[player]
+        offset = slot * Hand.INITIAL_HAND_SIZE
+        for i in xrange(offset, offset + self._hand_sizes[slot]):
+            self._dice_count[self._faces[i]] -= 1
+        self._faces[offset:offset + len(faces)] = array("B", faces)
+        self._hand_sizes[slot] = len(faces)
+        for face in faces:
+            self._dice_count[face] += 1
+
+    def get_player_hands(self):
+        return ((player, self._hand(self.players[player]))
+                for player in self.seats)
+
+    def get_player_status(self):
+        return [(player, self._hand_sizes[self.players[player]])
+                for player in self.seats]
+
+    def total_dice(self):
+        return sum(self._dice_count)
+
+    def snapshot(self):
+        faces = self._faces
+        sizes = self._hand_sizes
+        order = tuple(self.seats)
+        slots = [self.players[player] for player in order]
+        return (order,
+                array("B", [sizes[slot] for slot in slots]).tostring(),
+                "".join(faces[slot * Hand.INITIAL_HAND_SIZE:
+                              slot * Hand.INITIAL_HAND_SIZE + sizes[slot]]
+                        .tostring() for slot in slots),
+                self._round_player, self._turn_player, self.previous_bid,
+                self.game_running, tuple(self._dice_count))
+
+    def _restore_dice(self, order, hand_sizes, faces, dice_count):
+        self.players = dict((player, slot) for slot, player in
+                            enumerate(order))
+        self._hand_sizes = hand_sizes
+        self._faces = array("B", [0] * (len(order) * Hand.INITIAL_HAND_SIZE))
+        start = 0
+        for slot, size in enumerate(hand_sizes):
+            offset = slot * Hand.INITIAL_HAND_SIZE
+            self._faces[offset:offset + size] = faces[start:start + size]
+            start += size
+        self._dice_count = array("L", dice_count)
+
+    def _clone_dice(self, status):
+        status.players = self.players.copy()
+        status._faces = self._faces[:]
+        status._hand_sizes = self._hand_sizes[:]
+        status._dice_count = self._dice_count[:]
+
+    def _hand(self, slot):
+        # Provide the face values of the dice held in a slot.
+        #
+        # Args:
+        #     slot: An integer with the player's slot number.
+        #
+        # Returns:
+        #     A list of integers with the face value of all the dice.
+
+        offset = slot * Hand.INITIAL_HAND_SIZE
+        return self._faces[offset:offset + self._hand_sizes[slot]].tolist()
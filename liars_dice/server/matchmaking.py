@@ -0,0 +1,185 @@
+"""
+
+Seat waiting players at tables, and start their games, automatically.
+
+With matchmaking, players who send their username wait in a queue instead
+of joining the open table. Players are grouped by the kind of player they
+say they are with the QUEUE command, such as "bot" or "human", and by the
+band their rating falls in. As soon as a group has a table's worth of
+players, they are seated at a table of their own and their game starts.
+Once a player has waited long enough, their group's game starts with however
+many players it has, if at least two. A player still alone is matched with
+players of the same kind from the nearest rating bands instead, or keeps
+waiting if there are none. Servers with matchmaking offer the QUEUE command
+in their USERNAME requests, and clients only send it once offered.
+
+"""
+import itertools
+
+MIN_PLAYERS = 2
+
+
+class Waiting:
+    """A player waiting for a game.
+
+    Attributes:
+        client: The Session of the player.
+        username: A string with the username of the player.
+        kind: A string with the kind of player.
+        band: An integer with the rating band of the player, or None if
+            they are not grouped by rating.
+        order: An integer ordering players by when they joined the queue.
+        timer: The Timer of the player's wait, or None if there is none.
+    """
+
+    def __init__(self, client, username, kind, band, order):
+        self.client = client
+        self.username = username
+        self.kind = kind
+        self.band = band
+        self.order = order
+        self.timer = None
+
+
+class Matchmaker:
+    """Queue waiting players, and form tables of them.
+
+    Args:
+        table_size: An integer with the players seated at each table.
+        max_wait: A float with the seconds a player waits before their group
+            starts with fewer players, or 0 to always wait for a full table.
+        rating_band: An integer with the width of the rating bands players
+            are grouped by, or 0 to ignore ratings.
+        timers: The TimerWheel timing waits.
+        start: A function called with a list of the Waiting players of each
+            table formed, in the order they joined the queue.
+
+    Attributes:
+        matched: An integer with the number of tables formed.
+    """
+
+    def __init__(self, table_size, max_wait, rating_band, timers, start):
+        self._table_size = table_size
+        self._max_wait = max_wait
+        self._rating_band = rating_band
+        self._timers = timers
+        self._start = start
+        self._order = itertools.count()
+        self.matched = 0
+
+        # Groups of players by (kind, band), each a dictionary of clients to
+        # their Waiting player
+        self._groups = {}
+
+        # Every Waiting player, by client and by username
+        self._clients = {}
+        self._usernames = {}
+
+    def __contains__(self, client):
+        return client in self._clients
+
+    def waiting(self):
+        """Returns: An integer with the number of players waiting."""
+        return len(self._clients)
+
+    def join(self, client, username, kind="", rating=None):
+        """Add a player to the queue, forming a table if their group is
+        full.
+
+        Args:
+            client: The Session of the player, which is not waiting.
+            username: A string with the username of the player.
+            kind: A string with the kind of player.
+            rating: An integer with the rating of the player, or None if
+                they have none.
+
+        Returns:
+            A Boolean indicating whether the player joined, which they do
+            not if another player waiting has the same username.
+        """
+        if username in self._usernames:
+            return False
+        band = None
+        if self._rating_band and rating is not None:
+            band = rating // self._rating_band
+        player = Waiting(client, username, kind, band, next(self._order))
+        self._clients[client] = self._usernames[username] = player
+        group = self._groups.setdefault((kind, band), {})
+        group[client] = player
+        if len(group) >= self._table_size:
+            self._form(self._oldest(group.itervalues()))
+        elif self._max_wait:
+            player.timer = self._timers.schedule(self._max_wait,
+                                                 self._waited, player)
+        return True
+
+    def leave(self, client):
+        """Remove a player from the queue, if they are waiting.
+
+        Args:
+            client: The Session of the player.
+        """
+        player = self._clients.get(client)
+        if player is not None:
+            self._remove(player)
+
+    def _waited(self, player):
+        # Start a game for a player who has waited max_wait, with the rest
+        # of their group, or with the nearest players of the same kind if
+        # they are alone. The player may have been matched since their
+        # timer was taken out of the wheel to run.
+
+        if self._clients.get(player.client) is not player:
+            return
+        player.timer = None
+        group = self._groups[player.kind, player.band]
+        if len(group) >= MIN_PLAYERS:
+            self._form(self._oldest(group.itervalues()))
+            return
+        others = sorted(
+            (self._distance(player, other), other.order, other)
+            for other in self._clients.itervalues()
+            if other.kind == player.kind and other is not player)
+        if others:
+            self._form([player] + [other for _, _, other in
+                                   others[:self._table_size - 1]])
+        else:
+            player.timer = self._timers.schedule(self._max_wait,
+                                                 self._waited, player)
+
+    def _oldest(self, players):
+        # The players who have waited longest, up to a table's worth.
+
+        return sorted(players,
+                      key=lambda player: player.order)[:self._table_size]
+
+    def _distance(self, player, other):
+        # How far apart the rating bands of two players are, with players
+        # without a band furthest from everyone.
+
+        if player.band is None or other.band is None:
+            return float("inf")
+        return abs(player.band - other.band)
+
+    def _form(self, players):
+        # Remove players from the queue, and seat them at a table.
+
+        players.sort(key=lambda player: player.order)
+        for player in players:
+            self._remove(player)
+        self.matched += 1
+        self._start(players)
+
+    def _remove(self, player):
+        # Remove a player from the queue, cancelling their wait.
+
+        del self._clients[player.client]
+        del self._usernames[player.username]
+        key = player.kind, player.band
+        group = self._groups[key]
+        del group[player.client]
+        if not group:
+            del self._groups[key]
+        if player.timer is not None:
+            player.timer.cancel()
+            player.timer = None
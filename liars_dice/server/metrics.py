@@ -0,0 +1,427 @@
+"""
+
+Counters, gauges and histograms describing the server, served over HTTP in
+the Prometheus text format.
+
+Metrics are updated on the reactor thread with little more than a dictionary
+increment, and are only formatted when scraped. Timing a command handler
+costs more than handling many commands, so only one in HANDLER_SAMPLE of
+each command is timed. Handlers are timed by a monotonic wall clock, and by
+the CPU time of the reactor thread alone, which excludes the server's log
+writer and profiler threads.
+
+"""
+import bisect
+import collections
+import ctypes
+import ctypes.util
+import sys
+import time
+from twisted.web.resource import Resource
+from liars_dice import binary_command
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HANDLER_SAMPLE = 16
+
+# Upper bounds, in seconds, of the buckets of handler latencies
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                   0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+
+# Linux clock IDs for clock_gettime
+CLOCK_MONOTONIC = 1
+CLOCK_THREAD_CPUTIME_ID = 3
+
+# Commands of the binary protocol are counted by opcode, and labelled by
+# their name
+COMMAND_LABELS = dict((opcode, command) for command, opcode
+                      in binary_command.OPCODES.iteritems())
+
+
+def _format_value(value):
+    # Format a sample value, as an integer if it is one.
+
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def _merge(values, label_names):
+    # Merge the values of keys with the same label, summing them.
+    #
+    # Args:
+    #     values: A dictionary of keys to numbers, or lists of numbers.
+    #     label_names: A dictionary of keys to the label they are shown by,
+    #         for keys not shown by themselves.
+
+    merged = {}
+    for key, value in values.iteritems():
+        label = label_names.get(key, key)
+        if label in merged:
+            if isinstance(value, list):
+                merged[label] = [a + b for a, b in zip(merged[label], value)]
+            else:
+                merged[label] += value
+        else:
+            merged[label] = list(value) if isinstance(value, list) else value
+    return merged
+
+
+class Counter:
+    """A count which only increases, optionally split by a label.
+
+    Hot paths may increment values directly, as values[label value] += 1.
+
+    Args:
+        name: A string with the name of the metric.
+        description: A string describing the metric.
+        label: A string with the name of the label, or None if the metric
+            is not split.
+        label_names: A dictionary of label values to the values they are
+            shown as, such as COMMAND_LABELS.
+
+    Attributes:
+        values: A dictionary of label values (None if there is no label) to
+            counts.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, description, label=None, label_names=None):
+        self.name = name
+        self.description = description
+        self.label = label
+        self._label_names = label_names or {}
+        self.values = collections.defaultdict(int)
+
+    def inc(self, amount=1, label_value=None):
+        """Increase the count.
+
+        Args:
+            amount: The number to add.
+            label_value: The value of the label, if the metric has one.
+        """
+        self.values[label_value] += amount
+
+    def samples(self):
+        """Returns: A list of (name, labels, value) tuples, where labels is
+        a list of (label, value) tuples."""
+        if self.label is None:
+            return [(self.name, [], self.values[None])]
+        return [(self.name, [(self.label, label_value)], value)
+                for label_value, value in sorted(_merge(
+                    self.values, self._label_names).iteritems())]
+
+
+class Gauge:
+    """A value read when the metrics are scraped.
+
+    Args:
+        name: A string with the name of the metric.
+        description: A string describing the metric.
+        function: A function returning the value, or a dictionary of label
+            values to values if the metric has a label.
+        kind: "gauge", or "counter" if the value only increases.
+        label: A string with the name of the label, or None if the metric
+            is not split.
+    """
+
+    def __init__(self, name, description, function, kind="gauge",
+                 label=None):
+        self.name = name
+        self.description = description
+        self.kind = kind
+        self.label = label
+        self._function = function
+
+    def samples(self):
+        """Returns: A list of (name, labels, value) tuples (see Counter)."""
+        if self.label is None:
+            return [(self.name, [], self._function())]
+        return [(self.name, [(self.label, label_value)], value)
+                for label_value, value in sorted(
+                    self._function().iteritems())]
+
+
+class Histogram:
+    """The distribution of observed values, optionally split by a label.
+
+    Args:
+        name: A string with the name of the metric.
+        description: A string describing the metric.
+        buckets: A sorted tuple of floats with the upper bounds of the
+            buckets.
+        label, label_names: As taken by Counter.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, description, buckets, label=None,
+                 label_names=None):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.label = label
+        self._label_names = label_names or {}
+
+        # Lists of the count in each bucket (the last without a bound), then
+        # the sum of the values, by label value
+        self._children = {}
+
+    def observe(self, value, label_value=None):
+        """Record a value.
+
+        Args:
+            value: A number observed.
+            label_value: The value of the label, if the metric has one.
+        """
+        try:
+            child = self._children[label_value]
+        except KeyError:
+            child = self._children[label_value] = [0] * (
+                len(self.buckets) + 2)
+        child[bisect.bisect_left(self.buckets, value)] += 1
+        child[-1] += value
+
+    def samples(self):
+        """Returns: A list of (name, labels, value) tuples (see Counter)."""
+        samples = []
+        for label_value, child in sorted(_merge(
+                self._children, self._label_names).iteritems()):
+            labels = [] if self.label is None else [(self.label, label_value)]
+            total = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child):
+                total += count
+                samples.append((self.name + "_bucket",
+                                labels + [("le", _format_bound(bound))],
+                                total))
+            samples.append((self.name + "_sum", labels, child[-1]))
+            samples.append((self.name + "_count", labels, total))
+        return samples
+
+
+def _format_bound(bound):
+    # Format the upper bound of a histogram bucket.
+
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+class MetricsRegistry:
+    """A collection of metrics, rendered together."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def add(self, metric):
+        """Add a metric.
+
+        Args:
+            metric: A Counter, Gauge or Histogram.
+
+        Returns:
+            The metric.
+        """
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Format every metric.
+
+        Returns:
+            A string with the metrics in the Prometheus text format.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append("# HELP %s %s" % (metric.name, metric.description))
+            lines.append("# TYPE %s %s" % (metric.name, metric.kind))
+            for name, labels, value in metric.samples():
+                if labels:
+                    name += "{%s}" % ",".join(
+                        '%s="%s"' % (label, str(label_value).replace(
+                            "\\", "\\\\").replace('"', '\\"'))
+                        for label, label_value in labels)
+                lines.append(name + " " + _format_value(value))
+        return "\n".join(lines) + "\n"
+
+
+class _Timespec(ctypes.Structure):
+    # The time given by clock_gettime
+
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+def posix_clock(clock_id, fallback):
+    """Read a clock of the operating system, in seconds.
+
+    Args:
+        clock_id: An integer with the Linux ID of the clock.
+        fallback: A function returning the time in seconds, used where
+            clock_gettime cannot be called.
+
+    Returns:
+        A function returning a float with the time of the clock in seconds.
+    """
+    if not sys.platform.startswith("linux"):
+        return fallback
+    try:
+        clock_gettime = ctypes.CDLL(ctypes.util.find_library("c"),
+                                    use_errno=True).clock_gettime
+    except (OSError, AttributeError):
+        return fallback
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(_Timespec)]
+
+    def read():
+        timespec = _Timespec()
+        if clock_gettime(clock_id, ctypes.byref(timespec)):
+            raise OSError(ctypes.get_errno(), "clock_gettime failed")
+        return timespec.tv_sec + timespec.tv_nsec * 1e-9
+
+    return read
+
+# The clocks timing handlers
+wall_clock = posix_clock(CLOCK_MONOTONIC, time.time)
+thread_cpu_clock = posix_clock(CLOCK_THREAD_CPUTIME_ID, time.clock)
+
+
+class ServerMetrics:
+    """The metrics of a GameServer.
+
+    Args:
+        factory: The GameServer described.
+
+    Attributes:
+        registry: The MetricsRegistry of every metric.
+        received: A Counter of the commands received, by command or
+            opcode.
+        handlers: A Histogram of the wall clock seconds taken by the
+            handlers of the commands timed, by command or opcode.
+        handlers_cpu: A Histogram of the CPU seconds of the reactor thread
+            taken by the same handlers.
+        invalid: A Counter of the unknown or malformed commands received.
+        sent: A Counter of the messages sent to clients, by command.
+        rounds: A Counter of the rounds played.
+        games: A Counter of the games won.
+        disconnects: A Counter of the clients disconnected.
+        timeouts: A Counter of the turns timed out.
+    """
+
+    def __init__(self, factory):
+        registry = self.registry = MetricsRegistry()
+        self.received = registry.add(Counter(
+            "liars_commands_received_total", "Commands received.",
+            "command", COMMAND_LABELS))
+        self.handlers = registry.add(Histogram(
+            "liars_handler_seconds",
+            "Time taken to handle one in %d of each command." %
+            HANDLER_SAMPLE,
+            LATENCY_BUCKETS, "command", COMMAND_LABELS))
+        self.handlers_cpu = registry.add(Histogram(
+            "liars_handler_cpu_seconds",
+            "CPU time taken to handle one in %d of each command." %
+            HANDLER_SAMPLE,
+            LATENCY_BUCKETS, "command", COMMAND_LABELS))
+        self.invalid = registry.add(Counter(
+            "liars_invalid_commands_total",
+            "Unknown or malformed commands received."))
+        self.sent = registry.add(Counter(
+            "liars_messages_sent_total", "Messages sent to clients.",
+            "command"))
+        self.rounds = registry.add(Counter(
+            "liars_rounds_total", "Rounds played."))
+        self.games = registry.add(Counter(
+            "liars_games_total", "Games won."))
+        self.disconnects = registry.add(Counter(
+            "liars_disconnects_total", "Clients disconnected."))
+        self.timeouts = registry.add(Counter(
+            "liars_turn_timeouts_total", "Turns timed out."))
+
+        outbound = factory.outbound
+        for name, description, function, kind in (
+                ("liars_connected_clients", "Clients connected.",
+                 lambda: len(factory.clients), "gauge"),
+                ("liars_active_tables", "Tables with a game in progress.",
+                 lambda: factory.tables.active_tables(), "gauge"),
+                ("liars_seated_players", "Players seated at tables.",
+                 lambda: sum(len(table.clients)
+                             for table in factory.tables.tables), "gauge"),
+                ("liars_buffered_bytes",
+                 "Bytes held for, or waiting to be written to, clients.",
+                 factory.buffered_bytes, "gauge"),
+                ("liars_held_bytes", "Bytes held for paused clients.",
+                 lambda: outbound.held_bytes, "gauge"),
+                ("liars_paused_clients", "Clients not reading their data.",
+                 lambda: outbound.paused_clients, "gauge"),
+                ("liars_dropped_messages_total",
+                 "Chat messages dropped for paused clients.",
+                 lambda: outbound.dropped_messages, "counter"),
+                ("liars_collapsed_messages_total",
+                 "Superseded statuses discarded for paused clients.",
+                 lambda: outbound.collapsed_messages, "counter"),
+                ("liars_slow_disconnects_total",
+                 "Clients disconnected for being too slow.",
+                 lambda: outbound.disconnects, "counter"),
+                ("liars_timers_armed", "Turn and lobby timeouts armed.",
+                 lambda: factory.timers.armed, "gauge"),
+                ("liars_waiting_players", "Players waiting for matchmaking.",
+                 lambda: (factory.matchmaker.waiting()
+                          if factory.matchmaker is not None else 0),
+                 "gauge"),
+                ("liars_matches_total", "Tables formed by matchmaking.",
+                 lambda: (factory.matchmaker.matched
+                          if factory.matchmaker is not None else 0),
+                 "counter")):
+            registry.add(Gauge(name, description, function, kind))
+
+    def count_received(self, key):
+        """Count a received command.
+
+        Args:
+            key: The command, or its opcode in the binary protocol.
+
+        Returns:
+            A Boolean indicating whether the command's handler should be
+            timed, which it is for the first of each command received and
+            one in HANDLER_SAMPLE after.
+        """
+        values = self.received.values
+        count = values[key] = values[key] + 1
+        return count % HANDLER_SAMPLE == 1 % HANDLER_SAMPLE
+
+    def time_handler(self, key, handle, protocol, arguments):
+        """Call the handler of a received command, recording its wall clock
+        and CPU time.
+
+        Protocols count each command with count_received, and call this
+        instead of the handler when it returns True.
+
+        Args:
+            key: The command, or its opcode in the binary protocol.
+            handle: The handler function, taking the protocol and the
+                arguments of the command.
+            protocol: The protocol which received the command.
+            arguments: A tuple of the arguments of the command.
+        """
+        wall, cpu = wall_clock(), thread_cpu_clock()
+        try:
+            handle(protocol, *arguments)
+        finally:
+            self.handlers_cpu.observe(thread_cpu_clock() - cpu, key)
+            self.handlers.observe(wall_clock() - wall, key)
+
+
+class MetricsPage(Resource):
+    """Serve a MetricsRegistry to Prometheus.
+
+    Args:
+        registry: The MetricsRegistry served.
+    """
+
+    isLeaf = True
+
+    def __init__(self, registry):
+        Resource.__init__(self)
+        self._registry = registry
+
+    def render_GET(self, request):
+        request.setHeader("Content-Type", CONTENT_TYPE)
+        return self._registry.render()
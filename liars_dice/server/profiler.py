@@ -0,0 +1,172 @@
+"""
+
+A sampling profiler which can be started on a running server.
+
+A background thread samples the stack of the reactor's thread at a fixed
+interval, and once the profile's duration has passed, writes the number of
+samples of each stack as a collapsed stack file, the input of flame graph
+tools such as flamegraph.pl and speedscope. Samples are taken without
+tracing, so the reactor runs at close to full speed while profiled.
+
+"""
+import collections
+import os
+import sys
+import tempfile
+import threading
+import time
+from twisted.web.resource import Resource
+
+MAX_SECONDS = 300.0
+
+
+def collapse(frame, labels):
+    """Describe a stack as a line of a collapsed stack file.
+
+    Args:
+        frame: The innermost frame of the stack.
+        labels: A dictionary of code objects to their labels, which is
+            filled in as code objects are seen.
+
+    Returns:
+        A string with the label of each frame, outermost first, separated
+        by semicolons.
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        try:
+            names.append(labels[code])
+        except KeyError:
+            label = labels[code] = "%s (%s:%d)" % (
+                code.co_name, os.path.basename(code.co_filename),
+                code.co_firstlineno)
+            names.append(label)
+        frame = frame.f_back
+    names.reverse()
+    return ";".join(names)
+
+
+def write_collapsed(stacks, path):
+    """Write a collapsed stack file.
+
+    Args:
+        stacks: A dictionary of collapsed stacks to their number of samples.
+        path: A string with the path of the file.
+    """
+    with open(path, "w") as collapsed:
+        for stack, count in sorted(stacks.iteritems()):
+            collapsed.write("%s %d\n" % (stack, count))
+
+
+class SamplingProfiler:
+    """Sample the stack of a thread for a while, from another thread.
+
+    Args:
+        interval: A float with the seconds between samples.
+
+    Attributes:
+        running: A Boolean indicating whether a profile is being taken.
+    """
+
+    def __init__(self, interval=0.005):
+        self._interval = interval
+        self._thread = None
+        self._stopping = False
+        self.running = False
+
+    def start(self, seconds, path, thread_id=None):
+        """Start taking a profile.
+
+        Args:
+            seconds: A float with the seconds to profile for.
+            path: A string with the path of the collapsed stack file to
+                write once done.
+            thread_id: An integer with the ident of the thread to profile,
+                or None for the thread calling start.
+
+        Raises:
+            RuntimeError: A profile is already being taken.
+        """
+        if self.running:
+            raise RuntimeError("a profile is already being taken")
+        if thread_id is None:
+            thread_id = threading.current_thread().ident
+        self.running = True
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, args=(thread_id, seconds, path),
+            name="profiler")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """End the profile being taken early, if any, and write it."""
+        self._stopping = True
+
+    def wait(self):
+        """Wait for the profile being taken, if any, to be written."""
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self, thread_id, seconds, path):
+        # Sample the thread until the time is up, then write the profile.
+
+        stacks = collections.defaultdict(int)
+        labels = {}
+        interval = self._interval
+        end = time.time() + seconds
+        try:
+            while time.time() < end and not self._stopping:
+                frame = sys._current_frames().get(thread_id)
+                if frame is None:
+                    break
+                stacks[collapse(frame, labels)] += 1
+                del frame
+                time.sleep(interval)
+            write_collapsed(stacks, path)
+        finally:
+            self.running = False
+
+
+class ProfilePage(Resource):
+    """Start a profile of the reactor when POSTed to.
+
+    The number of seconds to profile for is given by the seconds argument
+    (10 by default, at most MAX_SECONDS), and the path of the file the
+    profile is written to is returned.
+
+    Args:
+        profiler: The SamplingProfiler taking profiles.
+        directory: A string with the directory to write profiles in.
+    """
+
+    isLeaf = True
+
+    def __init__(self, profiler, directory):
+        Resource.__init__(self)
+        self._profiler = profiler
+        self._directory = directory
+
+    def render_POST(self, request):
+        request.setHeader("Content-Type", "text/plain")
+        try:
+            seconds = float(request.args.get("seconds", ["10"])[0])
+        except ValueError:
+            seconds = 0
+        if not 0 < seconds <= MAX_SECONDS:
+            request.setResponseCode(400)
+            return "seconds must be between 0 and %g\n" % MAX_SECONDS
+        if self._profiler.running:
+            request.setResponseCode(409)
+            return "a profile is already being taken\n"
+
+        # Resources are rendered by the reactor's thread, which is profiled.
+        # The file is created now, so profiles started in the same second
+        # are written to different files.
+        descriptor, path = tempfile.mkstemp(
+            ".collapsed", time.strftime("profile-%Y%m%d-%H%M%S-"),
+            self._directory)
+        os.close(descriptor)
+        self._profiler.start(seconds, path)
+        return path + "\n"
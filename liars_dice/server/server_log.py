@@ -0,0 +1,261 @@
+"""
+
+Structured, leveled logging for the server, written by a background thread.
+
+Events are recorded as a level, an event name and keyword fields, and are
+only formatted (as JSON lines) by the writer's thread, so logging does not
+block the reactor. Events below the log's level are discarded before any
+formatting, at the cost of a comparison.
+
+"""
+import collections
+import json
+import random
+import sys
+import threading
+import time
+from twisted.python import log as twisted_log
+from twisted.python.logfile import LogFile
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+DISABLED = 100
+
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR,
+          "disabled": DISABLED}
+LEVEL_NAMES = dict((level, name) for name, level in LEVELS.iteritems())
+
+
+def format_record(record):
+    """Format a log record.
+
+    Args:
+        record: A (time, level, event, table number, fields) tuple, where the
+            table number is None for events not at a table.
+
+    Returns:
+        A string with the record as a line of JSON.
+    """
+    timestamp, level, event, table, fields = record
+    entry = dict(fields)
+    entry["time"] = round(timestamp, 6)
+    entry["level"] = LEVEL_NAMES[level]
+    entry["event"] = event
+    if table is not None:
+        entry["table"] = table
+    try:
+        return json.dumps(entry, sort_keys=True, default=repr) + "\n"
+    except UnicodeDecodeError:
+        # Strings received from clients need not be UTF-8
+        return json.dumps(entry, sort_keys=True, default=repr,
+                          encoding="latin-1") + "\n"
+
+
+class LogWriter:
+    """Format and write log records in a background thread.
+
+    Records are appended to an in-memory queue, which the thread drains
+    every interval seconds, writing and flushing them as one batch.
+
+    Args:
+        log_file: A file-like object to write to, such as a twisted LogFile
+            or sys.stdout.
+        interval: A float with the seconds between writes.
+        max_queued: An integer with the most records held in the queue.
+            Further records are dropped until the thread catches up.
+
+    Attributes:
+        dropped: An integer with the number of records dropped.
+    """
+
+    def __init__(self, log_file, interval=0.1, max_queued=100000):
+        self._file = log_file
+        self._interval = interval
+        self._max_queued = max_queued
+        self._records = collections.deque()
+        self._stopping = threading.Event()
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="log writer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, record):
+        """Queue a record to be written.
+
+        Args:
+            record: A record, as taken by format_record.
+        """
+        if len(self._records) < self._max_queued:
+            self._records.append(record)
+        else:
+            self.dropped += 1
+
+    def close(self):
+        """Write the queued records, and stop the thread."""
+        self._stopping.set()
+        self._thread.join()
+
+    def _run(self):
+        # Write the queued records every interval, until stopped.
+
+        while not self._stopping.wait(self._interval):
+            self._write_queued()
+        self._write_queued()
+        if self._file is not sys.stdout:
+            self._file.close()
+
+    def _write_queued(self):
+        # Format and write every queued record.
+
+        records = self._records
+        lines = []
+        try:
+            while True:
+                lines.append(format_record(records.popleft()))
+        except IndexError:
+            pass
+        if lines:
+            self._file.write("".join(lines))
+            self._file.flush()
+
+
+class ServerLog:
+    """Record structured events with levels.
+
+    Args:
+        writer: A LogWriter, or None to discard every event.
+        level: An integer with the lowest level of event recorded.
+        sample_rate: A float with the fraction of tables whose events below
+            WARNING are recorded.
+
+    Attributes:
+        level: An integer with the lowest level of event recorded.
+    """
+
+    def __init__(self, writer=None, level=INFO, sample_rate=1.0):
+        self._writer = writer
+        self.level = level if writer is not None else DISABLED
+        self._sample_rate = sample_rate
+
+    def debug(self, event, **fields):
+        """Record an event at DEBUG level.
+
+        Args:
+            event: A string naming the event.
+            **fields: The values describing the event, which must be
+                JSON serialisable, or are recorded by their repr.
+        """
+        if self.level <= DEBUG:
+            self._writer.write((time.time(), DEBUG, event, None, fields))
+
+    def info(self, event, **fields):
+        """Record an event at INFO level (see debug)."""
+        if self.level <= INFO:
+            self._writer.write((time.time(), INFO, event, None, fields))
+
+    def warning(self, event, **fields):
+        """Record an event at WARNING level (see debug)."""
+        if self.level <= WARNING:
+            self._writer.write((time.time(), WARNING, event, None, fields))
+
+    def error(self, event, **fields):
+        """Record an event at ERROR level (see debug)."""
+        if self.level <= ERROR:
+            self._writer.write((time.time(), ERROR, event, None, fields))
+
+    def for_table(self, table_number):
+        """Create the log of a table.
+
+        Whether the table is sampled is decided once, when it is created.
+
+        Args:
+            table_number: An integer identifying the table.
+
+        Returns:
+            A TableLog recording events with the table number.
+        """
+        level = self.level
+        if random.random() >= self._sample_rate:
+            level = max(level, WARNING)
+        return TableLog(self._writer, level, table_number)
+
+    def observe_twisted(self, event_dict):
+        """Record an event logged through twisted.python.log.
+
+        Args:
+            event_dict: The event dictionary passed to twisted log
+                observers.
+        """
+        level = ERROR if event_dict.get("isError") else INFO
+        if self.level <= level:
+            self._writer.write((time.time(), level, "twisted", None, {
+                "message": twisted_log.textFromEventDict(event_dict)}))
+
+    def close(self):
+        """Write the recorded events, and stop the writer."""
+        if self._writer is not None:
+            self._writer.close()
+
+
+class TableLog(ServerLog):
+    """Record structured events at a single table.
+
+    Args:
+        writer: A LogWriter, or None to discard every event.
+        level: An integer with the lowest level of event recorded.
+        table_number: An integer identifying the table.
+    """
+
+    def __init__(self, writer, level, table_number):
+        ServerLog.__init__(self, writer, level)
+        self.table_number = table_number
+
+    def debug(self, event, **fields):
+        if self.level <= DEBUG:
+            self._writer.write((time.time(), DEBUG, event, self.table_number,
+                                fields))
+
+    def info(self, event, **fields):
+        if self.level <= INFO:
+            self._writer.write((time.time(), INFO, event, self.table_number,
+                                fields))
+
+    def warning(self, event, **fields):
+        if self.level <= WARNING:
+            self._writer.write((time.time(), WARNING, event,
+                                self.table_number, fields))
+
+    def error(self, event, **fields):
+        if self.level <= ERROR:
+            self._writer.write((time.time(), ERROR, event, self.table_number,
+                                fields))
+
+
+def open_server_log(path, level, rotate_bytes, sample_rate):
+    """Open the server's log.
+
+    Args:
+        path: A string with the path of the log file, or an empty string to
+            write to standard output.
+        level: A string with the name of the lowest level recorded, one of
+            LEVELS.
+        rotate_bytes: An integer with the size at which the log file is
+            rotated.
+        sample_rate: A float with the fraction of tables whose events below
+            WARNING are recorded.
+
+    Returns:
+        A ServerLog.
+
+    Raises:
+        ValueError: The level is unknown.
+    """
+    if level not in LEVELS:
+        raise ValueError("unknown log level: " + level)
+    if path:
+        log_file = LogFile.fromFullPath(path, rotateLength=rotate_bytes)
+    else:
+        log_file = sys.stdout
+    return ServerLog(LogWriter(log_file), LEVELS[level], sample_rate)
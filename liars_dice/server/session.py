@@ -0,0 +1,1002 @@
+"""
+
+Run games independently of how clients are connected.
+
+A Session runs the game for one client: it parses their commands, updates
+their table and queues the messages each player is sent. A GameServer holds
+the tables, timers and metrics shared by every session. Neither depends on
+Twisted's networking, so the same game flow is served by the Twisted front
+end in liars_dice/server/game_server.py and the asyncore front end in
+liars_dice/server/asyncore_server.py.
+
+"""
+from liars_dice import binary_command, network_command, config_parse
+from liars_dice.server.backpressure import (OutboundBuffer, OutboundStats,
+                                            SlowClientPolicy)
+from liars_dice.server.dice import BACKENDS, DiceSource
+from liars_dice.server.matchmaking import Matchmaker
+from liars_dice.server.metrics import ServerMetrics
+from liars_dice.server.server_log import ServerLog
+from liars_dice.server.table import TableManager
+from liars_dice.server.timer_wheel import TimerWheel
+
+# Ends each line of the text protocol
+LINE_DELIMITER = "\r\n"
+
+# What happens to a player who does not answer PLAY in time
+TIMEOUT_LIAR = "liar"  # Declare 'Liar!', or forfeit if there is no bid
+TIMEOUT_FORFEIT = "forfeit"  # Leave the game, as if they had disconnected
+TIMEOUT_ACTIONS = (TIMEOUT_LIAR, TIMEOUT_FORFEIT)
+
+# Longest chat message relayed, in bytes. Longer messages are cut short, as
+# the relayed line must fit in the text protocol's lines and the binary
+# protocol's frames.
+MAX_CHAT = 1024
+
+
+class Message:
+    """A message to clients, encoded at most once for each wire protocol.
+
+    Args:
+        command: A string with the command, from network_command.
+        *arguments: The arguments of the command, as given by its parser in
+            network_command.
+    """
+
+    def __init__(self, command, *arguments):
+        self.command = command
+        self.arguments = arguments
+        self._text = None
+        self._binary = None
+
+    def text(self):
+        """Returns: A string with the message as a line of text."""
+        if self._text is None:
+            self._text = network_command.format_message(
+                network_command.SERVER_FORMATTERS, self.command,
+                self.arguments) + LINE_DELIMITER
+        return self._text
+
+    def binary(self):
+        """Returns: A string with the message as a binary frame."""
+        if self._binary is None:
+            self._binary = binary_command.encode(
+                binary_command.SERVER_CODECS, self.command, self.arguments)
+        return self._binary
+
+
+class Session:
+    """Run the game for a client, whatever their connection.
+
+    A front end subclasses Session along with its protocol class, setting
+    factory to the GameServer the client connected to, and transport to an
+    object with the write, writeSequence, loseConnection, abortConnection
+    and registerProducer methods of a Twisted transport. The transport must
+    pause its producer while its buffer is full, and resume it once
+    drained. The front end calls connectionMade once the client connects,
+    lineReceived with each line received without its delimiter, and
+    connectionLost once the client disconnects. Once the session calls
+    setRawMode, the front end passes the data received to rawDataReceived
+    instead of splitting it into lines.
+
+    Attributes:
+        table: The Table the client is seated at, or None if they are not
+            playing.
+        binary: A Boolean indicating whether the client has switched to the
+            binary protocol (see liars_dice/binary_command.py).
+    """
+
+    def __init__(self):
+
+        # Username associated with the client of this protocol instance.
+        self._username = None
+
+        # Table the client is seated at, set along with the username.
+        self.table = None
+
+        # Table the client is watching, if they are a spectator.
+        self._spectating = None
+
+        # The kind of player and rating the client gave for matchmaking.
+        self._kind = ""
+        self._rating = None
+
+        # Lines waiting to be written at the end of the reactor turn, and
+        # the command of each, or None if it is not a single message.
+        self._outgoing = []
+        self._outgoing_commands = []
+
+        # Holds the client's data while they are not reading it, created
+        # once connected.
+        self._outbound = None
+
+        # Parsers and handlers of the commands received from the client.
+        self._commands = COMMANDS.table(self.__class__)
+
+        self.binary = False
+
+        # Splits data into frames once the client uses the binary protocol.
+        self._frames = None
+
+    def lineReceived(self, line):
+
+        # Parse the received message, and delegate to the appropriate method
+        command, delimiter, content = line.partition(network_command.DELIMITER)
+        try:
+            parse, handle = self._commands[command]
+        except KeyError:
+            self.factory.metrics.invalid.inc()
+            self._log().warning("unknown_command", command=command)
+            return
+        factory = self.factory
+        metrics = factory.metrics
+        try:
+            arguments = parse(content if delimiter else None)
+        except ValueError:
+            metrics.invalid.inc()
+            self._log().warning("malformed_command", line=line)
+            return
+        table = self.table
+        if metrics.count_received(command):
+            metrics.time_handler(command, handle, self, arguments)
+        else:
+            handle(self, *arguments)
+        if factory.checkpoints is not None:
+            factory.checkpoint(table)
+            factory.checkpoint(self.table)
+
+    def rawDataReceived(self, data):
+
+        # Decode the received frames, and delegate to the appropriate method
+        commands = self._commands
+        factory = self.factory
+        metrics = factory.metrics
+        for opcode, payload in self._frames.feed(data):
+            try:
+                decode, handle = commands[opcode]
+            except KeyError:
+                metrics.invalid.inc()
+                self._log().warning("unknown_opcode", opcode=opcode)
+                continue
+            try:
+                arguments = decode(payload)
+            except ValueError:
+                metrics.invalid.inc()
+                self._log().warning("malformed_frame", opcode=opcode,
+                                    payload=repr(payload))
+                continue
+            table = self.table
+            if metrics.count_received(opcode):
+                metrics.time_handler(opcode, handle, self, arguments)
+            else:
+                handle(self, *arguments)
+            if factory.checkpoints is not None:
+                factory.checkpoint(table)
+                factory.checkpoint(self.table)
+
+    def _received_protocol(self, protocol):
+        # Switch to the binary protocol at the client's request, which must
+        # be made before the client joins a table or starts spectating.
+        #
+        # Args:
+        #     protocol: A string with the name of the protocol.
+
+        if (protocol != binary_command.PROTOCOL or self.binary or
+                self.table is not None or self._spectating is not None):
+            self._log().warning("unavailable_protocol", protocol=protocol)
+            return
+        self.binary = True
+        self._frames = binary_command.FrameReader()
+        self._commands = BINARY_COMMANDS.table(self.__class__)
+        self.setRawMode()
+
+    def _log(self):
+        # The log of the client's table, or the server's log if the client
+        # is not seated.
+
+        return self.table.log if self.table is not None else self.factory.log
+
+    def _is_turn_player(self):
+        # Whether the client is seated, and it is their turn.
+
+        return (self.table is not None and
+                self.table.game.turn_player() == self._username)
+
+    def _received_bid(self, face, number):
+        # Make a bid for the turn player.
+        #
+        # Args:
+        #     face: An integer with the die value bid.
+        #     number: An integer with the number of dice bid.
+
+        if not self._is_turn_player():
+            return
+        if self.table.game.handle_bid(face, number):
+            self.table.event_log.bid(self._username, face, number)
+            self.table.log.debug("bid", player=self._username, face=face,
+                                 number=number)
+            self.send_message(Message(network_command.BID, face, number))
+            self.next_turn()
+        else:
+            self.table.log.debug("invalid_bid", player=self._username,
+                                 face=face, number=number)
+            self.send_message(PLAY, [self.table.game.turn_player()])
+
+    def _received_liar(self):
+        # Declare 'Liar!' for the turn player.
+
+        if self._is_turn_player():
+            self.handle_non_bid(network_command.LIAR)
+
+    def _received_spot_on(self):
+        # Declare 'Spot On!' for the turn player.
+
+        if self._is_turn_player():
+            self.handle_non_bid(network_command.SPOT_ON)
+
+    def connectionMade(self):
+        factory = self.factory
+        factory.clients.add(self)
+        self._outbound = OutboundBuffer(
+            self.transport, factory.slow_clients, factory.outbound,
+            factory.clock, self._disconnect_slow)
+
+        # Request username
+        self._reply(self.factory.username_request)
+
+    def connectionLost(self, reason=None):
+        self.factory.metrics.disconnects.inc()
+        self.factory.clients.discard(self)
+        if self.factory.matchmaker is not None:
+            self.factory.matchmaker.leave(self)
+        self._outbound.stopProducing()
+        self.factory.checkpoint(self.table)
+        self._leave_table()
+
+    def _leave_table(self):
+        # Remove the client from the table they are playing at or watching,
+        # continuing the game without them.
+
+        if self._spectating is not None:
+            self._spectating.spectators.discard(self)
+            self._spectating = None
+
+        if self.table is not None:
+
+            # No need to do anything if the player has already been
+            # eliminated or the game is over
+            if (self._username in self.table.game.players and
+                    self.table.game.game_running):
+                self.table.game.remove_player(self._username)
+                self.table.event_log.left(self._username)
+                del self.table.clients[self._username]
+                self.table.log.info("player_left", player=self._username)
+                self.send_message(Message(network_command.PLAYER_LEFT,
+                                          self._username))
+
+            if self.table.game_started:
+                winner = self.check_winner()
+
+                if not winner:
+                    self.next_round()
+
+            elif len(self.table.game.players) > 0:
+                self.send_can_start()
+
+            self.table = None
+
+    def _arm_turn_timer(self):
+        # Time out the turn of the table's turn player, if turns have a time
+        # limit.
+
+        timeout = self.factory.turn_timeout
+        table = self.table
+        client = table.clients.get(table.game.turn_player())
+        if timeout and client is not None:
+            table.set_timer(self.factory.timers.schedule(
+                timeout, client._turn_timed_out))
+
+    def _turn_timed_out(self):
+        # Play for a turn player who did not answer PLAY in time.
+
+        if not self._is_turn_player():
+            return
+        action = self.factory.turn_timeout_action
+        self.factory.metrics.timeouts.inc()
+        self.factory.checkpoint(self.table)
+        self.table.log.info("turn_timed_out", player=self._username,
+                            action=action)
+        if (action == TIMEOUT_LIAR and
+                self.table.game.previous_bid is not None):
+            self.handle_non_bid(network_command.LIAR)
+        else:
+            self._leave_table()
+            self.flush()
+            self.transport.loseConnection()
+
+    def _lobby_timed_out(self, table):
+        # Start the game at a table whose players have waited too long, on
+        # behalf of the player who can start it.
+        #
+        # Args:
+        #     table: The Table whose game should start.
+
+        game = table.game
+        if not table.game_started and len(game.seats) >= 2:
+            table.log.info("lobby_timed_out", player=game.seats.first)
+            table.clients[game.seats.first]._received_start()
+            self.factory.checkpoint(table)
+
+    def _drop_detached(self):
+        # Remove the players of the client's restored table who did not
+        # rejoin it in time, continuing the game without them.
+
+        table = self.table
+        game = table.game
+        removed = False
+        for username in sorted(table.detached):
+            if username in game.players and game.game_running:
+                game.remove_player(username)
+                table.event_log.left(username)
+                table.log.info("player_not_rejoined", player=username)
+                self.send_message(Message(network_command.PLAYER_LEFT,
+                                          username))
+                removed = True
+        table.detached.clear()
+        if removed and not self.check_winner():
+            self.next_round()
+
+    def queue_message(self, message):
+        """Queue a message to be sent to the client.
+
+        Messages are written together by flush, which the factory calls once
+        at the end of the reactor turn, so every message produced while
+        handling a command reaches the transport as a single write.
+
+        If the client is not reading their messages, the message is held
+        instead (see liars_dice/server/backpressure.py).
+
+        Args:
+            message: A Message, which is encoded in the client's protocol.
+        """
+        self.queue_data(message.binary() if self.binary else message.text(),
+                        message.command)
+
+    def _reply(self, message):
+        # Send a message to the client alone, outside of any table.
+        #
+        # Args:
+        #     message: A Message.
+
+        self.factory.metrics.sent.inc(1, message.command)
+        self.queue_message(message)
+
+    def queue_data(self, data, command=None):
+        """Queue encoded data to be sent to the client.
+
+        Args:
+            data: A string with one or more messages, encoded in the client's
+                protocol.
+            command: A string with the command of the message encoded, or
+                None if the data is not a single message.
+        """
+        if self._outbound.paused:
+            self._outbound.hold(data, command)
+            return
+        if not self._outgoing:
+            self.factory.schedule_flush(self)
+        self._outgoing.append(data)
+        self._outgoing_commands.append(command)
+
+    def write(self, data, messages=None):
+        """Write encoded data to the client now, or hold it if the client is
+        not reading their messages.
+
+        Args:
+            data: A string with one or more messages, encoded in the client's
+                protocol.
+            messages: A list of the Messages encoded in data, which are held
+                one at a time so the policy applies to each, or None.
+        """
+        if not self._outbound.paused:
+            self.transport.write(data)
+        elif messages is None:
+            self._outbound.hold(data)
+        else:
+            for message in messages:
+                self._outbound.hold(
+                    message.binary() if self.binary else message.text(),
+                    message.command)
+
+    def flush(self):
+        """Write all queued messages to the transport, or hold them if the
+        client has stopped reading since they were queued."""
+        if self._outgoing:
+            outgoing = self._outgoing
+            commands = self._outgoing_commands
+            self._outgoing = []
+            self._outgoing_commands = []
+            if self._outbound.paused:
+                for data, command in zip(outgoing, commands):
+                    self._outbound.hold(data, command)
+            else:
+                self.transport.writeSequence(outgoing)
+
+    def buffered_bytes(self):
+        """Returns: An integer with the bytes held for, or waiting to be
+        written to, the client."""
+        return self._outbound.buffered_bytes()
+
+    def _disconnect_slow(self, reason):
+        # Disconnect a client which is not reading their messages.
+        #
+        # Args:
+        #     reason: A string with the reason, as given by OutboundBuffer.
+
+        self._log().warning("slow_client_disconnected", player=self._username,
+                            reason=reason,
+                            held_bytes=self._outbound.held_bytes)
+        self.factory.outbound.disconnects += 1
+        self._outbound.stopProducing()
+        self.transport.abortConnection()
+
+    def _received_username(self, username):
+        # Set the client's username, and seat them at the open table.
+        # Usernames cannot be changed once set.
+        #
+        # Args:
+        #    username: A string with the username of the client.
+
+        if self._username is None and username:
+            table = self.factory.tables.reattach(username)
+            if table is not None:
+                self._rejoin(table, username)
+                return
+
+        if self.factory.matchmaker is not None:
+            self._wait_for_match(username)
+            return
+
+        table = self.factory.tables.open_table()
+        if (username not in table.clients and username and
+                len(username) <= binary_command.MAX_STRING and
+                self._username is None):
+            self.seat(table, username)
+
+            # First player to join can start the game, and the game starts
+            # anyway once it has waited long enough for enough players
+            if len(self.table.game.players) == 1:
+                self.send_can_start()
+            elif (len(self.table.game.players) == 2 and
+                    self.factory.lobby_timeout):
+                table.set_timer(self.factory.timers.schedule(
+                    self.factory.lobby_timeout, self._lobby_timed_out,
+                    table))
+
+        elif username in table.clients:
+            table.log.info("username_taken", username=username)
+            self._reply(self.factory.username_request)
+        elif not username or self._username is None:
+            self.factory.log.info("invalid_username",
+                                  length=len(username or ""))
+            self._reply(self.factory.username_request)
+
+    def seat(self, table, username):
+        """Seat the client at a table, and tell the players there.
+
+        Args:
+            table: The Table the client joins, whose game has not started.
+            username: A string with the username of the client.
+        """
+        self.table = table
+        table.clients[username] = self
+        table.game.add_player(username)
+        table.event_log.join(username)
+        table.log.info("player_joined", player=username)
+        self.send_message(Message(network_command.PLAYER_JOINED, username))
+        self._username = username
+        self.send_player_status()
+
+    def _wait_for_match(self, username):
+        # Queue the client for matchmaking, if their username is valid and
+        # not waiting already.
+        #
+        # Args:
+        #    username: A string with the username of the client.
+
+        matchmaker = self.factory.matchmaker
+        if self._username is not None or self in matchmaker:
+            return
+        if not username or len(username) > binary_command.MAX_STRING:
+            self.factory.log.info("invalid_username",
+                                  length=len(username or ""))
+            self._reply(self.factory.username_request)
+        elif matchmaker.join(self, username, self._kind, self._rating):
+            self.factory.log.debug("player_queued", player=username,
+                                   kind=self._kind, rating=self._rating)
+        else:
+            self.factory.log.info("username_taken", username=username)
+            self._reply(self.factory.username_request)
+
+    def _received_queue(self, kind, rating):
+        # Set the kind of player and the rating the client is matched by,
+        # which must be done before they send their username.
+        #
+        # Args:
+        #     kind: A string with the kind of player, such as "bot".
+        #     rating: An integer with the client's rating, or None.
+
+        if self._username is None and not self._is_waiting():
+            self._kind = kind
+            self._rating = rating
+
+    def _is_waiting(self):
+        # Whether the client is waiting for matchmaking to seat them.
+
+        matchmaker = self.factory.matchmaker
+        return matchmaker is not None and self in matchmaker
+
+    def _rejoin(self, table, username):
+        # Seat the client in place of a detached player of a restored game,
+        # and tell them the state of the game.
+        #
+        # Args:
+        #     table: The restored Table the player was detached from.
+        #     username: A string with the username of the player.
+
+        self.table = table
+        self._username = username
+        table.clients[username] = self
+        table.log.info("player_rejoined", player=username)
+        game = table.game
+        self._reply(Message(network_command.PLAYER_STATUS,
+                            game.get_player_status()))
+        for player, hand in game.get_player_hands():
+            if player == username:
+                self._reply(Message(network_command.PLAYER_HAND, hand))
+        if game.previous_bid is not None:
+            self._reply(Message(network_command.BID, *game.previous_bid))
+        turn_player = game.turn_player()
+        self._reply(Message(network_command.NEXT_TURN, turn_player))
+        if turn_player == username:
+            self._reply(PLAY)
+            self._arm_turn_timer()
+
+    def _received_spectate(self, table_number):
+        # Watch a table, without playing. Spectators receive every message
+        # sent to all players at the table.
+        #
+        # Args:
+        #     table_number: A string with the index of the table to watch,
+        #         or None to watch the open table.
+
+        if (self.table is not None or self._spectating is not None or
+                self._is_waiting()):
+            return
+        tables = self.factory.tables
+        try:
+            if table_number is None:
+                table = tables.open_table()
+            else:
+                # Negative indices would count back from the last table
+                number = int(table_number)
+                if number < 0:
+                    raise IndexError(number)
+                table = tables.tables[number]
+        except (ValueError, IndexError):
+            self.factory.log.warning("unknown_table",
+                                     table_number=table_number)
+            self._reply(self.factory.username_request)
+            return
+
+        table.spectators.add(self)
+        self._spectating = table
+        table.log.info("spectator_joined")
+        self._reply(Message(network_command.PLAYER_STATUS,
+                            table.game.get_player_status()))
+
+    def _received_start(self):
+        # Start the game.
+
+        if self.table is None:
+            return
+        game = self.table.game
+
+        # Only the first, still active, player can start the game
+        # There must be at least 2 players
+        # Game must not have started
+        if (game.seats.first == self._username and len(game.seats) >= 2 and
+                not self.table.game_started):
+            self.table.log.info("game_started", player=self._username,
+                                players=len(game.seats))
+            self.table.game_started = True
+            self.next_round()
+        else:
+            # The player did not have permission to start the game, there
+            # were not enough players, or the game had already begun
+            self.table.log.info("start_refused", player=self._username)
+
+    def _received_chat(self, message):
+        # Relays all chat messages to the clients, cut to MAX_CHAT bytes.
+        #
+        # Args:
+        #     A string with the message received.
+
+        if self.table is None or message is None:
+            return
+        self.send_message(Message(network_command.CHAT, self._username,
+                                  message[:MAX_CHAT]))
+
+    def send_message(self, message, client_usernames=None):
+        """Send a message to connected clients.
+
+        The message is encoded at most once for each protocol, however many
+        clients it is sent to.
+
+        Args:
+            message: A Message to be sent.
+            client_usernames: A list of all the usernames of the clients to
+                whom the messages should be sent to, or None if the message
+                should be sent to all clients and spectators.
+        """
+        if client_usernames is None:
+            self.table.broadcast(message)
+
+        else:
+            for username in client_usernames:
+                self.table.send(username, message)
+
+    def send_can_start(self):
+        """Send a message informing the client that they can start the game."""
+        can_start_player = self.table.game.seats.first
+        self.table.log.debug("can_start", player=can_start_player)
+        self.send_message(CAN_START, [can_start_player])
+
+    def handle_non_bid(self, command):
+        """Manage player actions that do not involve bidding..
+
+        Args:
+            command: network_command.SPOT_ON or network_command.LIAR
+                indicating whether the action is a 'Spot On' action, or a
+                'Liar' one.
+        """
+        try:
+            event_log = self.table.event_log
+            if command == network_command.SPOT_ON:
+                losing_player, eliminated = self.table.game.handle_spot_on()
+                event_log.spot_on(self._username)
+            else:
+                losing_player, eliminated = self.table.game.handle_liar()
+                event_log.liar(self._username)
+            event_log.die_lost(losing_player)
+
+            # Announce action
+            self.send_message(LIAR if command == network_command.LIAR
+                              else SPOT_ON)
+            self.table.log.debug("declaration", player=self._username,
+                                 declaration=command, loser=losing_player,
+                                 eliminated=eliminated)
+
+            # Resolve die loss
+            self.send_message(Message(network_command.PLAYER_LOST_DIE,
+                                      losing_player))
+
+            winner = False
+            if eliminated:
+                event_log.eliminated(losing_player)
+                self.send_message(Message(network_command.PLAYER_ELIMINATED,
+                                          losing_player))
+
+                # Determine if the game has been won
+                winner = self.check_winner()
+
+            if not winner:
+                self.next_round()
+
+        except RuntimeError:
+            # No previous bid
+            self.send_message(PLAY, [self.table.game.turn_player()])
+
+    def next_round(self):
+        """Roll a new round of the game."""
+        # Announce new round
+        self.table.next_round()
+        self.factory.metrics.rounds.inc()
+        self.send_message(NEXT_ROUND)
+
+        # Update the board situation
+        self.send_player_status()
+        self.send_player_hand()
+
+        # Reset the previous bid
+        self.table.game.previous_bid = None
+
+        # Announce the player whose turn it is
+        next_player = self.table.game.turn_player()
+        self.table.log.debug("new_round", round_player=next_player)
+        self.send_message(Message(network_command.NEXT_TURN, next_player))
+        self.send_message(PLAY, [next_player])
+        self._arm_turn_timer()
+
+    def next_turn(self):
+        """Inform clients of the next player's turn."""
+        self.table.game.next_turn()
+        next_player = self.table.game.turn_player()
+        self.table.log.debug("next_turn", player=next_player)
+        self.send_message(Message(network_command.NEXT_TURN, next_player))
+        self.send_message(PLAY, [next_player])
+        self._arm_turn_timer()
+
+    def check_winner(self):
+        """Checks if a player has won the game.
+
+        If a player has won, informs all clients of their victory,
+        and disconnects them. The table is then recycled for a new game.
+
+        Returns:
+            A Boolean indicating whether a player has won the game.
+        """
+        winner = self.table.game.get_winner()
+
+        # Winner found
+        if winner is not None:
+            self.table.log.info("winner", player=winner)
+            self.factory.metrics.games.inc()
+            self.send_message(Message(network_command.WINNER, winner))
+
+            # End the game
+            self.table.game.stop()
+            self.table.event_log.winner(winner)
+
+            # Drop client connections
+            table = self.table
+            for _, client in table.clients.iteritems():
+                client.table = None
+                client.flush()
+                client.transport.loseConnection()
+
+            # Recycle the table for a new game
+            self.factory.tables.recycle(table)
+
+            return True
+        return False
+
+    def send_player_hand(self):
+        """Inform all clients of their hand."""
+        for player, hand in self.table.game.get_player_hands():
+            self.send_message(Message(network_command.PLAYER_HAND, hand),
+                              [player])
+
+    def send_player_status(self):
+        """Inform all clients of the game status."""
+        message = Message(network_command.PLAYER_STATUS,
+                          self.table.game.get_player_status())
+
+        # Send the message
+        self.send_message(message)
+        self.table.log.debug("player_status", status=message.arguments[0])
+
+
+# Commands received from clients, with their parsers and the methods of
+# Session handling them
+COMMANDS = network_command.CommandRegistry({
+    network_command.USERNAME:
+        (network_command.parse_string, "_received_username"),
+    network_command.PROTOCOL:
+        (network_command.parse_string, "_received_protocol"),
+    network_command.SPECTATE:
+        (network_command.parse_string, "_received_spectate"),
+    network_command.QUEUE:
+        (network_command.parse_queue, "_received_queue"),
+    network_command.START:
+        (network_command.parse_none, "_received_start"),
+    network_command.CHAT:
+        (network_command.parse_string, "_received_chat"),
+    network_command.BID:
+        (network_command.parse_bid, "_received_bid"),
+    network_command.LIAR:
+        (network_command.parse_none, "_received_liar"),
+    network_command.SPOT_ON:
+        (network_command.parse_none, "_received_spot_on"),
+})
+
+# The same commands, received as frames of the binary protocol
+BINARY_COMMANDS = binary_command.registry(COMMANDS,
+                                          binary_command.CLIENT_CODECS)
+
+# Messages without arguments, encoded once for every client. USERNAME
+# requests offer the binary protocol, and servers with matchmaking also offer
+# the QUEUE command.
+USERNAME = Message(network_command.USERNAME, binary_command.PROTOCOL)
+MATCH_USERNAME = Message(network_command.USERNAME, binary_command.PROTOCOL +
+                         "," + network_command.QUEUE)
+CAN_START = Message(network_command.CAN_START)
+NEXT_ROUND = Message(network_command.NEXT_ROUND)
+PLAY = Message(network_command.PLAY)
+LIAR = Message(network_command.LIAR)
+SPOT_ON = Message(network_command.SPOT_ON)
+
+
+class GameServer:
+    """Store the tables being played, and the state shared by the Sessions
+    of every client.
+
+    Args:
+        clock: The IReactorTime used to flush clients' queued data and time
+            turns.
+        server_log: The ServerLog recording the server's events, or None to
+            discard them.
+        checkpoints: The CheckpointFile saving the game of every table, or
+            None if games are not saved. The games it holds are restored
+            when the factory is created.
+
+    Raises:
+        ValueError: The turn_timeout_action given by config.ini is not one
+            of TIMEOUT_ACTIONS.
+
+    Attributes:
+        tables: A TableManager seating clients at tables. Games at each table
+            are logged to the event_log_dir given by config.ini, if any.
+        dice: A DiceSource rolling the dice of every game, using the backend
+            given by config.ini.
+        log: The ServerLog recording events not at a table. Each table
+            records its own events in a TableLog created from it.
+        clock: The IReactorTime the server schedules calls with.
+        clients: A set of the Sessions of every connected client.
+        slow_clients: The SlowClientPolicy applied to clients which are not
+            reading their messages, as given by config.ini.
+        outbound: The OutboundStats counting the data held for them.
+        timers: The TimerWheel timing turns and lobbies.
+        metrics: The ServerMetrics describing the server.
+        turn_timeout: A float with the seconds a player has to answer PLAY,
+            or 0 for no limit, as given by config.ini.
+        turn_timeout_action: TIMEOUT_LIAR or TIMEOUT_FORFEIT, as given by
+            config.ini.
+        lobby_timeout: A float with the seconds after a second player joins
+            a table that its game starts, if it has not been started, or 0
+            for no limit, as given by config.ini.
+        reattach_timeout: A float with the seconds players of restored games
+            have to rejoin their table before the game continues without
+            them, or 0 for no limit, as given by config.ini.
+        match_size: An integer with the players matchmaking seats at each
+            table, or 0 if players join the open table and its first player
+            starts the game, as given by config.ini.
+        match_wait: A float with the seconds a player waits for a full
+            table before matchmaking starts a game with fewer players, or 0
+            for no limit, as given by config.ini.
+        match_rating_band: An integer with the width of the rating bands
+            matchmaking groups players by, or 0 to ignore ratings, as given
+            by config.ini.
+        checkpoints: The CheckpointFile saving games, or None.
+        matchmaker: The Matchmaker seating players, or None if match_size
+            is 0.
+        username_request: The USERNAME Message asking clients for their
+            username, which offers the QUEUE command if there is a
+            matchmaker.
+    """
+    dice = DiceSource(backend=BACKENDS[config_parse.dice])
+
+    slow_clients = SlowClientPolicy(
+        config_parse.write_high_water, config_parse.max_held_bytes,
+        config_parse.slow_client_timeout, config_parse.slow_client_drop_chat,
+        config_parse.slow_client_collapse_status)
+
+    turn_timeout = config_parse.turn_timeout
+    turn_timeout_action = config_parse.turn_timeout_action
+    lobby_timeout = config_parse.lobby_timeout
+    reattach_timeout = config_parse.reattach_timeout
+    match_size = config_parse.match_size
+    match_wait = config_parse.match_wait
+    match_rating_band = config_parse.match_rating_band
+
+    def __init__(self, clock, server_log=None, checkpoints=None):
+        if self.turn_timeout_action not in TIMEOUT_ACTIONS:
+            raise ValueError("unknown turn_timeout_action: " +
+                             str(self.turn_timeout_action))
+        self.clock = clock
+        self.log = server_log if server_log is not None else ServerLog()
+        self.clients = set()
+        self.outbound = OutboundStats()
+        self.timers = TimerWheel(self.clock)
+        self.metrics = ServerMetrics(self)
+        self.tables = TableManager(self.dice, config_parse.event_log_dir,
+                                   self.schedule_flush, self.log,
+                                   self.metrics.sent)
+
+        # Clients and tables with queued data, and the call to flush them
+        self._pending = []
+        self._flush_call = None
+
+        # Tables changed since they were last saved
+        self.checkpoints = checkpoints
+        self._changed = set()
+
+        self.matchmaker = None
+        self.username_request = USERNAME
+        if self.match_size:
+            self.matchmaker = Matchmaker(
+                self.match_size, self.match_wait, self.match_rating_band,
+                self.timers, self._start_match)
+            self.username_request = MATCH_USERNAME
+
+        if checkpoints is not None:
+            self.tables.restore(checkpoints.load())
+            if self.reattach_timeout and self.tables.detached_tables():
+                self.timers.schedule(self.reattach_timeout,
+                                     self._reattach_timed_out)
+
+    def schedule_flush(self, client):
+        """Flush a client's queued data at the end of the reactor turn.
+
+        Args:
+            client: A Session with data queued, or a Table with
+                messages queued for its spectators.
+        """
+        self._pending.append(client)
+        if self._flush_call is None:
+            self._flush_call = self.clock.callLater(0, self.flush)
+
+    def checkpoint(self, table):
+        """Save a table's game at the end of the reactor turn, if games are
+        saved.
+
+        Args:
+            table: A Table whose game may have changed, or None.
+        """
+        if self.checkpoints is not None and table is not None:
+            self._changed.add(table)
+            if self._flush_call is None:
+                self._flush_call = self.clock.callLater(0, self.flush)
+
+    def buffered_bytes(self):
+        """Returns: An integer with the bytes held for, or waiting to be
+        written to, every client."""
+        return sum(client.buffered_bytes() for client in self.clients)
+
+    def flush(self):
+        """Save the changed tables, then write the queued data of every
+        client and table.
+
+        Clients are only told of a change once it has been saved. A table
+        that fails to save is logged, and not saved again until it next
+        changes; the other tables are still saved, and the clients still
+        written to.
+        """
+        self._flush_call = None
+        for table in self._changed:
+            try:
+                self.checkpoints.save(table)
+            except Exception as error:
+                table.log.error("checkpoint_failed", error=repr(error))
+        self._changed.clear()
+        pending, self._pending = self._pending, []
+        for client in pending:
+            client.flush()
+
+    def _start_match(self, players):
+        # Seat players matched together at a table of their own, and start
+        # their game.
+        #
+        # Args:
+        #     players: A list of the Waiting players from the Matchmaker.
+
+        table = self.tables.new_table()
+        for player in players:
+            player.client.seat(table, player.username)
+        table.log.info("game_started", player=players[0].username,
+                       players=len(players), matched=True)
+        table.game_started = True
+        players[0].client.next_round()
+        self.checkpoint(table)
+
+    def _reattach_timed_out(self):
+        # Continue restored games without the players who have not rejoined
+        # them, and recycle the tables nobody rejoined.
+
+        for table in self.tables.detached_tables():
+            if table.clients:
+                next(table.clients.itervalues())._drop_detached()
+            else:
+                table.log.info("table_abandoned")
+                self.tables.recycle(table)
+            self.checkpoint(table)
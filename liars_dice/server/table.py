@@ -0,0 +1,319 @@
+"""
+
+Host many games at once, each at its own table.
+
+"""
+import gc
+from liars_dice.server.event_log import NullEventLog, open_event_log
+from liars_dice.server.game import GameStatus
+from liars_dice.server.metrics import Counter
+from liars_dice.server.server_log import ServerLog
+
+# Groups of clients a message can be broadcast to
+PLAYERS = 1
+SPECTATORS = 2
+EVERYONE = PLAYERS | SPECTATORS
+
+
+class Table:
+    """A single game and the clients playing it.
+
+    Args:
+        dice: The DiceSource rolling the dice of the game, or None to use the
+            DiceSource shared by all games.
+        event_log_dir: A string with the directory to log games in, or an
+            empty string if games should not be logged.
+        schedule_flush: A function called with the table when messages are
+            queued for its spectators, which must call the table's flush
+            method at the end of the reactor turn. If None, messages are
+            written to spectators immediately.
+        log: The TableLog recording events at the table, or None to discard
+            them.
+        sent: A Counter of the messages sent to clients by command, shared
+            by every table, or None to count them only at the table.
+        number: An integer with the table's position in its TableManager,
+            or None if it has none.
+
+    Attributes:
+        clients: A dictionary of strings -> protocols. Where the strings are
+            usernames, and the protocols clients seated at the table.
+        spectators: A set of the protocols of clients watching the table.
+            Spectators keep watching when the table is reset.
+        game: A GameStatus object with the current game situation.
+        game_started: A Boolean indicating whether the game has started.
+        event_log: An EventLog recording the game, or a NullEventLog if
+            events are not logged.
+        log: The TableLog recording events at the table.
+        timer: The Timer of the table's turn or lobby timeout, or None if
+            there is none.
+        number: The number of the table.
+        detached: A set of the usernames of players whose game was restored
+            from a checkpoint, but who have not rejoined the table.
+        rounds: An integer incremented whenever a round starts, or the game
+            is reset or restored. Once a game has started, its players and
+            their hands only change along with it.
+    """
+
+    def __init__(self, dice=None, event_log_dir="", schedule_flush=None,
+                 log=None, sent=None, number=None):
+        self.number = number
+        self._dice = dice
+        self._event_log_dir = event_log_dir
+        self._schedule_flush = schedule_flush
+        self.log = log if log is not None else ServerLog().for_table(None)
+        self._sent = (sent if sent is not None else
+                      Counter("sent", "Messages sent.", "command")).values
+        self.spectators = set()
+        self.timer = None
+        self.rounds = 0
+
+        # Messages queued for every spectator
+        self._spectator_messages = []
+
+        self.reset()
+
+    def reset(self):
+        """Clear the table for a new game."""
+        self.set_timer(None)
+        self.rounds += 1
+        self.clients = {}
+        self.detached = set()
+        self.game = GameStatus(self._dice)
+        self.game_started = False
+        self.event_log = open_event_log(self._event_log_dir, self.number)
+
+    def restore(self, snapshot):
+        """Resume a game saved in a checkpoint, with every player detached.
+
+        Games are not logged once restored, as their log up to the
+        checkpoint may have been lost.
+
+        Args:
+            snapshot: A snapshot tuple of a game in progress, as given by
+                GameStatus.snapshot.
+        """
+        self.event_log.close()
+        self.event_log = NullEventLog()
+        self.game.restore(snapshot)
+        self.game_started = True
+        self.detached = set(self.game.seats)
+        self.rounds += 1
+
+    def next_round(self):
+        """Start the next round of the game, and log it."""
+        self.game.next_round()
+        self.event_log.new_round(self.game)
+        self.rounds += 1
+
+    def set_timer(self, timer):
+        """Replace the table's timeout, cancelling the previous one.
+
+        Args:
+            timer: A Timer from liars_dice/server/timer_wheel.py, or None to
+                leave the table without a timeout.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = timer
+
+    def broadcast(self, message, group=EVERYONE):
+        """Send a message to a group of clients.
+
+        The message is queued for each player, and queued once for all
+        spectators, however many are watching.
+
+        Args:
+            message: A Message, from liars_dice/server/session.py.
+            group: PLAYERS, SPECTATORS or EVERYONE.
+        """
+        if group & PLAYERS:
+            for client in self.clients.itervalues():
+                client.queue_message(message)
+            self._sent[message.command] += len(self.clients)
+        if group & SPECTATORS and self.spectators:
+            self._sent[message.command] += len(self.spectators)
+            if (not self._spectator_messages and
+                    self._schedule_flush is not None):
+                self._schedule_flush(self)
+            self._spectator_messages.append(message)
+            if self._schedule_flush is None:
+                self.flush()
+
+    def flush(self):
+        """Write the messages queued for spectators to each of them.
+
+        The messages are joined once for each protocol used by spectators.
+        """
+        if not self._spectator_messages:
+            return
+        messages = self._spectator_messages
+        self._spectator_messages = []
+        text = binary = None
+        for client in self.spectators:
+            if client.binary:
+                if binary is None:
+                    binary = "".join(message.binary() for message in messages)
+                client.write(binary, messages)
+            else:
+                if text is None:
+                    text = "".join(message.text() for message in messages)
+                client.write(text, messages)
+
+    def send(self, username, message):
+        """Send a message to a single player, unless they are detached.
+
+        Args:
+            username: A string with the username of the player.
+            message: A Message, from liars_dice/server/session.py.
+        """
+        client = self.clients.get(username)
+        if client is not None:
+            client.queue_message(message)
+            self._sent[message.command] += 1
+
+
+class TableManager:
+    """Seat players at tables, opening and recycling tables as needed.
+
+    Players join the open table until its game starts, after which a new
+    table is opened. Finished tables are cleared and kept to be opened again,
+    rather than created afresh.
+
+    Args:
+        dice, event_log_dir, schedule_flush: Passed to every Table.
+        server_log: The ServerLog each table's log is created from, or None
+            to discard events at tables.
+        sent: Passed to every Table.
+
+    Attributes:
+        tables: A list of every Table, in the order they were created.
+    """
+
+    def __init__(self, dice=None, event_log_dir="", schedule_flush=None,
+                 server_log=None, sent=None):
+        self._dice = dice
+        self._event_log_dir = event_log_dir
+        self._schedule_flush = schedule_flush
+        self._server_log = (server_log if server_log is not None
+                            else ServerLog())
+        self._sent = sent
+        self.tables = []
+
+        # Usernames of detached players to the restored tables they may
+        # rejoin
+        self._detached = {}
+
+        # The table new players join
+        self._open = None
+
+        # Finished tables waiting to be opened again
+        self._free = []
+
+    def open_table(self):
+        """Find the table new players should join.
+
+        Returns:
+            A Table whose game has not started.
+        """
+        if self._open is None or self._open.game_started:
+            if self._free:
+                self._open = self._free.pop()
+            else:
+                self._open = self._add_table()
+        return self._open
+
+    def new_table(self):
+        """Find a table for a game which starts at once, without opening it
+        to new players.
+
+        Returns:
+            A Table without players.
+        """
+        if self._free:
+            return self._free.pop()
+        return self._add_table()
+
+    def _add_table(self):
+        # Create a table, numbered after the last.
+
+        number = len(self.tables)
+        table = Table(self._dice, self._event_log_dir, self._schedule_flush,
+                      self._server_log.for_table(number), self._sent, number)
+        self.tables.append(table)
+        return table
+
+    def restore(self, games):
+        """Recreate the tables whose games were saved in a checkpoint.
+
+        Each table keeps its number, and its players are detached until they
+        rejoin it. Tables numbered below the highest restored table, but
+        without a game, are kept to be opened.
+
+        Args:
+            games: A list of (table number, snapshot) tuples, as loaded by
+                CheckpointFile.load, for a manager without tables.
+        """
+        restored = dict(games)
+
+        # Collecting garbage while creating every game at once would take
+        # longer than creating them
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for number in xrange(max(restored) + 1 if restored else 0):
+                table = self._add_table()
+                if number in restored:
+                    table.restore(restored[number])
+                    for username in table.detached:
+                        self._detached.setdefault(username, []).append(table)
+                else:
+                    self._free.append(table)
+        finally:
+            if enabled:
+                gc.enable()
+        self._free.reverse()
+
+    def reattach(self, username):
+        """Find a restored table a player may rejoin.
+
+        Players are identified by their username alone. If several restored
+        tables seated the same username, they are rejoined in table order.
+
+        Args:
+            username: A string with the username of the player.
+
+        Returns:
+            The Table the player was detached from, which no longer counts
+            them as detached, or None if there is none.
+        """
+        tables = self._detached.get(username)
+        while tables:
+            table = tables.pop(0)
+            if username in table.detached:
+                table.detached.discard(username)
+                return table
+        self._detached.pop(username, None)
+        return None
+
+    def detached_tables(self):
+        """Returns: A list of the tables with detached players."""
+        return [table for table in self.tables if table.detached]
+
+    def recycle(self, table):
+        """Clear a finished table, so it can be opened again.
+
+        Args:
+            table: A Table belonging to this manager.
+        """
+        table.event_log.close()
+        table.reset()
+        if table is not self._open:
+            self._free.append(table)
+
+    def active_tables(self):
+        """Count the tables with a game in progress.
+
+        Returns:
+            An integer with the number of tables whose game has started.
+        """
+        return sum(1 for table in self.tables if table.game_started)
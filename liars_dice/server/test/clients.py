@@ -0,0 +1,46 @@
+"""
+
+Clients connected to a server through in-memory transports, for the tests of
+the server.
+
+"""
+from twisted.test.proto_helpers import StringTransport
+from liars_dice import network_command
+
+
+def connect(factory, username, kind=None):
+    """Connect a client to a server, and send its username.
+
+    Args:
+        factory: The GameServer to connect to.
+        username: A string with the username of the client.
+        kind: A string with the kind of player the client queues as for
+            matchmaking, or None to not send the QUEUE command.
+
+    Returns:
+        The server's protocol for the client, whose transport is a
+        StringTransport.
+    """
+    protocol = factory.buildProtocol(None)
+    protocol.makeConnection(StringTransport())
+    if kind is not None:
+        protocol.lineReceived(network_command.QUEUE +
+                              network_command.DELIMITER + kind)
+    protocol.lineReceived(network_command.USERNAME +
+                          network_command.DELIMITER + username)
+    return protocol
+
+
+def start(factory, players):
+    """Seat clients at a table, and start its game.
+
+    Args:
+        factory: The GameServer to connect to.
+        players: A list of strings with the usernames of the clients.
+
+    Returns:
+        The Table of the game.
+    """
+    clients = [connect(factory, username) for username in players]
+    clients[0].lineReceived(network_command.START)
+    return clients[0].table
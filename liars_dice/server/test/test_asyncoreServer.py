@@ -0,0 +1,150 @@
+import socket
+from unittest import TestCase
+from liars_dice import binary_command, network_command
+from liars_dice.server.asyncore_server import (AsyncoreServer, Connection,
+                                               EventLoop, Scheduler)
+
+
+class TestScheduler(TestCase):
+    def setUp(self):
+        self.scheduler = Scheduler()
+        self.calls = []
+
+    def test_order(self):
+        self.scheduler.callLater(-1, self.calls.append, "second")
+        self.scheduler.callLater(-2, self.calls.append, "first")
+        self.scheduler.callLater(10, self.calls.append, "later")
+        self.scheduler.run_due()
+        self.assertEqual(self.calls, ["first", "second"])
+
+    def test_cancel(self):
+        call = self.scheduler.callLater(-1, self.calls.append, "cancelled")
+        self.assertTrue(call.active())
+        call.cancel()
+        self.assertFalse(call.active())
+        self.scheduler.run_due()
+        self.assertEqual(self.calls, [])
+
+    def test_timeout(self):
+        self.assertIsNone(self.scheduler.timeout())
+        call = self.scheduler.callLater(10, self.calls.append, "later")
+        self.assertTrue(9 < self.scheduler.timeout() <= 10)
+        call.cancel()
+        self.assertIsNone(self.scheduler.timeout())
+
+
+class Producer:
+    # Records whether a transport has paused it
+
+    def __init__(self):
+        self.paused = False
+
+    def pauseProducing(self):
+        self.paused = True
+
+    def resumeProducing(self):
+        self.paused = False
+
+
+class TestAsyncoreServer(TestCase):
+    def setUp(self):
+        self.loop = EventLoop()
+        self.server = AsyncoreServer(self.loop)
+        self.port = self.server.listen(0, "127.0.0.1").port()
+        self.sockets = []
+
+    def tearDown(self):
+        for sock in self.sockets:
+            sock.close()
+        for dispatcher in self.loop.map.values():
+            dispatcher.close()
+
+    def connect(self, username=None):
+        # Connect a client, sending their username if given
+        client = socket.create_connection(("127.0.0.1", self.port))
+        client.setblocking(False)
+        self.sockets.append(client)
+        if username is not None:
+            client.sendall(network_command.USERNAME +
+                           network_command.DELIMITER + username + "\r\n")
+        return client
+
+    def pump(self, condition):
+        # Run the loop until a condition is met
+        for _ in xrange(500):
+            self.loop.iterate(0.01)
+            if condition():
+                return
+        self.fail("the condition was never met")
+
+    def received(self, client):
+        # Read the data a client has been sent
+        data = []
+        while True:
+            try:
+                chunk = client.recv(65536)
+            except socket.error:
+                break
+            if not chunk:
+                break
+            data.append(chunk)
+        return "".join(data)
+
+    def test_game(self):
+        alice = self.connect("alice")
+        self.connect("bob")
+        tables = self.server.tables
+        self.pump(lambda: len(tables.open_table().game.players) == 2)
+        alice.sendall(network_command.START + "\r\n")
+        table = tables.tables[0]
+        self.pump(lambda: table.game_started)
+        self.loop.iterate(0.01)
+        lines = self.received(alice).split("\r\n")
+        self.assertIn(network_command.CAN_START, lines)
+        self.assertIn(network_command.NEXT_ROUND, lines)
+
+    def test_binary_protocol(self):
+        # Frames sent along with the line switching protocols are decoded
+        client = self.connect()
+        client.sendall(network_command.PROTOCOL + network_command.DELIMITER +
+                       binary_command.PROTOCOL + "\r\n" +
+                       binary_command.encode(binary_command.CLIENT_CODECS,
+                                             network_command.USERNAME,
+                                             ("alice",)))
+        table = self.server.tables.open_table()
+        self.pump(lambda: "alice" in table.clients)
+        self.assertTrue(table.clients["alice"].binary)
+
+    def test_disconnect(self):
+        alice = self.connect("alice")
+        bob = self.connect("bob")
+        carol = self.connect("carol")
+        table = self.server.tables.open_table()
+        self.pump(lambda: len(table.game.players) == 3)
+        alice.sendall(network_command.START + "\r\n")
+        self.pump(lambda: table.game_started)
+        self.received(carol)
+        bob.close()
+        self.pump(lambda: "bob" not in table.game.players)
+        self.loop.iterate(0.01)
+        self.assertIn(network_command.PLAYER_LEFT +
+                      network_command.DELIMITER + "bob",
+                      self.received(carol).split("\r\n"))
+        self.assertEqual(len(self.server.clients), 2)
+
+    def test_producer_paused(self):
+        # Clients not reading their data pause the producer, until the
+        # data buffered for them has been sent
+        near, far = socket.socketpair()
+        self.sockets.append(far)
+        connection = Connection(near, None, self.loop)
+        producer = Producer()
+        connection.registerProducer(producer, True)
+        connection.write("x" * (4 * connection.bufferSize))
+        connection.write("x" * (4 * connection.bufferSize))
+        self.assertTrue(producer.paused)
+
+        far.setblocking(False)
+        self.pump(lambda: self.received(far) is not None and
+                  not connection.buffered_bytes())
+        self.assertFalse(producer.paused)
@@ -0,0 +1,145 @@
+from unittest import TestCase
+from twisted.internet.task import Clock
+from twisted.test.proto_helpers import StringTransport
+from liars_dice import network_command
+from liars_dice.server.backpressure import (OutboundBuffer, OutboundStats,
+                                            SlowClientPolicy)
+from liars_dice.server.game_server import LiarGameFactory
+from liars_dice.server.session import Message
+from liars_dice.server.test.clients import connect
+
+
+class TestOutboundBuffer(TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.stats = OutboundStats()
+        self.transport = StringTransport()
+        self.disconnects = []
+        self.buffer = OutboundBuffer(
+            self.transport, SlowClientPolicy(max_held_bytes=40, timeout=5),
+            self.stats, self.clock, self.disconnects.append)
+
+    def test_registered(self):
+        self.assertIs(self.transport.producer, self.buffer,
+                      "did not register with the transport")
+        self.assertTrue(self.transport.streaming,
+                        "did not register as a push producer")
+
+    def test_policy(self):
+        self.buffer.pauseProducing()
+        self.buffer.hold("status:1\r\n", network_command.PLAYER_STATUS)
+        self.buffer.hold("chat:a,hi\r\n", network_command.CHAT)
+        self.buffer.hold("next_turn:a\r\n", network_command.NEXT_TURN)
+        self.buffer.hold("status:2\r\n", network_command.PLAYER_STATUS)
+        self.assertEqual((self.stats.dropped_messages,
+                          self.stats.collapsed_messages), (1, 1),
+                         "did not apply the policy")
+        self.assertEqual(self.stats.held_bytes, 23,
+                         "did not count the held bytes")
+        self.assertEqual(self.transport.value(), "",
+                         "wrote to a paused transport")
+
+        self.buffer.resumeProducing()
+        self.assertEqual(self.transport.value(),
+                         "next_turn:a\r\nstatus:2\r\n",
+                         "did not write the held data in order")
+        self.assertEqual((self.stats.held_bytes, self.stats.paused_clients),
+                         (0, 0), "did not release the held data")
+        self.assertEqual(self.clock.getDelayedCalls(), [],
+                         "did not cancel the timeout")
+
+    def test_timeout(self):
+        self.buffer.pauseProducing()
+        self.assertEqual(self.stats.paused_clients, 1)
+        self.clock.advance(4)
+        self.assertEqual(self.disconnects, [])
+        self.clock.advance(1)
+        self.assertEqual(self.disconnects, ["timeout"],
+                         "did not disconnect a client paused too long")
+
+    def test_max_held_bytes(self):
+        self.buffer.pauseProducing()
+        self.buffer.hold("x" * 40)
+        self.assertEqual(self.disconnects, [])
+        self.buffer.hold("x")
+        self.assertEqual(self.disconnects, ["held_bytes"],
+                         "did not disconnect a client holding too much")
+
+
+class TestSlowClient(TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.factory = LiarGameFactory(self.clock)
+        self.factory.slow_clients = SlowClientPolicy(timeout=10)
+
+    def test_slow_player(self):
+        fast, slow = [connect(self.factory, name) for name in ("fast", "slow")]
+        self.clock.advance(0)
+        slow.transport.clear()
+        slow.transport.producer.pauseProducing()
+        fast.lineReceived(network_command.CHAT + network_command.DELIMITER +
+                          "hello")
+        fast.lineReceived(network_command.START)
+        self.clock.advance(0)
+        self.assertEqual(slow.transport.value(), "",
+                         "wrote to a paused client")
+        self.assertIn(network_command.NEXT_ROUND, fast.transport.value(),
+                      "delayed the other players")
+        self.assertTrue(slow.buffered_bytes() > 0,
+                        "did not hold the slow player's messages")
+        self.assertEqual(self.factory.buffered_bytes(),
+                         self.factory.outbound.held_bytes,
+                         "did not count the buffered bytes")
+
+        slow.transport.producer.resumeProducing()
+        lines = slow.transport.value().splitlines()
+        self.assertIn(network_command.NEXT_ROUND, lines,
+                      "did not write the held messages")
+        self.assertFalse([line for line in lines
+                          if line.startswith(network_command.CHAT)],
+                         "did not drop the chat")
+
+    def test_paused_before_flush(self):
+        # Messages queued before the client paused are held by the policy
+        fast, slow = [connect(self.factory, name) for name in ("fast", "slow")]
+        self.clock.advance(0)
+        slow.transport.clear()
+        for _ in xrange(2):
+            fast.lineReceived(network_command.CHAT +
+                              network_command.DELIMITER + "hello")
+            fast.lineReceived(network_command.START)
+        slow.transport.producer.pauseProducing()
+        self.clock.advance(0)
+        self.assertEqual(self.factory.outbound.dropped_messages, 2,
+                         "did not drop the chat")
+
+        slow.transport.producer.resumeProducing()
+        self.assertNotIn(network_command.CHAT, slow.transport.value())
+
+    def test_slow_spectator(self):
+        player = connect(self.factory, "player")
+        spectator = self.factory.buildProtocol(None)
+        spectator.makeConnection(StringTransport())
+        spectator.lineReceived(network_command.SPECTATE)
+        self.clock.advance(0)
+        spectator.transport.clear()
+        spectator.transport.producer.pauseProducing()
+        connect(self.factory, "other")
+        player.lineReceived(network_command.CHAT + network_command.DELIMITER +
+                            "hello")
+        self.clock.advance(0)
+        self.assertEqual(spectator.transport.value(), "",
+                         "wrote to a paused spectator")
+        self.assertTrue(spectator.buffered_bytes() > 0,
+                        "did not hold the spectator's messages")
+        self.assertEqual(self.factory.outbound.dropped_messages, 1,
+                         "did not drop the chat for the spectator")
+
+        self.clock.advance(10)
+        self.assertTrue(spectator.transport.disconnected,
+                        "did not disconnect the slow spectator")
+        self.assertEqual(self.factory.outbound.disconnects, 1)
+        spectator.connectionLost()
+        self.assertEqual(self.factory.outbound.held_bytes, 0,
+                         "did not release the held data")
+        self.assertNotIn(spectator, self.factory.clients)
@@ -0,0 +1,257 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from twisted.internet.task import Clock
+from liars_dice import network_command
+from liars_dice.server.checkpoint import (CheckpointFile, HEADER,
+                                          INITIAL_TABLES, decode_table,
+                                          encode_table)
+from liars_dice.server.dice import DiceSource
+from liars_dice.server.game import CompactGameStatus
+from liars_dice.server.game_server import LiarGameFactory
+from liars_dice.server.server_log import ServerLog
+from liars_dice.server.table import Table
+from liars_dice.server.test.clients import connect, start
+from liars_dice.server.test.test_serverLog import RecordingWriter
+
+
+def started_table(number=0, players=("alice", "bob", "carol")):
+    # A table with a game in progress, a round in and a bid made
+    table = Table(DiceSource(seed=number), number=number)
+    for player in players:
+        table.game.add_player(player)
+    table.game_started = True
+    table.game.next_round()
+    table.game.handle_bid(3, 2)
+    table.game.next_turn()
+    return table
+
+
+class TestEncoding(TestCase):
+    def test_round_trip(self):
+        table = started_table()
+        snapshot = decode_table(encode_table(table))
+        self.assertEqual(snapshot, table.game.snapshot())
+        compact = CompactGameStatus()
+        compact.restore(snapshot)
+        self.assertEqual(list(compact.get_player_hands()),
+                         list(table.game.get_player_hands()))
+        self.assertEqual(compact.turn_player(), table.game.turn_player())
+        self.assertEqual(compact.previous_bid, (3, 2))
+
+    def test_no_game(self):
+        table = Table(number=0)
+        table.game.add_player("alice")
+        self.assertEqual(encode_table(table), "",
+                         "encoded a game which had not started")
+
+    def test_truncated(self):
+        data = encode_table(started_table())
+        for length in (3, len(data) - 1):
+            self.assertRaises(ValueError, decode_table, data[:length])
+
+
+class TestCheckpointFile(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "tables.ckpt")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_save_and_load(self):
+        checkpoints = CheckpointFile(self.path)
+        tables = [started_table(number) for number in (0, 3)]
+        for table in tables:
+            checkpoints.save(table)
+        tables[0].game.next_turn()
+        checkpoints.save(tables[0])
+        checkpoints.close()
+
+        games = CheckpointFile(self.path).load()
+        self.assertEqual(games, [(table.number, table.game.snapshot())
+                                 for table in tables],
+                         "did not load the newest game of each table")
+
+    def test_cleared(self):
+        checkpoints = CheckpointFile(self.path)
+        table = started_table()
+        checkpoints.save(table)
+        table.reset()
+        checkpoints.save(table)
+        checkpoints.close()
+        self.assertEqual(CheckpointFile(self.path).load(), [],
+                         "restored a finished game")
+
+    def test_torn_record(self):
+        # A record which was not completely written is ignored in favour
+        # of the table's previous record
+        checkpoints = CheckpointFile(self.path)
+        table = started_table()
+        checkpoints.save(table)
+        expected = table.game.snapshot()
+        table.game.next_turn()
+        checkpoints.save(table)
+        checkpoints._map[HEADER.size + 512 + 20] = "\xff"
+        checkpoints.close()
+        self.assertEqual(CheckpointFile(self.path).load(), [(0, expected)])
+
+    def test_continues_sequence(self):
+        # Saving after a restart replaces the newest record, not the oldest
+        checkpoints = CheckpointFile(self.path)
+        table = started_table()
+        for _ in xrange(3):
+            table.game.next_turn()
+            checkpoints.save(table)
+        checkpoints.close()
+
+        checkpoints = CheckpointFile(self.path)
+        table.game.next_turn()
+        checkpoints.save(table)
+        checkpoints.close()
+        self.assertEqual(CheckpointFile(self.path).load(),
+                         [(0, table.game.snapshot())])
+
+    def test_grow(self):
+        checkpoints = CheckpointFile(self.path)
+        table = started_table(INITIAL_TABLES + 5)
+        checkpoints.save(table)
+        checkpoints.close()
+        self.assertEqual(CheckpointFile(self.path).load(),
+                         [(table.number, table.game.snapshot())])
+
+    def test_oversized(self):
+        checkpoints = CheckpointFile(self.path, slot_size=64)
+        table = started_table(players=["player-" + str(i) for i in xrange(9)])
+        checkpoints.save(table)
+        self.assertEqual(checkpoints.oversized, 1)
+        self.assertEqual(checkpoints.load(), [])
+
+    def test_wrong_slot_size(self):
+        CheckpointFile(self.path).close()
+        self.assertRaises(ValueError, CheckpointFile, self.path, 256)
+
+
+class RecoveringFactory(LiarGameFactory):
+    # Timeouts are class attributes, as they are read when games are
+    # restored
+    turn_timeout = 0
+    reattach_timeout = 30
+
+
+class TestRecovery(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "tables.ckpt")
+        self.clock = Clock()
+        self.factory = self.create_factory()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create_factory(self):
+        # Start a server restoring the games in the checkpoint file
+        return RecoveringFactory(self.clock,
+                                 checkpoints=CheckpointFile(self.path))
+
+    def restart(self):
+        # Kill the server, and start a new one
+        self.clock.advance(0)
+        self.factory.checkpoints.close()
+        self.factory = self.create_factory()
+
+    def test_restore(self):
+        start(self.factory, ["a", "b"])
+        table = start(self.factory, ["c", "d", "e"])
+        turn_player = table.game.turn_player()
+        table.clients[turn_player].lineReceived(
+            network_command.BID + network_command.DELIMITER + "2,1")
+        expected = table.game.snapshot()
+        self.restart()
+
+        tables = self.factory.tables.tables
+        self.assertEqual(len(tables), 2)
+        self.assertEqual(tables[1].game.snapshot(), expected)
+        self.assertTrue(tables[1].game_started)
+        self.assertEqual(tables[1].detached, set(["c", "d", "e"]))
+        opened = connect(self.factory, "f").table
+        self.assertNotIn(opened, tables[:2], "seated a player at a game")
+
+    def test_failed_save(self):
+        # A table that fails to save is logged, and does not stop the other
+        # tables being saved or clients being written to
+        table = start(self.factory, ["a", "b"])
+        other_table = start(self.factory, ["c", "d"])
+        self.clock.advance(0)
+        writer = RecordingWriter()
+        table.log = ServerLog(writer).for_table(table.number)
+        saved = []
+        save = self.factory.checkpoints.save
+
+        def fail(changed):
+            if changed is table:
+                raise IOError("cannot save")
+            saved.append(changed)
+            save(changed)
+
+        self.factory.checkpoints.save = fail
+        clients = [changed.clients[changed.game.turn_player()]
+                   for changed in (table, other_table)]
+        for client in clients:
+            client.transport.clear()
+            client.lineReceived(network_command.BID +
+                                network_command.DELIMITER + "2,1")
+        self.clock.advance(0)
+        self.assertEqual(saved, [other_table], "did not save the other table")
+        self.assertEqual([record[2] for record in writer.records],
+                         ["checkpoint_failed"], "did not log the failure")
+        for client in clients:
+            self.assertTrue(client.transport.value(), "did not write the bid")
+
+        del self.factory.checkpoints.save
+        other = table.clients[table.game.turn_player()]
+        other.transport.clear()
+        other.lineReceived(network_command.BID +
+                           network_command.DELIMITER + "2,2")
+        self.clock.advance(0)
+        self.assertTrue(other.transport.value(), "stopped writing")
+
+    def test_rejoin(self):
+        table = start(self.factory, ["a", "b", "c"])
+        turn_player = table.game.turn_player()
+        self.restart()
+
+        client = connect(self.factory, turn_player)
+        table = self.factory.tables.tables[0]
+        self.assertIs(client.table, table, "did not rejoin the table")
+        self.assertEqual(table.detached, set(["a", "b", "c"]) -
+                         set([turn_player]))
+        self.clock.advance(0)
+        lines = client.transport.value().splitlines()
+        self.assertIn(network_command.PLAY, lines,
+                      "did not ask the turn player to play")
+        client.lineReceived(network_command.BID +
+                            network_command.DELIMITER + "4,1")
+        self.assertEqual(table.game.previous_bid, (4, 1))
+
+        # Rounds are dealt to the players still detached
+        client.lineReceived(network_command.LIAR)
+        self.assertTrue(table.game.game_running)
+
+    def test_reattach_timeout(self):
+        table = start(self.factory, ["a", "b", "c"])
+        start(self.factory, ["d", "e"])
+        self.restart()
+
+        client = connect(self.factory, "a")
+        self.clock.advance(30)
+        table = self.factory.tables.tables[0]
+        self.assertEqual(table.detached, set())
+        self.assertEqual(list(table.game.seats), [],
+                         "did not continue the game without the detached "
+                         "players")
+        self.assertIsNone(client.table, "did not end the game")
+        self.assertFalse(self.factory.tables.tables[1].game_started,
+                         "did not recycle a table nobody rejoined")
+        self.assertEqual(self.factory.tables.detached_tables(), [])
@@ -0,0 +1,165 @@
+from unittest import TestCase
+from array import array
+from liars_dice.server.game import CompactGameStatus, Hand
+
+
+class TestCompactGameStatus(TestCase):
+    def setUp(self):
+        self.status = CompactGameStatus()
+        self.status.add_player("test")
+        self.status.add_player("test2")
+
+    def set_hands(self, hands):
+        # Overwrite the faces of each player's hand, in turn order
+        for player, faces in zip(self.status.seats, hands):
+            slot = self.status.players[player]
+            offset = slot * Hand.INITIAL_HAND_SIZE
+            self.status._faces[offset:offset + len(faces)] = array("B", faces)
+            self.status._hand_sizes[slot] = len(faces)
+        self.status._dice_count = array("L", [0] * 7)
+        for _, hand in self.status.get_player_hands():
+            for face in hand:
+                self.status._dice_count[face] += 1
+
+    def tally(self):
+        # Count the dice of all players from their hands
+        count = [0] * 7
+        for _, hand in self.status.get_player_hands():
+            for face in hand:
+                count[face] += 1
+        return count
+
+    def test_add_player(self):
+        self.assertEqual(len(self.status.players), 2,
+                         "did not add both players")
+        self.assertEqual(list(self.status.seats), ["test", "test2"],
+                         "did not add the players to the turn order")
+        self.assertEqual(self.status.get_player_status(),
+                         [("test", Hand.INITIAL_HAND_SIZE),
+                          ("test2", Hand.INITIAL_HAND_SIZE)],
+                         "failed to create the hands")
+        self.assertEqual(list(self.status._dice_count), self.tally(),
+                         "failed to tally dice")
+
+    def test_remove_die(self):
+        self.set_hands([[1, 2, 3], [4, 5]])
+        self.assertIs(self.status.remove_die("test"), False,
+                      "eliminated a player with dice remaining")
+        self.assertEqual(list(self.status.get_player_hands()),
+                         [("test", [1, 2]), ("test2", [4, 5])],
+                         "did not remove the last die from the hand only")
+        self.assertEqual(list(self.status._dice_count), self.tally(),
+                         "incorrect dice tally")
+
+        # Check removal of players if they run out of dice
+        self.set_hands([[1], [4, 5]])
+        self.assertIs(self.status.remove_die("test"), True,
+                      "did not report the elimination")
+        self.assertEqual(list(self.status.seats), ["test2"],
+                         "did not adjust the seats")
+        self.assertEqual(list(self.status._dice_count), self.tally(),
+                         "incorrect dice tally after elimination")
+
+    def test_remove_player(self):
+        self.status.remove_player("test2")
+        self.assertTrue("test2" not in self.status.players,
+                        "did not remove the correct player")
+        self.assertEqual(list(self.status._dice_count), self.tally(),
+                         "incorrect dice tally for a single player")
+        self.status.remove_player("test")
+        self.assertEqual(len(self.status.seats), 0,
+                         "did not remove the player from the turn order")
+        self.assertEqual(list(self.status._dice_count), [0] * 7,
+                         "incorrect dice tally for no players")
+
+    def test_roll_all(self):
+        self.set_hands([[1, 1, 1], [1]])
+        self.status.roll_all()
+        self.assertEqual(self.status.get_player_status(),
+                         [("test", 3), ("test2", 1)], "hand size changed")
+        for _, hand in self.status.get_player_hands():
+            for face in hand:
+                self.assertTrue(1 <= face <= 6, "invalid die value")
+        self.assertEqual(list(self.status._dice_count), self.tally(),
+                         "incorrect dice tally")
+
+    def test_set_hand(self):
+        self.status.set_hand("test2", [6, 2])
+        self.assertEqual(self.status.get_player_status(),
+                         [("test", 5), ("test2", 2)], "did not set the hand")
+        self.assertEqual(dict(self.status.get_player_hands())["test2"],
+                         [6, 2], "did not set the faces")
+        self.assertEqual(list(self.status._dice_count), self.tally(),
+                         "incorrect dice tally")
+        self.assertRaises(ValueError, self.status.set_hand, "test",
+                          [1] * 6)
+
+    def test_handle_liar(self):
+        self.status.next_round()
+        self.set_hands([[2, 2, 2, 1, 3], [2, 1, 5]])
+
+        # Incorrect call
+        self.status.handle_bid(2, 4)
+        self.assertEqual(self.status.handle_liar(), ("test", False),
+                         "wrong player (incorrect guess)")
+
+        # Correct call
+        self.status.handle_bid(2, 5)
+        self.assertEqual(self.status.handle_liar(), ("test2", False),
+                         "wrong player (correct guess)")
+
+    def test_handle_spot_on(self):
+        self.status.next_round()
+        self.set_hands([[2, 2, 2, 1, 3], [2, 1, 5]])
+
+        # Correct call
+        self.status.handle_bid(2, 4)
+        self.assertEqual(self.status.handle_spot_on(), ("test2", False),
+                         "wrong player (correct guess)")
+
+        # Incorrect call + elimination
+        self.set_hands([[2, 2, 2, 1, 3], [5]])
+        self.status.handle_bid(2, 5)
+        self.status.next_turn()
+        self.assertEqual(self.status.handle_spot_on(), ("test2", True),
+                         "player should be eliminated")
+
+    def test_snapshot(self):
+        # Restoring a snapshot returns the game to the same state
+        self.status.next_round()
+        self.set_hands([[1, 2, 3], [4, 5]])
+        snapshot = self.status.snapshot()
+        self.status.handle_bid(2, 1)
+        self.status.next_turn()
+        self.status.handle_spot_on()
+        self.status.remove_player("test2")
+
+        self.status.restore(snapshot)
+        self.assertEqual(list(self.status.get_player_hands()),
+                         [("test", [1, 2, 3]), ("test2", [4, 5])],
+                         "hands not restored")
+        self.assertEqual(self.status.turn_player(), "test",
+                         "turn player not restored")
+        self.assertIs(self.status.previous_bid, None,
+                      "previous bid not restored")
+        self.assertEqual(list(self.status._dice_count), self.tally(),
+                         "dice tally not restored")
+
+        # Players can still be added after restoring
+        self.status.add_player("test3")
+        self.assertEqual(list(self.status.seats), ["test", "test2", "test3"],
+                         "player not added after restoring")
+
+    def test_clone(self):
+        # Changes to the clone do not affect the original
+        self.status.next_round()
+        snapshot = self.status.snapshot()
+        clone = self.status.clone()
+        self.assertEqual(clone.snapshot(), snapshot, "clone differs")
+
+        clone.handle_bid(1, 1)
+        clone.next_turn()
+        clone.handle_liar()
+        clone.remove_player("test")
+        self.assertEqual(self.status.snapshot(), snapshot,
+                         "original changed by the clone")
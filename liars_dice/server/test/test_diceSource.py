@@ -0,0 +1,53 @@
+from unittest import TestCase
+import collections
+from liars_dice.server.dice import DiceSource, SystemRandomBackend
+from liars_dice.server.game import CompactGameStatus, GameStatus
+
+
+class TestDiceSource(TestCase):
+
+    def test_roll(self):
+        # Appropriate roll values
+        faces = DiceSource().roll(6000)
+        self.assertEqual(len(faces), 6000, "incorrect number of dice")
+        self.assertEqual(set(faces), set(xrange(1, 7)), "invalid faces")
+
+    def test_refill(self):
+        # Rolling more dice than are buffered
+        source = DiceSource(0)
+        source.roll(DiceSource.BUFFER_SIZE - 3)
+        self.assertEqual(len(source.roll(10)), 10,
+                         "incorrect number of dice after refilling")
+        self.assertEqual(len(source.roll(DiceSource.BUFFER_SIZE * 3)),
+                         DiceSource.BUFFER_SIZE * 3,
+                         "incorrect number of dice for a large roll")
+
+    def test_seed(self):
+        # The same seed gives the same faces
+        self.assertEqual(DiceSource(42).roll(100), DiceSource(42).roll(100),
+                         "seeded sources differ")
+        self.assertNotEqual(DiceSource(1).roll(100), DiceSource(2).roll(100),
+                            "differently seeded sources match")
+
+    def test_system_random(self):
+        faces = DiceSource(backend=SystemRandomBackend).roll(100)
+        self.assertTrue(all(1 <= face <= 6 for face in faces),
+                        "invalid faces")
+        self.assertRaises(ValueError, DiceSource, 1, SystemRandomBackend)
+
+    def test_reproducible_game(self):
+        # Games rolled from equally seeded sources have the same hands
+        for status_class in (GameStatus, CompactGameStatus):
+            hands = []
+            for _ in xrange(2):
+                status = status_class(DiceSource(7))
+                status.add_player("test")
+                status.add_player("test2")
+                status.next_round()
+                hands.append(list(status.get_player_hands()))
+                self.assertEqual(
+                    status._dice_count[2],
+                    collections.Counter(
+                        face for _, hand in hands[-1] for face in hand)[2],
+                    "incorrect dice tally")
+            self.assertEqual(hands[0], hands[1], "hands differ")
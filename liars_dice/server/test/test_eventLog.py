@@ -0,0 +1,110 @@
+from unittest import TestCase
+from StringIO import StringIO
+import os
+import shutil
+import tempfile
+from liars_dice.server import event_log
+from liars_dice.server.game import CompactGameStatus, GameStatus
+
+
+class TestEventLog(TestCase):
+    def setUp(self):
+        # Play a short game, logging it as the server would
+        self.file = StringIO()
+        self.file.close = lambda: None
+        self.log = event_log.EventLog(self.file)
+        self.status = GameStatus()
+        for player in ("alice", "bob", "carol_the_third"):
+            self.status.add_player(player)
+            self.log.join(player)
+
+        self.status.next_round()
+        self.status.previous_bid = None
+        self.log.new_round(self.status)
+        self.status.handle_bid(3, 1)
+        self.log.bid(self.status.turn_player(), 3, 1)
+        self.status.next_turn()
+        player = self.status.turn_player()
+        loser, eliminated = self.status.handle_liar()
+        self.log.liar(player)
+        self.log.die_lost(loser)
+
+        self.status.next_round()
+        self.status.previous_bid = None
+        self.log.new_round(self.status)
+        self.hands = list(self.status.get_player_hands())
+        self.status.remove_player("bob")
+        self.log.left("bob")
+
+    def test_records(self):
+        data = self.file.getvalue()
+        self.assertEqual(len(data) % event_log.RECORD_SIZE, 0,
+                         "records are not of a fixed size")
+        events = list(event_log.read_events(data))
+        self.assertEqual([e[1] for e in events[:3]],
+                         ["alice", "bob", "carol_the_third"],
+                         "usernames not read back")
+        hands = [(e[1], e[3]) for e in events if e[0] == event_log.HAND]
+        self.assertEqual(hands[-3:], self.hands,
+                         "hands not read back")
+
+    def test_replay(self):
+        for status_class in (GameStatus, CompactGameStatus):
+            replayed = event_log.replay(self.file.getvalue(), status_class)
+            self.assertEqual(replayed.snapshot()[:-1],
+                             self.status.snapshot()[:-1],
+                             "replay differs from the game")
+            self.assertEqual(replayed.get_player_status(),
+                             self.status.get_player_status(),
+                             "replay differs from the game")
+
+    def test_winner(self):
+        self.log.winner("alice")
+        replayed = event_log.replay(self.file.getvalue())
+        self.assertFalse(replayed.game_running, "the game did not end")
+
+    def test_corrupt(self):
+        data = self.file.getvalue()
+        self.assertRaises(ValueError, list, event_log.read_events(data[:-1]))
+        self.assertRaises(ValueError, list,
+                          event_log.read_events(data + "\xff" * 8))
+
+        # A die recorded as lost by the wrong player
+        self.log.die_lost("carol_the_third")
+        self.status.handle_bid(6, 1)
+        self.log.bid(self.status.turn_player(), 6, 1)
+        self.assertRaises(ValueError, event_log.replay,
+                          self.file.getvalue())
+
+    def test_null_event_log(self):
+        log = event_log.open_event_log("")
+        log.join("alice")
+        log.new_round(self.status)
+        log.bid("alice", 2, 2)
+        log.winner("alice")
+        log.close()
+
+    def test_open_event_log(self):
+        directory = tempfile.mkdtemp()
+        try:
+            logs = [event_log.open_event_log(directory, 3)
+                    for _ in xrange(2)]
+            self.assertEqual(os.listdir(directory), [],
+                             "created a log before any events")
+            for log in logs:
+                for player in self.status.seats:
+                    log.join(player)
+                log.new_round(self.status)
+            names = os.listdir(directory)
+            self.assertEqual(len(names), 2, "games share a log")
+
+            # Rounds are flushed as they start
+            with open(os.path.join(directory, names[0]), "rb") as log_file:
+                events = list(event_log.read_events(log_file.read()))
+            self.assertEqual(events[2][0], event_log.ROUND)
+            for log in logs:
+                log.close()
+            event_log.open_event_log(directory).close()
+            self.assertEqual(len(os.listdir(directory)), 2)
+        finally:
+            shutil.rmtree(directory)
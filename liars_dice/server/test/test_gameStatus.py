@@ -1,15 +1,12 @@
 from unittest import TestCase
 import collections
-from liars_dice.server.game import GameStatus, Hand, Die
+from liars_dice.server.game import CompactGameStatus, GameStatus, Hand, Die
 
 
 class TestGameStatus(TestCase):
     def setUp(self):
         self.status = GameStatus()
-        self.status.players["test"] = Hand()
-        self.status.player_order = ("test",)
-        self.status._dice_count = collections.Counter(
-            self.status.players["test"].die_face())
+        self.status.add_player("test")
 
     def test_remove_die(self):
         # Correct removing of die and player dice pool tracking
@@ -23,14 +20,13 @@ class TestGameStatus(TestCase):
 
         # Check removal of players if they run out of dice
         self.status = GameStatus()
-        self.status.players["singledie"] = Hand()
+        self.status.add_player("singledie")
         self.status.players["singledie"].hand = [Die()]
-        self.status.player_order = ["singledie", ]
         self.status.remove_die("singledie")
         self.assertEqual(len(self.status.players), 0,
                          "did not remove the player")
-        self.assertEqual(len(self.status.player_order), 0,
-                         "did not adjust the player_order")
+        self.assertEqual(len(self.status.seats), 0,
+                         "did not adjust the seats")
 
     def test_add_player(self):
         # Adding players correctly and integrating them within the game
@@ -39,7 +35,7 @@ class TestGameStatus(TestCase):
         new_count = len(self.status.players)
         self.assertEqual(new_count, old_count + 1,
                          "did not add a single player")
-        self.assertEqual(len(self.status.player_order), new_count,
+        self.assertEqual(len(self.status.seats), new_count,
                          "did not add the player to the turn order")
         self.assertIsInstance(self.status.players["test2"], Hand,
                               "failed to create a hand")
@@ -52,7 +48,7 @@ class TestGameStatus(TestCase):
         self.assertEqual(len(self.status.players), 2,
                          "test case setup does not have the expected two "
                          "players")
-        self.assertEqual(len(self.status.player_order), 2,
+        self.assertEqual(len(self.status.seats), 2,
                          "test case setup does not have the expected two "
                          "player turn order")
 
@@ -64,12 +60,12 @@ class TestGameStatus(TestCase):
         self.assertEqual(len(self.status.players), 1,
                          "did not exclusively remove a single player from "
                          "multiple")
-        self.assertEqual(len(self.status.player_order), 1,
+        self.assertEqual(len(self.status.seats), 1,
                          "did not remove the player from the turn order (2 -> "
                          "1)")
         self.assertTrue("test2" not in self.status.players,
                         "did not remove the correct player")
-        self.assertTrue("test2" not in self.status.player_order,
+        self.assertTrue("test2" not in self.status.seats,
                         "did not remove the correct player from turn order")
         self.assertEqual(self.status._dice_count, collections.Counter(
             self.status.players["test"].die_face()), "incorrect dice tally "
@@ -78,7 +74,7 @@ class TestGameStatus(TestCase):
         self.assertEqual(len(self.status.players), 0,
                          "did not exclusively remove a single player when "
                          "alone")
-        self.assertEqual(len(self.status.player_order), 0,
+        self.assertEqual(len(self.status.seats), 0,
                          "did not remove the player from the turn order (1 -> "
                          "0)")
         self.assertEqual(self.status._dice_count, collections.Counter(),
@@ -96,6 +92,14 @@ class TestGameStatus(TestCase):
             self.status.players["test"].die_face()), "incorrect dice tally "
                                                      "for single player")
 
+    def test_set_hand(self):
+        self.status.set_hand("test", [4, 4, 1])
+        self.assertEqual(self.status.players["test"].die_face(), [4, 4, 1],
+                         "did not set the hand")
+        self.assertEqual(self.status._dice_count,
+                         collections.Counter([4, 4, 1]),
+                         "incorrect dice tally")
+
     def test_get_winner(self):
         # No winner
         self.status.players["test2"] = Hand()
@@ -111,25 +115,62 @@ class TestGameStatus(TestCase):
     def test_turn_player(self):
         # Checking iterating through player order
         self.status.add_player("test2")
-        self.status._turn_player_index = 0
+        self.assertIs(self.status.turn_player(), None,
+                      "turn player before the game has begun")
+        self.status.next_round()
         self.assertEqual(self.status.turn_player(), "test",
                          "incorrect turn player (original player)")
-        self.status._turn_player_index = 1
+        self.status.next_turn()
         self.assertEqual(self.status.turn_player(), "test2",
                          "incorrect turn player added player)")
+        self.status.next_turn()
+        self.assertEqual(self.status.turn_player(), "test",
+                         "incorrect turn player (wrapping around)")
 
     def test_turn_player_previous(self):
         # Able to extract the previous turn player
         # No need to check when there is only 1 player, as this functionality
         # won't be required then.
         self.status.add_player("test2")
-        self.status._turn_player_index = 0
+        self.status.next_round()
         self.assertEqual(self.status.turn_player_previous(), "test2",
                          "incorrect previous player - should be 'test2'")
-        self.status._turn_player_index = 1
+        self.status.next_turn()
         self.assertEqual(self.status.turn_player_previous(), "test",
                          "incorrect previous player - should be 'test'")
 
+    def test_next_round(self):
+        # Each round is started by the player after the previous round's
+        for player in ("test2", "test3", "test4"):
+            self.status.add_player(player)
+        self.status.next_round()
+        self.status.next_turn()
+        self.status.next_round()
+        self.assertEqual(self.status.turn_player(), "test2",
+                         "round not started by the next player")
+
+        # Removing players other than the round player does not skip anyone
+        self.status.remove_player("test")
+        self.status.next_round()
+        self.assertEqual(self.status.turn_player(), "test3",
+                         "round player skipped after removing a player")
+
+        # Removing the round player passes the round to the player after
+        self.status.next_turn()
+        self.status.remove_player("test3")
+        self.status.next_round()
+        self.assertEqual(self.status.turn_player(), "test4",
+                         "round player incorrect after removing them")
+
+        # Removing the turn player passes the turn to the player after
+        self.status.remove_player("test4")
+        self.assertEqual(self.status.turn_player(), "test2",
+                         "turn not passed back after removing the turn "
+                         "player")
+        self.status.next_turn()
+        self.assertEqual(self.status.turn_player(), "test2",
+                         "incorrect turn player with a single player")
+
     def test_get_player_status(self):
         self.status.add_player("test2")
 
@@ -141,13 +182,24 @@ class TestGameStatus(TestCase):
                          "incorrect when there are players players")
 
         # No players
-        self.status.players = {}
-        self.status.player_order = []
+        self.status.remove_player("test")
+        self.status.remove_player("test2")
         test_output = self.status.get_player_status()
         expected_output = []
         self.assertEqual(test_output, expected_output,
                          "incorrect for no players")
 
+    def test_total_dice(self):
+        for status in (GameStatus(), CompactGameStatus()):
+            status.add_player("test")
+            status.add_player("test2")
+            status.add_player("test3")
+            status.remove_die("test2")
+            self.assertEqual(status.total_dice(),
+                             3 * Hand.INITIAL_HAND_SIZE - 1,
+                             "incorrect total for " +
+                             status.__class__.__name__)
+
     def test_handle_bid(self):
         # Valid bid (due to face)
         self.status.previous_bid = (1, 5)
@@ -180,9 +232,16 @@ class TestGameStatus(TestCase):
         self.assertEqual(self.status.previous_bid, (3, 3),
                          "accepted an invalid bid")
 
+        # Invalid bid (more dice than are in play)
+        self.status.previous_bid = None
+        self.assertIs(self.status.handle_bid(1, Hand.INITIAL_HAND_SIZE + 1),
+                      False, "accepted a bid for more dice than are in play")
+        self.assertIs(self.status.handle_bid(1, Hand.INITIAL_HAND_SIZE), True,
+                      "rejected a bid for every die in play")
+
     def test_handle_liar(self):
-        self.status._turn_player_index = 0
         self.status.add_player("test2")
+        self.status.next_round()
         self.status._dice_count = collections.Counter([2, 2, 2, 2, 1, 1, 3, 5])
 
         # Incorrect call
@@ -202,8 +261,8 @@ class TestGameStatus(TestCase):
                          "player should be eliminated")
 
     def test_handle_spot_on(self):
-        self.status._turn_player_index = 0
         self.status.add_player("test2")
+        self.status.next_round()
         self.status._dice_count = collections.Counter([2, 2, 2, 2, 1, 1, 3, 5])
 
         # Correct call
@@ -217,8 +276,7 @@ class TestGameStatus(TestCase):
                          "wrong player (incorrect guess)")
 
         # Incorrect call + elimination
-        self.status._turn_player_index = 0
-        self.status.handle_bid(6, 20)
+        self.status.handle_bid(6, 8)
         self.status.players["test"].hand = [Die()]
         self.assertEqual(self.status.handle_spot_on(), ("test", True),
                          "player should be eliminated")
@@ -234,3 +292,52 @@ class TestGameStatus(TestCase):
         test_result = list(self.status.get_player_hands())
         expected_result = [("test", [1]), ("test2", [2, 3])]
         self.assertEqual(test_result, expected_result, "incorrect die values")
+
+    def test_snapshot(self):
+        # Restoring a snapshot returns the game to the same state
+        self.status.add_player("test2")
+        self.status.add_player("test3")
+        self.status.next_round()
+        self.status.handle_bid(2, 3)
+        self.status.next_turn()
+        snapshot = self.status.snapshot()
+        hands = list(self.status.get_player_hands())
+
+        self.status.handle_liar()
+        self.status.remove_player("test")
+        self.status.next_round()
+        self.status.restore(snapshot)
+        self.assertEqual(list(self.status.get_player_hands()), hands,
+                         "hands not restored")
+        self.assertEqual(list(self.status.seats), ["test", "test2", "test3"],
+                         "turn order not restored")
+        self.assertEqual(self.status.turn_player(), "test2",
+                         "turn player not restored")
+        self.assertEqual(self.status.previous_bid, (2, 3),
+                         "previous bid not restored")
+        self.assertEqual(self.status._dice_count, collections.Counter(
+            face for _, hand in hands for face in hand),
+            "dice tally not restored")
+        self.assertEqual(self.status.snapshot(), snapshot,
+                         "snapshot differs after restoring")
+
+        # Snapshots can be restored by CompactGameStatus
+        compact = CompactGameStatus()
+        compact.restore(snapshot)
+        self.assertEqual(compact.snapshot(), snapshot,
+                         "snapshot differs in CompactGameStatus")
+
+    def test_clone(self):
+        # Changes to the clone do not affect the original
+        self.status.add_player("test2")
+        self.status.next_round()
+        snapshot = self.status.snapshot()
+        clone = self.status.clone()
+        self.assertEqual(clone.snapshot(), snapshot, "clone differs")
+
+        clone.handle_bid(1, 1)
+        clone.next_turn()
+        clone.handle_liar()
+        clone.remove_player("test")
+        self.assertEqual(self.status.snapshot(), snapshot,
+                         "original changed by the clone")
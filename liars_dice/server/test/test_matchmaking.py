@@ -0,0 +1,182 @@
+from unittest import TestCase
+from twisted.internet.task import Clock
+from twisted.python import log
+from twisted.test.proto_helpers import StringTransport
+from liars_dice import network_command
+from liars_dice.client.player import Player
+from liars_dice.server.game_server import LiarGameFactory
+from liars_dice.server.matchmaking import Matchmaker
+from liars_dice.server.test.clients import connect
+from liars_dice.server.timer_wheel import TimerWheel
+
+
+def fail_on_logged_errors(test):
+    # Fail a test if it logs an error, such as a timer failing, as these
+    # are caught rather than raised
+    errors = []
+
+    def observe(event):
+        if event.get("isError"):
+            errors.append(log.textFromEventDict(event))
+
+    def check():
+        log.removeObserver(observe)
+        test.assertEqual(errors, [], "logged errors:\n" + "\n".join(errors))
+
+    log.addObserver(observe)
+    test.addCleanup(check)
+
+
+class TestMatchmaker(TestCase):
+    def setUp(self):
+        fail_on_logged_errors(self)
+        self.clock = Clock()
+        self.tables = []
+        self.matchmaker = self.create_matchmaker()
+
+    def create_matchmaker(self, max_wait=10, rating_band=0):
+        return Matchmaker(3, max_wait, rating_band,
+                          TimerWheel(self.clock, resolution=1),
+                          self.tables.append)
+
+    def join(self, *usernames, **options):
+        # Queue players, using their usernames as their clients
+        for username in usernames:
+            self.matchmaker.join(username, username, **options)
+
+    def formed(self):
+        # The usernames at each table formed
+        return [[player.username for player in players]
+                for players in self.tables]
+
+    def test_full_table(self):
+        self.join("a", "b")
+        self.assertEqual(self.tables, [])
+        self.join("c", "d")
+        self.assertEqual(self.formed(), [["a", "b", "c"]])
+        self.assertEqual(self.matchmaker.waiting(), 1)
+        self.assertIn("d", self.matchmaker)
+
+    def test_max_wait(self):
+        self.join("a", "b")
+        self.clock.advance(10)
+        self.assertEqual(self.formed(), [["a", "b"]],
+                         "did not start a short table after the wait")
+        self.join("c")
+        self.clock.advance(100)
+        self.assertEqual(len(self.tables), 1, "started a game alone")
+
+    def test_no_max_wait(self):
+        self.matchmaker = self.create_matchmaker(max_wait=0)
+        self.join("a", "b")
+        self.clock.advance(1000)
+        self.assertEqual(self.tables, [])
+
+    def test_matched_before_waited(self):
+        # A wait ending for a player matched in the same tick is ignored
+        self.join("a", "b")
+        player = self.matchmaker._clients["a"]
+        self.join("c")
+        self.matchmaker._waited(player)
+        self.assertEqual(self.formed(), [["a", "b", "c"]])
+
+    def test_leave(self):
+        self.join("a", "b")
+        self.matchmaker.leave("a")
+        self.matchmaker.leave("a")
+        self.join("c", "d")
+        self.assertEqual(self.formed(), [["b", "c", "d"]])
+
+    def test_duplicate_username(self):
+        self.assertTrue(self.matchmaker.join("client", "a"))
+        self.assertFalse(self.matchmaker.join("other client", "a"))
+        self.assertNotIn("other client", self.matchmaker)
+
+    def test_kinds(self):
+        self.join("bot1", "bot2", kind="bot")
+        self.join("human1", "human2", kind="human")
+        self.join("bot3", kind="bot")
+        self.assertEqual(self.formed(), [["bot1", "bot2", "bot3"]])
+
+    def test_rating_bands(self):
+        self.matchmaker = self.create_matchmaker(rating_band=100)
+        self.join("a", "b", rating=1210)
+        self.join("c", "d", rating=1490)
+        self.join("e", rating=1250)
+        self.assertEqual(self.formed(), [["a", "b", "e"]])
+
+        self.clock.advance(10)
+        self.assertEqual(self.formed()[1:], [["c", "d"]])
+
+        # A player alone in their band is matched with the nearest bands
+        self.join("f", rating=1320)
+        self.join("g", rating=1800)
+        self.join("h", rating=1990)
+        self.clock.advance(10)
+        self.assertEqual(self.formed()[2:], [["f", "g", "h"]])
+
+
+class MatchmakingFactory(LiarGameFactory):
+    # The matchmaker is created from class attributes
+    match_size = 3
+    match_wait = 10
+    match_rating_band = 0
+    turn_timeout = 0
+
+
+class TestMatchmakingServer(TestCase):
+    def setUp(self):
+        fail_on_logged_errors(self)
+        self.clock = Clock()
+        self.factory = MatchmakingFactory(self.clock)
+
+    def test_started(self):
+        clients = [connect(self.factory, name) for name in ("a", "b")]
+        self.assertIsNone(clients[0].table, "seated a waiting player")
+        clients.append(connect(self.factory, "c"))
+        table = clients[0].table
+        self.assertTrue(table.game_started)
+        self.assertEqual(sorted(table.clients), ["a", "b", "c"])
+        self.assertIsNot(table, self.factory.tables.open_table())
+        self.clock.advance(0)
+        lines = clients[0].transport.value().splitlines()
+        self.assertNotIn(network_command.CAN_START, lines)
+        self.assertIn(network_command.NEXT_ROUND, lines)
+
+    def test_kinds(self):
+        bots = [connect(self.factory, "bot" + str(i), "bot")
+                for i in xrange(2)]
+        human = connect(self.factory, "human", "human")
+        self.clock.advance(10)
+        self.assertIsNone(human.table)
+        self.assertTrue(bots[0].table.game_started)
+        self.assertIs(bots[0].table, bots[1].table)
+
+    def test_disconnect_while_waiting(self):
+        connect(self.factory, "a").connectionLost()
+        connect(self.factory, "b")
+        self.clock.advance(10)
+        self.assertEqual(self.factory.matchmaker.waiting(), 1)
+        self.assertEqual(self.factory.matchmaker.matched, 0)
+
+    def test_queue_offer(self):
+        # Clients only queue as a kind of player once the server offers it
+        class Bot(Player):
+            match_kind = "bot"
+
+            def notification_username_request(self):
+                self.send_username("bot")
+
+        for factory, offered in ((LiarGameFactory(self.clock), False),
+                                 (self.factory, True)):
+            server = factory.buildProtocol(None)
+            server.makeConnection(StringTransport())
+            self.clock.advance(0)
+            bot = Bot()
+            bot.makeConnection(StringTransport())
+            bot.dataReceived(server.transport.value())
+            lines = bot.transport.value().splitlines()
+            self.assertEqual(lines[-1], network_command.USERNAME +
+                             network_command.DELIMITER + "bot")
+            self.assertEqual(lines[0].startswith(network_command.QUEUE),
+                             offered, "did not negotiate the QUEUE command")
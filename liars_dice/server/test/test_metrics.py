@@ -0,0 +1,108 @@
+from unittest import TestCase
+from twisted.internet.task import Clock
+from twisted.web.test.requesthelper import DummyRequest
+from liars_dice import binary_command, network_command
+from liars_dice.server import metrics
+from liars_dice.server.game_server import LiarGameFactory
+from liars_dice.server.test.clients import connect
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        self.registry = metrics.MetricsRegistry()
+
+    def test_counter(self):
+        counter = self.registry.add(metrics.Counter(
+            "lines_total", "Lines.", "command", metrics.COMMAND_LABELS))
+        counter.inc(2, network_command.BID)
+        counter.values[binary_command.OPCODES[network_command.BID]] += 1
+        counter.inc(1, network_command.LIAR)
+        self.assertEqual(self.registry.render(),
+                         "# HELP lines_total Lines.\n"
+                         "# TYPE lines_total counter\n"
+                         'lines_total{command="bid"} 3\n'
+                         'lines_total{command="liar"} 1\n')
+
+    def test_unlabelled(self):
+        self.registry.add(metrics.Counter("rounds_total", "Rounds."))
+        self.registry.add(metrics.Gauge("tables", "Tables.", lambda: 4))
+        self.assertEqual(self.registry.render().splitlines()[2::3],
+                         ["rounds_total 0", "tables 4"])
+
+    def test_histogram(self):
+        histogram = self.registry.add(metrics.Histogram(
+            "seconds", "Seconds.", (0.1, 1.0)))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+        self.assertEqual(self.registry.render().splitlines()[2:],
+                         ['seconds_bucket{le="0.1"} 2',
+                          'seconds_bucket{le="1.0"} 3',
+                          'seconds_bucket{le="+Inf"} 4',
+                          "seconds_sum 2.65",
+                          "seconds_count 4"])
+
+    def test_page(self):
+        self.registry.add(metrics.Gauge("tables", "Tables.", lambda: 4))
+        request = DummyRequest([""])
+        body = metrics.MetricsPage(self.registry).render(request)
+        self.assertEqual(request.responseHeaders.getRawHeaders(
+            "content-type"), [metrics.CONTENT_TYPE])
+        self.assertEqual(body, self.registry.render())
+
+
+class TestServerMetrics(TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.factory = LiarGameFactory(self.clock)
+
+    def samples(self):
+        # The samples rendered, by name and labels
+        lines = self.factory.metrics.registry.render().splitlines()
+        return dict(line.rsplit(" ", 1) for line in lines
+                    if not line.startswith("#"))
+
+    def test_play(self):
+        clients = [connect(self.factory, name) for name in ("a", "b")]
+        clients[0].lineReceived(network_command.START)
+        clients[0].lineReceived("nonsense")
+        for _ in xrange(metrics.HANDLER_SAMPLE):
+            clients[0].lineReceived(network_command.CHAT +
+                                    network_command.DELIMITER + "hi")
+        samples = self.samples()
+        self.assertEqual(samples['liars_commands_received_total'
+                                 '{command="chat"}'],
+                         str(metrics.HANDLER_SAMPLE))
+        self.assertEqual(samples['liars_commands_received_total'
+                                 '{command="username"}'], "2")
+        self.assertEqual(samples["liars_invalid_commands_total"], "1")
+        self.assertEqual(samples['liars_messages_sent_total'
+                                 '{command="chat"}'],
+                         str(metrics.HANDLER_SAMPLE * 2))
+        self.assertEqual(samples["liars_rounds_total"], "1")
+        self.assertEqual(samples["liars_active_tables"], "1")
+        self.assertEqual(samples["liars_seated_players"], "2")
+        self.assertEqual(samples["liars_connected_clients"], "2")
+        timed = sum(int(value) for name, value in samples.iteritems()
+                    if name.startswith("liars_handler_seconds_count"))
+        self.assertTrue(timed >= 1, "did not time any handler")
+        timed_cpu = sum(int(value) for name, value in samples.iteritems()
+                        if name.startswith("liars_handler_cpu_seconds_count"))
+        self.assertEqual(timed_cpu, timed,
+                         "did not record the CPU time of timed handlers")
+
+    def test_sampled_per_command(self):
+        # Commands interleaved with others are still timed
+        server_metrics = self.factory.metrics
+        timed = [(key, server_metrics.count_received(key))
+                 for _ in xrange(metrics.HANDLER_SAMPLE)
+                 for key in (network_command.BID, network_command.LIAR)]
+        self.assertEqual([key for key, is_timed in timed if is_timed],
+                         [network_command.BID, network_command.LIAR])
+        self.assertEqual(server_metrics.received.values[network_command.BID],
+                         metrics.HANDLER_SAMPLE)
+
+    def test_clocks(self):
+        wall, cpu = metrics.wall_clock(), metrics.thread_cpu_clock()
+        sum(xrange(10000))
+        self.assertGreaterEqual(metrics.wall_clock(), wall)
+        self.assertGreaterEqual(metrics.thread_cpu_clock(), cpu)
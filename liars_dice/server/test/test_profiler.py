@@ -0,0 +1,95 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from unittest import TestCase
+from twisted.web.test.requesthelper import DummyRequest
+from liars_dice.server import profiler
+
+
+def outer():
+    return inner()
+
+
+def inner():
+    return profiler.collapse(sys._getframe(), {})
+
+
+def spin(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+
+
+class TestProfiler(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "profile.collapsed")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_collapse(self):
+        frames = outer().split(";")
+        self.assertEqual(frames[-2:], ["outer (test_profiler.py:12)",
+                                       "inner (test_profiler.py:16)"])
+
+    def test_profile(self):
+        sampler = profiler.SamplingProfiler(interval=0.001)
+        sampler.start(0.2, self.path)
+        self.assertTrue(sampler.running)
+        self.assertRaises(RuntimeError, sampler.start, 1, self.path)
+        spin(0.2)
+        sampler.wait()
+        self.assertFalse(sampler.running)
+        with open(self.path) as collapsed:
+            lines = collapsed.read().splitlines()
+        samples = sum(int(line.rsplit(" ", 1)[1]) for line in lines)
+        spinning = sum(int(line.rsplit(" ", 1)[1]) for line in lines
+                       if "spin (test_profiler.py" in line)
+        self.assertTrue(samples > 0, "took no samples")
+        self.assertTrue(spinning > samples / 2,
+                        "did not sample the profiled thread")
+
+    def test_other_thread(self):
+        thread = threading.Thread(target=spin, args=(0.2,))
+        thread.start()
+        sampler = profiler.SamplingProfiler(interval=0.001)
+        sampler.start(0.1, self.path, thread.ident)
+        sampler.wait()
+        thread.join()
+        with open(self.path) as collapsed:
+            self.assertIn("spin (test_profiler.py", collapsed.read())
+
+    def test_page(self):
+        sampler = profiler.SamplingProfiler()
+        page = profiler.ProfilePage(sampler, self.directory)
+        request = DummyRequest([""])
+        request.method = "POST"
+        request.args = {"seconds": ["0.05"]}
+        path = page.render(request).strip()
+        self.assertEqual(os.path.dirname(path), self.directory)
+
+        request = DummyRequest([""])
+        request.method = "POST"
+        page.render(request)
+        self.assertEqual(request.responseCode, 409,
+                         "started two profiles at once")
+        sampler.wait()
+        self.assertTrue(os.path.exists(path), "did not write the profile")
+
+        # Profiles taken in the same second are written to separate files
+        request = DummyRequest([""])
+        request.method = "POST"
+        request.args = {"seconds": ["0.05"]}
+        self.assertNotEqual(page.render(request).strip(), path,
+                            "overwrote the previous profile")
+        sampler.wait()
+
+        request = DummyRequest([""])
+        request.method = "POST"
+        request.args = {"seconds": ["1e9"]}
+        page.render(request)
+        self.assertEqual(request.responseCode, 400)
@@ -0,0 +1,93 @@
+import json
+from unittest import TestCase
+from StringIO import StringIO
+from liars_dice.server import server_log
+from liars_dice.server.server_log import ServerLog, LogWriter
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+
+class TestServerLog(TestCase):
+    def setUp(self):
+        self.writer = RecordingWriter()
+
+    def test_levels(self):
+        log = ServerLog(self.writer, server_log.INFO)
+        log.debug("hidden")
+        log.info("shown", player="alice")
+        log.error("failed")
+        events = [(level, event, fields)
+                  for _, level, event, _, fields in self.writer.records]
+        self.assertEqual(events, [(server_log.INFO, "shown",
+                                   {"player": "alice"}),
+                                  (server_log.ERROR, "failed", {})])
+
+    def test_no_writer(self):
+        log = ServerLog()
+        self.assertEqual(log.level, server_log.DISABLED)
+        log.error("discarded")
+        log.for_table(0).error("discarded")
+
+    def test_table_log(self):
+        log = ServerLog(self.writer, server_log.DEBUG)
+        log.for_table(3).debug("bid", face=2, number=4)
+        _, level, event, table, fields = self.writer.records[0]
+        self.assertEqual((level, event, table, fields),
+                         (server_log.DEBUG, "bid", 3,
+                          {"face": 2, "number": 4}))
+
+    def test_sampling(self):
+        log = ServerLog(self.writer, server_log.DEBUG, sample_rate=0.0)
+        table_log = log.for_table(0)
+        table_log.info("not sampled")
+        table_log.warning("always recorded")
+        self.assertEqual([record[2] for record in self.writer.records],
+                         ["always recorded"])
+        log = ServerLog(self.writer, server_log.DEBUG, sample_rate=1.0)
+        self.assertEqual(log.for_table(0).level, server_log.DEBUG)
+
+    def test_format_record(self):
+        line = server_log.format_record(
+            (12.5, server_log.WARNING, "malformed_command", 2,
+             {"line": "bid:\xff"}))
+        self.assertTrue(line.endswith("\n"))
+        self.assertEqual(json.loads(line), {
+            "time": 12.5, "level": "warning", "event": "malformed_command",
+            "table": 2, "line": u"bid:\xff"})
+
+    def test_open_unknown_level(self):
+        self.assertRaises(ValueError, server_log.open_server_log, "",
+                          "verbose", 0, 1.0)
+
+
+class TestLogWriter(TestCase):
+    def setUp(self):
+        self.file = StringIO()
+        self.file.close = lambda: None
+
+    def test_write(self):
+        writer = LogWriter(self.file, interval=0.01)
+        log = ServerLog(writer, server_log.INFO)
+        log.info("player_joined", player="alice")
+        log.for_table(1).info("winner", player="bob")
+        writer.close()
+        lines = [json.loads(line)
+                 for line in self.file.getvalue().splitlines()]
+        self.assertEqual([(line["event"], line["player"], line.get("table"))
+                          for line in lines],
+                         [("player_joined", "alice", None),
+                          ("winner", "bob", 1)])
+
+    def test_drop_when_full(self):
+        writer = LogWriter(self.file, interval=60, max_queued=2)
+        for i in xrange(5):
+            writer.write((0.0, server_log.INFO, "event", None, {"i": i}))
+        self.assertEqual(writer.dropped, 3)
+        writer.close()
+        self.assertEqual(len(self.file.getvalue().splitlines()), 2)
@@ -0,0 +1,222 @@
+from unittest import TestCase
+from twisted.internet.task import Clock
+from twisted.test.proto_helpers import StringTransport
+from liars_dice import network_command
+from liars_dice.server.game_server import LiarGameFactory
+from liars_dice.server.session import MAX_CHAT, Message
+from liars_dice.server.table import (Table, TableManager, EVERYONE, PLAYERS,
+                                     SPECTATORS)
+from liars_dice.server.test.clients import connect
+
+
+class TestTable(TestCase):
+    def setUp(self):
+        self.table = Table()
+        self.player = []
+        self.spectator = []
+        self.table.clients["test"] = self.make_client(self.player)
+        self.table.spectators.add(self.make_client(self.spectator))
+
+    class Client:
+        def __init__(self, received, binary):
+            self.queue_message = received.append
+            self.transport = self
+            self.received = received
+            self.binary = binary
+
+        def write(self, data, messages=None):
+            self.received.append(data)
+
+    def make_client(self, received, binary=False):
+        # Make a client recording the messages and data sent to it
+        return self.Client(received, binary)
+
+    def test_broadcast(self):
+        messages = [Message(network_command.NEXT_TURN, name)
+                    for name in ("a", "b", "c", "d")]
+        self.table.broadcast(messages[0], PLAYERS)
+        self.table.broadcast(messages[1], SPECTATORS)
+        self.table.broadcast(messages[2], EVERYONE)
+        self.table.send("test", messages[3])
+        self.assertEqual(self.player, [messages[0], messages[2], messages[3]],
+                         "incorrect messages sent to the player")
+        self.assertEqual(self.spectator, ["next_turn:b\r\n",
+                                          "next_turn:c\r\n"],
+                         "incorrect data sent to the spectator")
+
+        # Messages for spectators are queued once for all of them
+        flushed = []
+        self.table = Table(schedule_flush=flushed.append)
+        self.spectator = []
+        binary_spectator = []
+        for _ in xrange(3):
+            self.table.spectators.add(self.make_client(self.spectator))
+        self.table.spectators.add(self.make_client(binary_spectator, True))
+        self.table.broadcast(messages[0], SPECTATORS)
+        self.table.broadcast(messages[1], SPECTATORS)
+        self.assertEqual(flushed, [self.table], "did not schedule a flush")
+        self.assertEqual(self.spectator, [], "did not queue the messages")
+        self.table.flush()
+        self.assertEqual(self.spectator,
+                         ["next_turn:a\r\nnext_turn:b\r\n"] * 3,
+                         "did not send the messages to every spectator")
+        self.assertEqual(binary_spectator,
+                         [messages[0].binary() + messages[1].binary()],
+                         "did not send binary spectators frames")
+
+    def test_reset(self):
+        self.table.reset()
+        self.assertEqual(self.table.clients, {}, "did not remove the players")
+        self.assertEqual(len(self.table.spectators), 1,
+                         "removed the spectators")
+
+
+class TestTableManager(TestCase):
+    def setUp(self):
+        self.manager = TableManager()
+
+    def test_open_table(self):
+        table = self.manager.open_table()
+        self.assertIs(self.manager.open_table(), table,
+                      "did not keep the table open")
+        table.game_started = True
+        other = self.manager.open_table()
+        self.assertIsNot(other, table, "did not open a new table")
+        self.assertEqual(self.manager.tables, [table, other],
+                         "did not keep track of the tables")
+        self.assertEqual(self.manager.active_tables(), 1,
+                         "incorrect number of active tables")
+
+    def test_recycle(self):
+        table = self.manager.open_table()
+        table.game.add_player("test")
+        table.game_started = True
+        self.manager.open_table()
+        self.manager.recycle(table)
+        self.assertFalse(table.game_started, "did not reset the table")
+        self.assertEqual(len(table.game.players), 0,
+                         "did not reset the game")
+
+        # The recycled table is opened once the open table starts
+        self.manager.open_table().game_started = True
+        self.assertIs(self.manager.open_table(), table,
+                      "did not reuse the table")
+        self.assertEqual(len(self.manager.tables), 2,
+                         "created an unnecessary table")
+
+
+class TestLiarGameFactory(TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.factory = LiarGameFactory(self.clock)
+
+    def test_concurrent_tables(self):
+        first = [connect(self.factory, "a"), connect(self.factory, "b")]
+        first[0].lineReceived(network_command.START)
+        second = [connect(self.factory, "a"), connect(self.factory, "b")]
+        self.assertIsNot(first[0].table, second[0].table,
+                         "joined a table after its game started")
+        self.assertIs(second[0].table, second[1].table,
+                      "did not seat players at the open table")
+        self.assertTrue(first[0].table.game_started, "game did not start")
+        self.assertFalse(second[0].table.game_started,
+                         "started the wrong game")
+
+    def test_spectate(self):
+        clients = [connect(self.factory, "a"), connect(self.factory, "b")]
+        spectator = self.factory.buildProtocol(None)
+        spectator.makeConnection(StringTransport())
+        spectator.lineReceived(network_command.SPECTATE +
+                               network_command.DELIMITER + "0")
+        table = clients[0].table
+        self.assertEqual(table.spectators, set([spectator]),
+                         "did not add the spectator")
+
+        clients[0].lineReceived(network_command.START)
+        self.clock.advance(0)
+        lines = spectator.transport.value().splitlines()
+        self.assertEqual(lines[1], "player_status:a=5,b=5",
+                         "did not send the game status")
+        self.assertIn(network_command.NEXT_ROUND, lines,
+                      "did not send public messages")
+        self.assertFalse([line for line in lines if line.startswith(
+            network_command.PLAYER_HAND)], "sent a player's hand")
+
+        spectator.connectionLost()
+        self.assertEqual(table.spectators, set(),
+                         "did not remove the spectator")
+
+        # Unknown tables cannot be watched
+        for table_number in ("7", "-1"):
+            spectator = self.factory.buildProtocol(None)
+            spectator.makeConnection(StringTransport())
+            spectator.lineReceived(network_command.SPECTATE +
+                                   network_command.DELIMITER + table_number)
+            self.assertIsNone(spectator._spectating,
+                              "watched unknown table " + table_number)
+
+    def test_malformed_commands(self):
+        clients = [connect(self.factory, "a"), connect(self.factory, "b")]
+        clients[0].lineReceived(network_command.START)
+        game = clients[0].table.game
+        turn_client = clients[0].table.clients[game.turn_player()]
+        for line in ("bid", "bid:x,1", "bid:1", "chat", "unknown"):
+            turn_client.lineReceived(line)
+        self.assertIsNone(game.previous_bid, "accepted a malformed bid")
+        turn_client.lineReceived("bid:2,1")
+        self.assertEqual(game.previous_bid, (2, 1), "did not accept the bid")
+
+    def test_long_chat(self):
+        # Chat too long for a line or frame is cut short before it is relayed
+        clients = [connect(self.factory, name) for name in ("a", "b")]
+        clients[1].binary = True
+        clients[0].lineReceived(network_command.CHAT +
+                                network_command.DELIMITER + "x" * 70000)
+        self.clock.advance(0)
+        self.assertIn(network_command.CHAT + network_command.DELIMITER +
+                      "a," + "x" * MAX_CHAT + "\r\n",
+                      clients[0].transport.value())
+        self.assertTrue(clients[1].transport.value(),
+                        "did not relay the chat to a binary client")
+
+    def test_commands_before_username(self):
+        protocol = self.factory.buildProtocol(None)
+        protocol.makeConnection(StringTransport())
+        protocol.lineReceived(network_command.START)
+        protocol.lineReceived(network_command.LIAR)
+        self.assertIsNone(protocol.table, "seated a client with no username")
+
+    def test_recycle_finished_table(self):
+        clients = [connect(self.factory, "a"), connect(self.factory, "b")]
+        table = clients[0].table
+        clients[0].lineReceived(network_command.START)
+        clients[1].connectionLost()
+        self.assertIsNone(clients[0].table, "did not unseat the winner")
+        self.assertTrue(clients[0].transport.disconnecting,
+                        "did not disconnect the winner")
+        self.assertIs(connect(self.factory, "c").table, table,
+                      "did not reuse the finished table")
+        self.assertTrue(clients[0].transport.value().endswith(
+            network_command.WINNER + network_command.DELIMITER + "a\r\n"),
+            "did not send queued lines before disconnecting")
+
+    def test_batched_writes(self):
+        clients = [connect(self.factory, "a"), connect(self.factory, "b")]
+        self.assertEqual(clients[0].transport.value(), "",
+                         "wrote lines before the end of the reactor turn")
+        self.clock.advance(0)
+        self.assertEqual(clients[0].transport.value().splitlines()[0],
+                         "username:bin1",
+                         "did not write the queued lines")
+
+        # Every line sent for a command is written at once
+        writes = []
+        clients[1].transport.writeSequence = writes.append
+        clients[0].lineReceived(network_command.START)
+        self.clock.advance(0)
+        self.assertEqual(len(writes), 1, "did not batch the writes")
+        self.assertIn(network_command.NEXT_ROUND + "\r\n", writes[0],
+                      "did not send the new round")
+        self.assertEqual([call for call in self.clock.getDelayedCalls()
+                          if call.func == self.factory.flush], [],
+                         "flush was scheduled again")
@@ -0,0 +1,162 @@
+from unittest import TestCase
+from twisted.internet.task import Clock
+from liars_dice import network_command
+from liars_dice.server.game_server import LiarGameFactory
+from liars_dice.server.session import TIMEOUT_FORFEIT, TIMEOUT_LIAR
+from liars_dice.server.test.clients import connect, start
+from liars_dice.server.timer_wheel import TimerWheel, SLOTS
+
+
+class TestTimerWheel(TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.wheel = TimerWheel(self.clock, resolution=1)
+        self.fired = []
+
+    def test_schedule(self):
+        self.wheel.schedule(3, self.fired.append, "a")
+        self.wheel.schedule(1.5, self.fired.append, "b")
+        self.assertEqual(self.wheel.armed, 2)
+        self.clock.advance(1)
+        self.assertEqual(self.fired, [])
+        self.clock.advance(1)
+        self.assertEqual(self.fired, ["b"], "did not round up to a tick")
+        self.clock.advance(1)
+        self.assertEqual(self.fired, ["b", "a"])
+        self.assertEqual(self.wheel.armed, 0)
+        self.assertEqual(self.clock.getDelayedCalls(), [],
+                         "kept advancing without timers")
+
+    def test_cancel(self):
+        timer = self.wheel.schedule(2, self.fired.append, "a")
+        self.assertTrue(timer.active())
+        timer.cancel()
+        timer.cancel()
+        self.assertFalse(timer.active())
+        self.assertEqual(self.wheel.armed, 0)
+        self.clock.advance(5)
+        self.assertEqual(self.fired, [], "ran a cancelled timer")
+
+    def test_cancel_in_same_tick(self):
+        # A timer cancelled by another due in the same tick does not run
+        timers = []
+
+        def cancel_others(name):
+            self.fired.append(name)
+            for timer in timers:
+                timer.cancel()
+
+        timers.extend(self.wheel.schedule(1, cancel_others, name)
+                      for name in ("a", "b"))
+        self.clock.advance(1)
+        self.assertEqual(len(self.fired), 1, "ran a cancelled timer")
+        self.assertEqual(self.wheel.armed, 0)
+        self.assertFalse(any(timer.active() for timer in timers))
+
+    def test_coarse_levels(self):
+        # Timers beyond the first and second wheels are cascaded in time
+        delays = [SLOTS - 1, SLOTS, SLOTS * 3 + 7, SLOTS ** 2 + 5]
+        for delay in delays:
+            self.wheel.schedule(delay, self.fired.append, delay)
+        for tick in xrange(1, delays[-1] + 1):
+            self.clock.advance(1)
+            self.assertEqual(self.fired, [delay for delay in delays
+                                          if delay <= tick],
+                             "incorrect timers run at tick " + str(tick))
+
+    def test_idle(self):
+        # Ticks without timers are skipped rather than run
+        self.wheel.schedule(1, self.fired.append, "a")
+        self.clock.advance(1)
+        self.clock.advance(10000)
+        self.wheel.schedule(2, self.fired.append, "b")
+        self.clock.advance(1)
+        self.assertEqual(self.fired, ["a"])
+        self.clock.advance(1)
+        self.assertEqual(self.fired, ["a", "b"])
+
+    def test_late_advance(self):
+        # The reactor may advance the wheel late, running every timer due
+        self.wheel.schedule(2, self.fired.append, "a")
+        self.wheel.schedule(4, self.fired.append, "b")
+        self.clock.advance(10)
+        self.assertEqual(self.fired, ["a", "b"])
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+class TestTimeouts(TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.factory = LiarGameFactory(self.clock)
+        self.factory.turn_timeout = 10
+        self.factory.turn_timeout_action = TIMEOUT_LIAR
+        self.factory.lobby_timeout = 30
+
+    def test_lobby_timeout(self):
+        clients = [connect(self.factory, "a")]
+        self.clock.advance(60)
+        self.assertIsNone(clients[0].table.timer,
+                          "timed out a lobby without enough players")
+        clients.append(connect(self.factory, "b"))
+        self.clock.advance(29)
+        self.assertFalse(clients[0].table.game_started)
+        self.clock.advance(1)
+        self.assertTrue(clients[0].table.game_started,
+                        "did not start the game after the lobby timeout")
+
+    def test_start_cancels_lobby_timeout(self):
+        table = start(self.factory, ["a", "b"])
+        turn_timer = table.timer
+        self.assertEqual(self.factory.timers.armed, 1,
+                         "did not replace the lobby timeout")
+        self.assertTrue(turn_timer.active())
+
+    def test_turn_timeout_liar(self):
+        table = start(self.factory, ["a", "b", "c"])
+        player = table.game.turn_player()
+        table.clients[player].lineReceived(network_command.BID +
+                                           network_command.DELIMITER + "2,1")
+        self.clock.advance(9)
+        self.assertIsNotNone(table.game.previous_bid)
+        self.clock.advance(1)
+        self.assertIsNone(table.game.previous_bid,
+                          "did not declare Liar for the timed out player")
+        self.assertEqual(sum(dice for _, dice in
+                             table.game.get_player_status()), 14,
+                         "no die was lost")
+        self.assertTrue(table.timer.active(), "did not time the next turn")
+
+    def test_turn_timeout_forfeit(self):
+        table = start(self.factory, ["a", "b", "c"])
+        player = table.game.turn_player()
+        client = table.clients[player]
+        self.clock.advance(10)
+        self.assertNotIn(player, table.game.players,
+                         "did not forfeit the timed out player")
+        self.assertIsNone(client.table)
+        self.assertTrue(client.transport.disconnecting,
+                        "did not disconnect the timed out player")
+        self.assertNotEqual(table.game.turn_player(), player)
+        self.assertTrue(table.timer.active(), "did not time the next turn")
+
+    def test_forfeit_policy(self):
+        self.factory.turn_timeout_action = TIMEOUT_FORFEIT
+        table = start(self.factory, ["a", "b"])
+        player = table.game.turn_player()
+        table.clients[player].lineReceived(network_command.BID +
+                                           network_command.DELIMITER + "2,1")
+        winner_client = table.clients[player]
+        self.assertNotEqual(table.game.turn_player(), player)
+        self.clock.advance(10)
+        self.clock.advance(0)
+        self.assertIn(network_command.WINNER + network_command.DELIMITER +
+                      player, winner_client.transport.value().splitlines(),
+                      "did not forfeit the game")
+        self.assertEqual(self.factory.timers.armed, 0,
+                         "left a timer armed at a finished table")
+
+    def test_unknown_action(self):
+        class PassingFactory(LiarGameFactory):
+            turn_timeout_action = "pass"
+
+        self.assertRaises(ValueError, PassingFactory, self.clock)
@@ -0,0 +1,185 @@
+"""
+
+A hierarchical timer wheel, for scheduling many timeouts cheaply.
+
+Time is divided into ticks of a fixed resolution. Timers due within
+SLOTS ticks are kept in the slot of the first wheel for the tick they are
+due, and later timers in a coarser wheel, where each slot covers SLOTS times
+as many ticks. Whenever the first wheel completes a revolution, the next
+slot of the coarser wheel is emptied into the finer one. Scheduling and
+cancelling a timer both take constant time, however many are armed, and a
+single reactor call advances the wheel each tick while any timer is armed.
+
+"""
+import math
+from twisted.python import log
+
+LEVEL_BITS = 8
+SLOTS = 1 << LEVEL_BITS
+SLOT_MASK = SLOTS - 1
+LEVELS = 4  # Timers may be up to SLOTS ** LEVELS ticks away
+
+
+class Timer:
+    """A call scheduled by a TimerWheel.
+
+    Attributes:
+        expires: An integer with the tick the timer is due.
+        called: A Boolean indicating whether the timer has been run.
+        cancelled: A Boolean indicating whether the timer was cancelled.
+    """
+
+    def __init__(self, wheel, expires, function, args):
+        self._wheel = wheel
+        self.expires = expires
+        self.function = function
+        self.args = args
+
+        # The set of timers in the slot holding the timer, or None if it
+        # has been taken out of the wheel to run, or cancelled
+        self.slot = None
+        self.called = False
+        self.cancelled = False
+
+    def active(self):
+        """Returns: A Boolean indicating whether the timer is still due."""
+        return not (self.called or self.cancelled)
+
+    def cancel(self):
+        """Stop the timer from running, if it is still due.
+
+        A timer due in the same tick as the one running may still be
+        cancelled.
+        """
+        if not self.active():
+            return
+        self.cancelled = True
+        if self.slot is not None:
+            self.slot.discard(self)
+            self.slot = None
+            self._wheel.armed -= 1
+
+
+class TimerWheel:
+    """Run functions after a delay, to the nearest tick.
+
+    Args:
+        clock: The IReactorTime advancing the wheel.
+        resolution: A float with the seconds per tick.
+
+    Attributes:
+        armed: An integer with the number of timers due.
+    """
+
+    def __init__(self, clock, resolution=0.1):
+        self._clock = clock
+        self._resolution = resolution
+        self._start = clock.seconds()
+        self.armed = 0
+
+        # The last tick run, and the sets of timers due in each slot of
+        # each level
+        self._tick = 0
+        self._levels = [[set() for _ in xrange(SLOTS)]
+                        for _ in xrange(LEVELS)]
+
+        # The reactor call advancing the wheel, while timers are armed
+        self._advance_call = None
+
+    def schedule(self, delay, function, *args):
+        """Schedule a call.
+
+        Args:
+            delay: A float with the seconds until the call. The call is
+                made on the first tick at or after the delay.
+            function: The function to call.
+            *args: The arguments to call the function with.
+
+        Returns:
+            A Timer, which can be cancelled.
+        """
+        now = self._clock.seconds()
+        if not self.armed:
+            # Skip the ticks in which nothing was due
+            self._tick = max(self._tick, self._current_tick(now))
+        expires = max(int(math.ceil(
+            (now + delay - self._start) / self._resolution)), self._tick + 1)
+        timer = Timer(self, expires, function, args)
+        self._add(timer)
+        self.armed += 1
+        if self._advance_call is None:
+            self._advance_call = self._clock.callLater(self._resolution,
+                                                       self.advance)
+        return timer
+
+    def advance(self):
+        """Run every timer due, up to the current time.
+
+        Called by the wheel itself, once per tick while timers are armed.
+        """
+        self._advance_call = None
+        target = self._current_tick(self._clock.seconds())
+        levels = self._levels
+        while self._tick < target and self.armed:
+            self._tick += 1
+            tick = self._tick
+
+            # Move the timers of coarser wheels due in this revolution
+            level = 0
+            while not (tick >> (LEVEL_BITS * level)) & SLOT_MASK:
+                level += 1
+                if level == LEVELS:
+                    break
+                slot = levels[level][(tick >> (LEVEL_BITS * level)) &
+                                     SLOT_MASK]
+                if slot:
+                    timers = list(slot)
+                    slot.clear()
+                    for timer in timers:
+                        self._add(timer)
+
+            slot = levels[0][tick & SLOT_MASK]
+            if slot:
+                timers = list(slot)
+                slot.clear()
+                self.armed -= len(timers)
+                for timer in timers:
+                    timer.slot = None
+                for timer in timers:
+                    if timer.cancelled:
+                        continue
+                    timer.called = True
+                    try:
+                        timer.function(*timer.args)
+                    except Exception:
+                        log.err(None, "Timer failed")
+
+        if self.armed:
+            self._tick = max(self._tick, target)
+            if self._advance_call is None:
+                self._advance_call = self._clock.callLater(self._resolution,
+                                                           self.advance)
+
+    def _current_tick(self, now):
+        # The tick of a time.
+        #
+        # Args:
+        #     now: A float with the time, as given by the clock.
+
+        return int((now - self._start) / self._resolution)
+
+    def _add(self, timer):
+        # Place a timer in the slot for its tick, in the finest wheel that
+        # reaches it.
+
+        expires = timer.expires
+        remaining = expires - self._tick
+        level = 0
+        while remaining >= SLOTS << (LEVEL_BITS * level):
+            level += 1
+        if level >= LEVELS:
+            raise ValueError("timer is too far in the future")
+        slot = self._levels[level][(expires >> (LEVEL_BITS * level)) &
+                                   SLOT_MASK]
+        slot.add(timer)
+        timer.slot = slot
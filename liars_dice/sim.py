@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+
+"""
+
+Play games in-process, without a server or network connections, for
+evaluating strategies.
+
+Each player is given a policy: a callable that takes a PlayerView of the game
+from that player's perspective and returns its play. A play is either a
+(face, number) tuple for a bid, network_command.LIAR or
+network_command.SPOT_ON. Policies which play at random draw from the
+PlayerView's random generator, so games played with a seed are reproducible.
+
+"""
+import collections
+import random
+import time
+from liars_dice import network_command
+from liars_dice.odds import BidOdds
+from liars_dice.server.dice import DiceSource
+from liars_dice.server.game import CompactGameStatus
+
+# The game as seen by the turn player.
+#
+# username: A string with the username of the turn player.
+# hand: A list of integers with the face values of the player's dice.
+# previous_bid: A (face, number) tuple of integers with the previous bid, or
+#     None if no bid has been made this round.
+# player_status: A list of (username, number of dice) tuples in turn order,
+#     as given by GameStatus.get_player_status.
+# total_dice: An integer with the number of dice held by all players.
+# random: The random.Random the player's policy draws from, or the random
+#     module if the game is not seeded.
+PlayerView = collections.namedtuple(
+    "PlayerView",
+    ["username", "hand", "previous_bid", "player_status", "total_dice",
+     "random"])
+
+# Statistics from a number of simulated games.
+#
+# games: An integer with the number of games played.
+# turns: An integer with the number of turns played over all games.
+# seconds: A floating point number with the time taken to play the games.
+# wins: A collections.Counter of usernames to the number of games won.
+SimulationResult = collections.namedtuple(
+    "SimulationResult", ["games", "turns", "seconds", "wins"])
+
+
+class Simulator:
+    """Play games between policies directly on a GameStatus.
+
+    Play follows the same flow as Session in liars_dice/server/session.py.
+
+    Attributes:
+        policies: A dictionary of usernames to the policy playing as them.
+        usernames: A list of usernames in turn order.
+        status_class: The GameStatus class (or subclass) used to run games.
+        dice: The DiceSource used to roll the dice of every game, or None
+            to use the DiceSource shared by all games.
+        random: The random.Random the policies draw from, or the random
+            module if there is no seed.
+    """
+
+    def __init__(self, policies, usernames=None,
+                 status_class=CompactGameStatus, seed=None):
+        if usernames is None:
+            usernames = ["player" + str(i) for i in xrange(len(policies))]
+        self.usernames = list(usernames)
+        self.policies = dict(zip(self.usernames, policies))
+        self.status_class = status_class
+        self.dice = None
+        self.random = random
+        if seed is not None:
+            # The dice and the policies draw from separate generators
+            self.dice = DiceSource(2 * seed)
+            self.random = random.Random(2 * seed + 1)
+
+    def play_game(self):
+        """Play a single game to completion.
+
+        Returns:
+            A tuple composed of a string with the username of the winner, and
+            an integer with the number of turns played.
+
+        Raises:
+            ValueError: A policy made an invalid bid.
+            RuntimeError: A policy made a declaration with no previous bid.
+        """
+        status = self.status_class(self.dice)
+        for username in self.usernames:
+            status.add_player(username)
+        policies = self.policies
+        turns = 0
+
+        while True:
+            status.next_round()
+            status.previous_bid = None
+
+            # Hands and dice counts only change between rounds
+            hands = dict(status.get_player_hands())
+            player_status = status.get_player_status()
+            total_dice = sum(n for _, n in player_status)
+
+            while True:
+                player = status.turn_player()
+                play = policies[player](PlayerView(
+                    player, hands[player], status.previous_bid,
+                    player_status, total_dice, self.random))
+                turns += 1
+
+                if play == network_command.LIAR:
+                    _, eliminated = status.handle_liar()
+                elif play == network_command.SPOT_ON:
+                    _, eliminated = status.handle_spot_on()
+                elif status.handle_bid(*play):
+                    status.next_turn()
+                    continue
+                else:
+                    raise ValueError(player + " made an invalid bid: " +
+                                     str(play))
+
+                if eliminated:
+                    winner = status.get_winner()
+                    if winner is not None:
+                        return winner, turns
+                break
+
+    def play(self, games):
+        """Play a number of games.
+
+        Args:
+            games: An integer with the number of games to play.
+
+        Returns:
+            A SimulationResult with the outcome of the games.
+        """
+        wins = collections.Counter()
+        turns = 0
+        start = time.time()
+        for _ in xrange(games):
+            winner, game_turns = self.play_game()
+            wins[winner] += 1
+            turns += game_turns
+        return SimulationResult(games, turns, time.time() - start, wins)
+
+
+def simple_bot_policy(view):
+    """Play using the strategy of SimpleBot.
+
+    See liars_dice/client/interface/simple_bot.py for details on the strategy.
+    """
+    randint, chance = view.random.randint, view.random.random
+    if view.previous_bid is None:
+        return randint(1, 6), 1
+    previous_face, previous_number = view.previous_bid
+
+    # Replicates SimpleBot, which uses the previous number of dice here
+    expected_dice_per_face = previous_number / 6 + 2
+    if previous_number == expected_dice_per_face and 0.3 > chance():
+        return network_command.SPOT_ON
+    elif previous_number == expected_dice_per_face + 1 and 0.6 > chance():
+        return network_command.LIAR
+    elif previous_number >= expected_dice_per_face + 2 and 0.8 > chance():
+        return network_command.LIAR
+
+    if previous_face == 6 or 0.3 > chance():
+        # There are no more dice to bid for
+        if previous_number == view.total_dice:
+            return network_command.LIAR
+        return randint(previous_face, 6), previous_number + 1
+    return randint(previous_face + 1, 6), previous_number
+
+
+class OddsPolicy:
+    """Play the likeliest bid, and challenge unlikely bids, by their odds.
+
+    A policy class: each instance plays as one player.
+
+    Attributes:
+        liar_below: A float with the probability of the previous bid being
+            correct below which the player declares 'Liar!'.
+        spot_on_above: A float with the probability of the previous bid
+            being exactly right above which the player declares 'Spot On!'.
+    """
+    liar_below = 0.3
+    spot_on_above = 0.35
+
+    def __init__(self):
+        self.odds = BidOdds()
+
+    def __call__(self, view):
+        if view.previous_bid is not None:
+            at_least, exactly = self.odds.bid(
+                view.hand, view.previous_bid[0], view.previous_bid[1],
+                view.total_dice)
+            if exactly > self.spot_on_above:
+                return network_command.SPOT_ON
+            if at_least < self.liar_below:
+                return network_command.LIAR
+        scores = self.odds.score_bids(view.hand, view.previous_bid,
+                                      view.total_dice)
+        if not scores:
+            return network_command.LIAR
+
+        # The weakest of the likeliest bids
+        face, number, _, _ = max(scores, key=lambda score: score[2])
+        return face, number
+
+
+def run(players=4, games=20000):
+    """Play SimpleBot policies against each other and report the speed."""
+    result = Simulator([simple_bot_policy] * players).play(games)
+    print "Games: %d, turns: %d, seconds: %.2f" % (
+        result.games, result.turns, result.seconds)
+    print "Games/s: %.0f, turns/min: %.0f" % (
+        result.games / result.seconds, result.turns / result.seconds * 60)
+    for username, wins in sorted(result.wins.iteritems()):
+        print username + "\t" + str(wins)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,117 @@
+from unittest import TestCase, skipIf
+import collections
+from liars_dice.server.game import GameStatus
+
+try:
+    import numpy as np
+    from liars_dice import batch_sim
+except ImportError:
+    np = None
+
+
+@skipIf(np is None, "NumPy is not installed")
+class TestBatchSimulator(TestCase):
+    GAMES = 200
+    PLAYERS = 4
+
+    def setUp(self):
+        self.simulator = batch_sim.BatchSimulator(self.GAMES, self.PLAYERS,
+                                                  seed=0)
+
+    def copy_hands(self, status, game):
+        # Give a GameStatus the hands rolled for a game by the simulator
+        for seat, player in enumerate(str(i) for i in xrange(self.PLAYERS)):
+            if player in status.players:
+                faces = self.simulator.faces[game, seat]
+                hand = status.players[player].hand
+                for die, face in zip(hand, faces):
+                    die.face = int(face)
+        status._dice_count = collections.Counter(
+            face for _, hand in status.get_player_hands() for face in hand)
+
+    def test_cross_check(self):
+        # Replay the plays of every game on GameStatus and compare results
+        statuses = []
+        for game in xrange(self.GAMES):
+            status = GameStatus()
+            for seat in xrange(self.PLAYERS):
+                status.add_player(str(seat))
+            status.next_round()
+            statuses.append(status)
+            self.copy_hands(status, game)
+
+        random_state = np.random.RandomState(1)
+        while not self.simulator.done.all():
+            play, face, number = batch_sim.simple_bot_policy(self.simulator)
+
+            # Mix in some random, often invalid, plays
+            noise = random_state.random_sample(self.GAMES) < 0.2
+            play[noise] = random_state.randint(0, 3, self.GAMES)[noise]
+            face[noise] = random_state.randint(0, 8, self.GAMES)[noise]
+            number[noise] = random_state.randint(0, 24, self.GAMES)[noise]
+
+            result = self.simulator.step(play, face, number)
+            for game, status in enumerate(statuses):
+                if status is None:
+                    continue
+                if play[game] == batch_sim.BID:
+                    valid = status.handle_bid(int(face[game]),
+                                              int(number[game]))
+                    if valid:
+                        status.next_turn()
+                    loser = None
+                else:
+                    try:
+                        if play[game] == batch_sim.LIAR:
+                            loser, eliminated = status.handle_liar()
+                        else:
+                            loser, eliminated = status.handle_spot_on()
+                        valid = True
+                    except RuntimeError:
+                        valid = False
+                        loser = None
+
+                self.assertEqual(valid, result.valid[game],
+                                 "validity differs")
+                if loser is not None:
+                    self.assertEqual(int(loser), result.loser[game],
+                                     "loser differs")
+                    self.assertEqual(eliminated, result.eliminated[game],
+                                     "elimination differs")
+                    if status.get_winner() is not None:
+                        self.assertEqual(int(status.get_winner()),
+                                         self.simulator.winner[game],
+                                         "winner differs")
+                        statuses[game] = None
+                        continue
+                    self.assertTrue(result.new_round[game],
+                                    "no new round started")
+                    status.next_round()
+                    status.previous_bid = None
+                    self.copy_hands(status, game)
+
+                self.assertEqual(
+                    [(int(p), n) for p, n in status.get_player_status()],
+                    [(s, n) for s, n in enumerate(self.simulator.dice[game])
+                     if n > 0], "player status differs")
+                self.assertEqual(int(status.turn_player()),
+                                 self.simulator.turn_player()[game],
+                                 "turn player differs")
+
+        self.assertEqual(statuses, [None] * self.GAMES,
+                         "games not finished by GameStatus")
+
+    def test_play(self):
+        self.simulator.play(batch_sim.simple_bot_policy)
+        self.assertTrue(self.simulator.done.all(), "games not finished")
+        self.assertTrue((self.simulator.winner >= 0).all(), "missing winner")
+        self.assertTrue(((self.simulator.dice > 0).sum(1) == 1).all(),
+                        "more than one player remaining")
+
+    def test_dice_count(self):
+        self.simulator.faces[0] = 2
+        self.simulator.dice[0] = [1, 2, 0, 5]
+        self.simulator.alive = (np.arange(5) <
+                                self.simulator.dice[..., None])
+        count = self.simulator.dice_count(np.full(self.GAMES, 2, np.int8))
+        self.assertEqual(count[0], 8, "incorrect count")
@@ -0,0 +1,53 @@
+from unittest import TestCase
+from liars_dice import bids
+from liars_dice.server.game import GameStatus
+
+
+class TestBids(TestCase):
+
+    def test_encode(self):
+        # Code order matches the order in which bids may be made
+        all_bids = [(face, number) for number in xrange(1, 5)
+                    for face in xrange(1, 7)]
+        status = GameStatus()
+        status.add_player("a")
+        for previous in all_bids:
+            for bid in all_bids:
+                status.previous_bid = previous
+                self.assertEqual(
+                    bids.encode(*bid) > bids.encode(*previous),
+                    status.handle_bid(*bid),
+                    "code order differs for " + str((previous, bid)))
+        self.assertTrue(bids.encode(1, 1) > bids.NO_BID,
+                        "bid does not follow the lack of one")
+
+    def test_decode(self):
+        # Decoding reverses encoding, within and beyond the table
+        for number in (1, 2, bids.TABLE_DICE, bids.TABLE_DICE + 1, 5000):
+            for face in xrange(1, 7):
+                self.assertEqual(bids.decode(bids.encode(face, number)),
+                                 (face, number), "incorrect decoding")
+
+    def test_is_valid(self):
+        self.assertTrue(bids.is_valid(6, 1, 2), "valid bid rejected")
+        self.assertTrue(bids.is_valid(1, 2, 2), "bid for every die rejected")
+        self.assertFalse(bids.is_valid(7, 1, 2), "face too large accepted")
+        self.assertFalse(bids.is_valid(0, 1, 2), "face too small accepted")
+        self.assertFalse(bids.is_valid(3, 0, 2), "no dice accepted")
+        self.assertFalse(bids.is_valid(3, 3, 2),
+                         "more dice than are in play accepted")
+
+    def test_successors(self):
+        # Every bid of at most total_dice that may follow
+        for total_dice in (3, bids.TABLE_DICE + 2):
+            previous = bids.encode(4, 2)
+            codes = list(bids.successors(previous, total_dice))
+            self.assertEqual([bids.decode(code) for code in codes],
+                             list(bids.successor_bids(previous, total_dice)),
+                             "successor codes and bids differ")
+            self.assertEqual(bids.decode(codes[0]), (5, 2),
+                             "incorrect weakest successor")
+            self.assertEqual(bids.decode(codes[-1]), (6, total_dice),
+                             "incorrect strongest successor")
+        self.assertEqual(len(bids.successors(bids.NO_BID, 2)), 12,
+                         "incorrect successors of no bid")
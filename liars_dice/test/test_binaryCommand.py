@@ -0,0 +1,183 @@
+from unittest import TestCase
+from twisted.internet.task import Clock
+from twisted.test.proto_helpers import StringTransport
+from liars_dice import binary_command, network_command
+from liars_dice.client.player import Player
+from liars_dice.server.game_server import LiarGameFactory
+
+
+class TestBinaryCommand(TestCase):
+
+    def test_codecs(self):
+        # Decoding a frame gives the same arguments as parsing the text
+        messages = [
+            (network_command.BID, (6, 300)),
+            (network_command.PLAYER_HAND, ([5, 1, 3],)),
+            (network_command.PLAYER_STATUS, ([("alice", 5), ("b", 0)],)),
+            (network_command.PLAYER_STATUS, ([],)),
+            (network_command.CHAT, ("alice", "hi, all: bye")),
+            (network_command.NEXT_TURN, ("alice",)),
+            (network_command.PLAY, ()),
+        ]
+        for command, arguments in messages:
+            frames = binary_command.FrameReader().feed(binary_command.encode(
+                binary_command.SERVER_CODECS, command, arguments))
+            self.assertEqual(len(frames), 1, "did not read a single frame")
+            opcode, payload = frames[0]
+            self.assertEqual(opcode, binary_command.OPCODES[command],
+                             "incorrect opcode")
+
+            line = network_command.format_message(
+                network_command.SERVER_FORMATTERS, command, arguments)
+            parsed = COMMAND_PARSERS[command](
+                line.partition(network_command.DELIMITER)[2] or None)
+            self.assertEqual(
+                binary_command.SERVER_CODECS[command][1](payload), parsed,
+                "decoded arguments differ from the text for " + command)
+
+    def test_malformed(self):
+        decode_bid = binary_command.SERVER_CODECS[network_command.BID][1]
+        decode_status = binary_command.SERVER_CODECS[
+            network_command.PLAYER_STATUS][1]
+        decode_chat = binary_command.SERVER_CODECS[network_command.CHAT][1]
+        self.assertRaises(ValueError, decode_bid, "\x01")
+        self.assertRaises(ValueError, decode_status, "\x05ali")
+        self.assertRaises(ValueError, decode_chat, "\x05ali")
+        self.assertRaises(ValueError, binary_command.encode,
+                          binary_command.CLIENT_CODECS, network_command.CHAT,
+                          ("x" * binary_command.MAX_FRAME,))
+
+    def test_frame_reader(self):
+        data = "".join(binary_command.encode(binary_command.CLIENT_CODECS,
+                                             network_command.BID, (face, 2))
+                       for face in xrange(1, 7))
+        reader = binary_command.FrameReader()
+        frames = []
+        for i in xrange(0, len(data), 4):
+            frames.extend(reader.feed(data[i:i + 4]))
+        self.assertEqual([BID_DECODER(payload) for _, payload in frames],
+                         [(face, 2) for face in xrange(1, 7)],
+                         "did not reassemble the frames")
+
+
+COMMAND_PARSERS = {
+    network_command.BID: network_command.parse_bid,
+    network_command.PLAYER_HAND: network_command.parse_hand,
+    network_command.PLAYER_STATUS: network_command.parse_player_status,
+    network_command.CHAT: network_command.parse_chat,
+    network_command.NEXT_TURN: network_command.parse_string,
+    network_command.PLAY: network_command.parse_none,
+}
+
+BID_DECODER = binary_command.CLIENT_CODECS[network_command.BID][1]
+
+
+class Recorder(Player):
+    # A client recording its notifications, and joining as soon as asked
+
+    def __init__(self, name, use_binary_protocol):
+        Player.__init__(self)
+        self.name = name
+        self.use_binary_protocol = use_binary_protocol
+        self.received = []
+
+    def notification_username_request(self):
+        self.send_username(self.name)
+
+    def notification_play_request(self):
+        self.received.append("play")
+
+    def notification_can_start(self):
+        self.received.append("can_start")
+
+    def notification_hand(self, hand):
+        self.received.append(("hand", len(hand)))
+
+    def notification_player_status(self, player_data):
+        self.received.append(player_data)
+
+    def notification_bid(self, face, number):
+        self.received.append((face, number))
+
+    def notification_chat(self, username, message):
+        self.received.append((username, message))
+
+
+class TestNegotiation(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.factory = LiarGameFactory(self.clock)
+        self.connections = []
+
+    def connect(self, client):
+        # Connect a client to a server protocol through in-memory transports
+        server = self.factory.buildProtocol(None)
+        server.makeConnection(StringTransport())
+        client.makeConnection(StringTransport())
+        self.connections.append((client, server))
+        self.pump()
+        return server
+
+    def pump(self):
+        # Deliver data in both directions until there is none left
+        moved = True
+        while moved:
+            moved = False
+            self.clock.advance(0)
+            for client, server in self.connections:
+                for source, destination in ((server, client),
+                                            (client, server)):
+                    data = source.transport.value()
+                    if data:
+                        source.transport.clear()
+                        destination.dataReceived(data)
+                        moved = True
+
+    def test_mixed_protocols(self):
+        binary = Recorder("alice", True)
+        text = Recorder("bob", False)
+        binary_server = self.connect(binary)
+        text_server = self.connect(text)
+        self.assertTrue(binary_server.binary, "did not switch to binary")
+        self.assertFalse(text_server.binary, "switched a legacy client")
+
+        binary.send_start()
+        self.pump()
+        turn_player = binary_server.table.game.turn_player()
+        turn_client = binary if turn_player == "alice" else text
+        turn_client.send_bid(3, 2)
+        turn_client.send_chat("hi, all")
+        self.pump()
+
+        for client in (binary, text):
+            self.assertIn([("alice", 5), ("bob", 5)], client.received,
+                          "did not receive the player status")
+            self.assertIn(("hand", 5), client.received,
+                          "did not receive the hand")
+            self.assertIn((3, 2), client.received, "did not receive the bid")
+            self.assertIn((turn_player, "hi, all"), client.received,
+                          "did not receive the chat message")
+        self.assertIn("can_start", binary.received,
+                      "binary client was not told it could start the game")
+
+    def test_oversized_bid(self):
+        # Bids too large for the binary protocol are rejected for every
+        # client
+        binary = Recorder("alice", True)
+        text = Recorder("bob", False)
+        binary_server = self.connect(binary)
+        text_server = self.connect(text)
+        binary.send_start()
+        self.pump()
+        game = binary_server.table.game
+        if game.turn_player() == "alice":
+            binary.send_bid(3, 1)
+            self.pump()
+        bid = game.previous_bid
+        text_server.lineReceived(network_command.BID +
+                                 network_command.DELIMITER + "1,70000")
+        self.pump()
+        self.assertEqual(game.previous_bid, bid, "accepted the bid")
+        self.assertEqual(game.turn_player(), "bob")
+        self.assertNotIn((1, 70000), binary.received)
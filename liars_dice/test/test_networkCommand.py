@@ -0,0 +1,82 @@
+from unittest import TestCase
+from liars_dice import network_command
+from liars_dice.client.player import Player
+
+
+class TestParsers(TestCase):
+
+    def test_parse_bid(self):
+        self.assertEqual(network_command.parse_bid("4,12"), (4, 12),
+                         "incorrect bid")
+        for content in (None, "", "4", "4,", "a,3", "1,2,3"):
+            self.assertRaises(ValueError, network_command.parse_bid, content)
+
+    def test_parse_player_status(self):
+        self.assertEqual(
+            network_command.parse_player_status("alice=5,bob=12"),
+            ([("alice", 5), ("bob", 12)],), "incorrect player status")
+        self.assertEqual(network_command.parse_player_status(""), ([],),
+                         "incorrect empty player status")
+
+    def test_parse_hand(self):
+        self.assertEqual(network_command.parse_hand("6,1,3"), ([1, 3, 6],),
+                         "did not sort the hand")
+        self.assertRaises(ValueError, network_command.parse_hand, None)
+        self.assertRaises(ValueError, network_command.parse_hand, "1,x")
+
+    def test_parse_chat(self):
+        self.assertEqual(network_command.parse_chat("alice,hi, all: bye"),
+                         ("alice", "hi, all: bye"), "incorrect chat message")
+        self.assertRaises(ValueError, network_command.parse_chat, "alice")
+
+    def test_parse_queue(self):
+        for kind, rating in (("bot", None), ("human", 1500), ("", None)):
+            self.assertEqual(network_command.parse_queue(
+                network_command.format_queue(kind, rating)), (kind, rating))
+        self.assertEqual(network_command.parse_queue(None), ("", None))
+        self.assertRaises(ValueError, network_command.parse_queue, "bot,x")
+
+
+class TestCommandRegistry(TestCase):
+
+    class Recorder(Player):
+        def __init__(self):
+            Player.__init__(self)
+            self.received = []
+
+        def notification_username_request(self):
+            self.received.append("username")
+
+        def notification_play_request(self):
+            self.received.append("play")
+
+        def notification_can_start(self):
+            pass
+
+        def notification_chat(self, username, message):
+            self.received.append((username, message))
+
+        def notification_bid(self, face, number):
+            self.received.append((face, number))
+
+    def test_dispatch(self):
+        player = self.Recorder()
+        for line in ("username", "play", "chat:alice,a:b", "bid:3,2",
+                     "unknown:command"):
+            player.lineReceived(line)
+        self.assertEqual(player.received,
+                         ["username", "play", ("alice", "a:b"), (3, 2)],
+                         "did not dispatch to the subclass' methods")
+        self.assertNotEqual(player.previous_bid_code, -1,
+                            "did not track the previous bid")
+
+    def test_table(self):
+        registry = network_command.CommandRegistry({
+            network_command.PLAY:
+                (network_command.parse_none, "notification_play_request")})
+        table = registry.table(self.Recorder)
+        self.assertIs(registry.table(self.Recorder), table,
+                      "did not reuse the table")
+        self.assertIs(table[network_command.PLAY][1],
+                      self.Recorder.notification_play_request.__func__,
+                      "did not resolve the handler for the class")
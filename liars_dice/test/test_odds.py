@@ -0,0 +1,65 @@
+from unittest import TestCase
+import itertools
+from liars_dice.odds import BidOdds
+from liars_dice.server.game import GameStatus
+
+
+class TestBidOdds(TestCase):
+
+    def setUp(self):
+        self.odds = BidOdds(max_dice=10, cache_size=2)
+
+    def test_tables(self):
+        # Compare against counting every possible roll of 4 dice
+        rolls = list(itertools.product(xrange(1, 7), repeat=4))
+        for needed in xrange(6):
+            matches = [roll.count(1) for roll in rolls]
+            at_least = sum(n >= needed for n in matches) / float(len(rolls))
+            exactly = matches.count(needed) / float(len(rolls))
+            self.assertAlmostEqual(self.odds.at_least(4, needed), at_least,
+                                   msg="incorrect at_least probability")
+            self.assertAlmostEqual(self.odds.exactly(4, needed), exactly,
+                                   msg="incorrect exactly probability")
+
+    def test_beyond_tables(self):
+        # Probabilities beyond the tables match those within them
+        larger = BidOdds(max_dice=40)
+        for needed in (0, 1, 5, 12, 30):
+            self.assertAlmostEqual(self.odds.at_least(30, needed),
+                                   larger.at_least(30, needed),
+                                   msg="incorrect at_least probability")
+            self.assertAlmostEqual(self.odds.exactly(30, needed),
+                                   larger.exactly(30, needed),
+                                   msg="incorrect exactly probability")
+        self.assertEqual(len(self.odds._cache), 2,
+                         "cache exceeded its size")
+
+    def test_bid(self):
+        # Dice in the player's hand are certain
+        at_least, exactly = self.odds.bid([3, 3], 3, 2, 5)
+        self.assertEqual(at_least, 1.0, "incorrect probability with a known "
+                                        "hand")
+        self.assertAlmostEqual(exactly, 125.0 / 216,
+                               msg="incorrect probability with a known hand")
+        self.assertEqual(self.odds.bid([3, 3], 3, 6, 5), (0.0, 0.0),
+                         "incorrect probabilities for too many dice")
+
+    def test_score_bids(self):
+        # Every legal bid is scored, from weakest to strongest
+        for previous_bid in (None, (1, 1), (6, 2), (4, 3)):
+            scores = self.odds.score_bids([1, 2, 6], previous_bid, 8)
+            status = GameStatus()
+            for player in ("a", "b"):
+                status.add_player(player)
+            legal = []
+            for number in xrange(1, 9):
+                for face in xrange(1, 7):
+                    status.previous_bid = previous_bid
+                    if status.handle_bid(face, number):
+                        legal.append((face, number))
+            self.assertEqual([score[:2] for score in scores], legal,
+                             "incorrect bids for " + str(previous_bid))
+            for face, number, at_least, exactly in scores:
+                self.assertEqual((at_least, exactly),
+                                 self.odds.bid([1, 2, 6], face, number, 8),
+                                 "incorrect probabilities")
@@ -0,0 +1,121 @@
+from unittest import TestCase
+import random
+from liars_dice import network_command
+from liars_dice.server.game import GameStatus, Hand
+from liars_dice.sim import (OddsPolicy, PlayerView, Simulator,
+                            simple_bot_policy)
+
+
+class TestSimulator(TestCase):
+
+    def test_play_game(self):
+        # A game between bots always ends with one of them winning
+        simulator = Simulator([simple_bot_policy] * 3, ["a", "b", "c"])
+        winner, turns = simulator.play_game()
+        self.assertIn(winner, ["a", "b", "c"], "invalid winner")
+        self.assertGreaterEqual(turns, 2 * Hand.INITIAL_HAND_SIZE,
+                                "too few turns to eliminate a player")
+
+    def test_play_game_status_class(self):
+        # The original GameStatus can also be used
+        simulator = Simulator([simple_bot_policy] * 2,
+                              status_class=GameStatus)
+        winner, _ = simulator.play_game()
+        self.assertIn(winner, simulator.usernames, "invalid winner")
+
+    def test_player_view(self):
+        views = []
+
+        def policy(view):
+            views.append(view)
+            if view.previous_bid is None:
+                return 1, 1
+            return network_command.LIAR
+
+        Simulator([policy, policy]).play_game()
+        first = views[0]
+        self.assertEqual(first.username, "player0",
+                         "first round not started by the first player")
+        self.assertEqual(len(first.hand), Hand.INITIAL_HAND_SIZE,
+                         "incorrect hand")
+        self.assertEqual(first.total_dice, 2 * Hand.INITIAL_HAND_SIZE,
+                         "incorrect dice total")
+        self.assertIs(first.previous_bid, None,
+                      "previous bid not reset at the start of the round")
+        self.assertEqual(views[1].previous_bid, (1, 1),
+                         "previous bid not provided")
+
+    def test_invalid_bid(self):
+        def policy(view):
+            return 1, 1
+
+        self.assertRaises(ValueError, Simulator([policy, policy]).play_game)
+
+    def test_play(self):
+        result = Simulator([simple_bot_policy] * 2).play(5)
+        self.assertEqual(result.games, 5, "incorrect number of games")
+        self.assertEqual(sum(result.wins.values()), 5,
+                         "incorrect number of wins")
+
+    def test_simple_bot_policy(self):
+        view = PlayerView("a", [1], None, [("a", 1), ("b", 1)], 2,
+                          random)
+        face, number = simple_bot_policy(view)
+        self.assertEqual(number, 1, "opening bid should be a single die")
+
+        for _ in xrange(100):
+            view = PlayerView("a", [1], (3, 1), [("a", 1), ("b", 1)], 2,
+                              random)
+            play = simple_bot_policy(view)
+            if play not in (network_command.LIAR, network_command.SPOT_ON):
+                status = GameStatus()
+                for player in ("a", "b"):
+                    status.add_player(player)
+                status.previous_bid = (3, 1)
+                self.assertTrue(status.handle_bid(*play),
+                                "made an invalid bid")
+
+            # Every die is bid for, so no higher number may be bid
+            view = PlayerView("a", [1], (6, 2), [("a", 1), ("b", 1)], 2,
+                              random)
+            self.assertIn(simple_bot_policy(view),
+                          (network_command.LIAR, network_command.SPOT_ON),
+                          "bid for more dice than are in play")
+
+    def test_odds_policy(self):
+        policy = OddsPolicy()
+        view = PlayerView("a", [4, 4], None, [("a", 2), ("b", 2)], 4,
+                          random)
+        self.assertEqual(policy(view)[0], 4, "did not bid its own dice")
+        view = PlayerView("a", [1, 2], (5, 4), [("a", 2), ("b", 2)], 4,
+                          random)
+        self.assertEqual(policy(view), network_command.LIAR,
+                         "accepted an impossible bid")
+        view = PlayerView("a", [3, 3], (3, 1), [("a", 2), ("b", 2)], 4,
+                          random)
+        self.assertNotIn(policy(view), (network_command.LIAR,
+                                        network_command.SPOT_ON),
+                         "challenged a certain bid")
+
+        winner, _ = Simulator([policy, OddsPolicy()]).play_game()
+        self.assertIn(winner, ["player0", "player1"], "invalid winner")
+
+    def test_seed(self):
+        # Games with the same seed are dealt the same hands
+        hands = []
+
+        def policy(view):
+            hands.append(view.hand)
+            return network_command.LIAR if view.previous_bid else (1, 1)
+
+        for _ in xrange(2):
+            Simulator([policy, policy], seed=3).play_game()
+        half = len(hands) // 2
+        self.assertEqual(hands[:half], hands[half:], "hands differ")
+
+        # and policies playing at random make the same plays
+        results = [Simulator([simple_bot_policy] * 3, seed=3).play(20)
+                   for _ in xrange(2)]
+        self.assertEqual([(result.turns, result.wins) for result in results],
+                         [(results[0].turns, results[0].wins)] * 2,
+                         "plays differ")
@@ -0,0 +1,129 @@
+from unittest import TestCase
+from array import array
+import os
+import shutil
+import tempfile
+from liars_dice.sim import OddsPolicy, simple_bot_policy
+from liars_dice.tournament import (Batch, ResultStore, Tournament, rate,
+                                   seat_wins)
+
+
+def batch(seating, winners, offset=0):
+    # A Batch won from the given seats, each game taking 10 turns
+    return Batch(seating, offset, bytearray(winners),
+                 array("H", [10] * len(winners)))
+
+
+class TestResultStore(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "results")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        store = ResultStore(self.path, ["a", "b", "c"])
+        store.append(batch((0, 1), [0, 1, 1]))
+        store.append(batch((2, 0, 1), [2], 4))
+        self.assertEqual(list(store.batches()),
+                         [batch((0, 1), [0, 1, 1]), batch((2, 0, 1), [2], 4)])
+        store.close()
+        store = ResultStore(self.path, ["a", "b", "c"])
+        self.assertEqual(store.played(), {(0, 1): [(0, 3)],
+                                          (2, 0, 1): [(4, 1)]})
+        store.close()
+
+    def test_incomplete_batch(self):
+        # A batch cut short is discarded, and written over
+        store = ResultStore(self.path, ["a", "b"])
+        store.append(batch((0, 1), [0, 1]))
+        store.close()
+        size = os.path.getsize(self.path)
+        with open(self.path, "ab") as results:
+            results.write("\x02\x00\x00\x00\x00\x05\x00")
+        store = ResultStore(self.path, ["a", "b"])
+        self.assertEqual(os.path.getsize(self.path), size)
+        store.append(batch((1, 0), [1]))
+        self.assertEqual(store.played(), {(0, 1): [(0, 2)], (1, 0): [(0, 1)]})
+        store.close()
+
+    def test_other_entrants(self):
+        ResultStore(self.path, ["a", "b"]).close()
+        self.assertRaises(ValueError, ResultStore, self.path, ["a", "c"])
+
+
+class TestRatings(TestCase):
+    def test_heads_up(self):
+        # Winning three games in four is worth 400 * log10(3) points
+        ratings = rate(["a", "b"], [batch((0, 1), [0, 0, 0, 1] * 100)])
+        self.assertEqual([rating.name for rating in ratings], ["a", "b"])
+        self.assertAlmostEqual(ratings[0].rating - ratings[1].rating,
+                               190.85, places=2)
+        self.assertAlmostEqual(ratings[0].rating + ratings[1].rating, 3000)
+        self.assertEqual((ratings[0].games, ratings[0].wins), (400, 300))
+
+        # Intervals narrow with the square root of the number of games
+        more = rate(["a", "b"], [batch((0, 1), [0, 0, 0, 1] * 400)])
+        self.assertAlmostEqual(ratings[0].error / more[0].error, 2)
+
+    def test_multiplayer(self):
+        # Equal wins from tables of three give equal ratings
+        ratings = rate(["a", "b", "c"], [batch((0, 1, 2), [0, 1, 2] * 10)])
+        for rating in ratings:
+            self.assertAlmostEqual(rating.rating, 1500)
+            self.assertGreater(rating.error, 0)
+
+    def test_never_won(self):
+        ratings = rate(["a", "b"], [batch((0, 1), [0] * 10)])
+        self.assertEqual(ratings[1].wins, 0)
+        self.assertLess(ratings[1].rating, ratings[0].rating)
+
+    def test_seat_wins(self):
+        self.assertEqual(seat_wins([batch((0, 1), [0, 1, 0]),
+                                    batch((2, 1, 0), [2])]), [2, 1, 1])
+
+
+class TestTournament(TestCase):
+    def test_seatings(self):
+        tournament = Tournament([simple_bot_policy] * 3, table_size=2)
+        self.assertEqual(tournament.seatings(),
+                         [(0, 1), (1, 0), (0, 2), (2, 0), (1, 2), (2, 1)])
+        self.assertRaises(ValueError, Tournament, [simple_bot_policy], 2)
+
+    def test_schedule(self):
+        tournament = Tournament([simple_bot_policy] * 2, batch_size=4,
+                                seed=1)
+        schedule = tournament.schedule(20, {(0, 1): [(0, 4), (8, 2)]})
+        self.assertEqual([task[:3] for task in schedule],
+                         [((0, 1), 4, 4), ((1, 0), 0, 4), ((1, 0), 4, 4),
+                          ((1, 0), 8, 2)])
+        seeds = [task[3] for task in tournament.schedule(20)]
+        self.assertEqual(len(set(seeds)), len(seeds), "seeds repeated")
+
+        # Batches finished out of order leave gaps, which are filled
+        schedule = tournament.schedule(20, {(0, 1): [(8, 2), (0, 4)],
+                                            (1, 0): [(4, 4)]})
+        self.assertEqual([task[:3] for task in schedule],
+                         [((0, 1), 4, 4), ((1, 0), 0, 4), ((1, 0), 8, 2)])
+        self.assertEqual(tournament.schedule(20)[1][3], schedule[0][3],
+                         "seed depends on the batches played")
+
+    def test_play(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "results")
+        try:
+            tournament = Tournament([simple_bot_policy, OddsPolicy],
+                                    processes=2, batch_size=3, seed=1)
+            result = tournament.play(10, path)
+            self.assertEqual(result.games, 10)
+            self.assertEqual(sum(result.seat_wins), 10)
+            self.assertEqual(sorted(rating.name
+                                    for rating in result.ratings),
+                             ["OddsPolicy", "simple_bot_policy"])
+
+            # A finished tournament has nothing left to play
+            self.assertEqual(tournament.play(10, path).games, 0)
+            self.assertEqual(tournament.play(12, path).games, 2)
+        finally:
+            shutil.rmtree(directory)
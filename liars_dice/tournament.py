@@ -0,0 +1,510 @@
+#!/usr/bin/env python
+
+"""
+
+Rate policies against each other in a round-robin tournament, played
+in-process by liars_dice.sim across a pool of worker processes.
+
+Every combination of table_size entrants plays the same number of games in
+each rotation of its seating, so no entrant gains from the seat it plays
+from. Games are played in batches, and the results of each batch are
+appended to a ResultStore as it finishes, so a tournament that is stopped
+can be resumed from its store.
+
+Entrants are rated with a Luce choice model, the multiplayer form of the
+Elo model: an entrant of strength p wins against a table of players of
+strengths q with probability p / (p + sum(q)). Strengths are fitted to every
+game in the store by maximum likelihood, and reported on the Elo scale with
+95% confidence intervals from the Fisher information.
+
+"""
+from array import array
+import collections
+import itertools
+import math
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import time
+import types
+from liars_dice.sim import OddsPolicy, Simulator, simple_bot_policy
+
+INITIAL_RATING = 1500
+ELO_SCALE = 400 / math.log(10)  # Elo points per unit of log strength
+CONFIDENCE_Z = 1.96  # Standard errors in a 95% confidence interval
+MAX_TURNS = 0xffff  # Turns recorded per game, beyond which they are clipped
+
+# The results of a batch of games played at one seating.
+#
+# seating: A tuple of integers with the index of the entrant in each seat,
+#     in turn order.
+# offset: An integer with the number of games scheduled at the seating
+#     before the first game of the batch.
+# winners: A bytearray with the seat of the winner of each game.
+# turns: An array of integers with the number of turns of each game.
+Batch = collections.namedtuple(
+    "Batch", ["seating", "offset", "winners", "turns"])
+
+# The rating of an entrant.
+#
+# name: A string with the name of the entrant.
+# rating: A float with the rating of the entrant on the Elo scale.
+# error: A float with half the width of the 95% confidence interval of the
+#     rating.
+# games: An integer with the number of games the entrant played.
+# wins: An integer with the number of games the entrant won.
+Rating = collections.namedtuple(
+    "Rating", ["name", "rating", "error", "games", "wins"])
+
+# The outcome of a tournament.
+#
+# games: An integer with the number of games played by this call.
+# turns: An integer with the number of turns of those games.
+# seconds: A float with the time taken to play them.
+# ratings: A list of the Rating of each entrant, over every game in the
+#     store, from the highest rating.
+# seat_wins: A list of integers with the number of games in the store won
+#     from each seat.
+TournamentResult = collections.namedtuple(
+    "TournamentResult", ["games", "turns", "seconds", "ratings", "seat_wins"])
+
+
+class ResultStore:
+    """Append batches of game results to a compact binary file.
+
+    The file starts with the names of the entrants, followed by the batches
+    in the order they were appended. Each batch takes a few bytes for its
+    seating and offset, and three bytes for each game. A batch left
+    incomplete by an interrupted write is discarded when the store is
+    opened.
+
+    Args:
+        path: A string with the path of the file, which is created if it
+            does not exist.
+        names: A list of strings with the names of the entrants, which must
+            match those of an existing file.
+
+    Raises:
+        ValueError: The file is not a result store, or holds the results of
+            other entrants.
+
+    Attributes:
+        path: A string with the path of the file.
+        names: A list of strings with the names of the entrants.
+    """
+    MAGIC = "LDTR\x02"
+    _COUNT = struct.Struct("<H")
+    _BATCH = struct.Struct("<BII")  # Seats, offset, games
+
+    def __init__(self, path, names):
+        self.path = path
+        self.names = list(names)
+        header = self._header()
+        if not os.path.exists(path) or not os.path.getsize(path):
+            with open(path, "wb") as store:
+                store.write(header)
+        with open(path, "rb") as store:
+            if store.read(len(header)) != header:
+                raise ValueError(path + " does not hold results of " +
+                                 ", ".join(self.names))
+            end = len(header)
+            for _, end in self._read(store):
+                pass
+        self._file = open(path, "r+b")
+        self._file.truncate(end)
+        self._file.seek(end)
+
+    def append(self, batch):
+        """Write a batch to the end of the file.
+
+        Args:
+            batch: The Batch to write.
+        """
+        turns = array("H", batch.turns)
+        if sys.byteorder == "big":
+            turns.byteswap()
+        seats = len(batch.seating)
+        self._file.write(self._BATCH.pack(seats, batch.offset,
+                                          len(batch.winners)) +
+                         struct.pack("<%dH" % seats, *batch.seating) +
+                         str(batch.winners) + turns.tostring())
+        self._file.flush()
+
+    def batches(self):
+        """Read every complete batch in the file.
+
+        Returns:
+            An iterator of Batches, in the order they were appended.
+        """
+        with open(self.path, "rb") as store:
+            store.seek(len(self._header()))
+            for batch, _ in self._read(store):
+                yield batch
+
+    def played(self):
+        """List the batches played at each seating.
+
+        Returns:
+            A dictionary of seatings to lists of (offset, number of games)
+            tuples, one for each batch.
+        """
+        played = collections.defaultdict(list)
+        for batch in self.batches():
+            played[batch.seating].append((batch.offset, len(batch.winners)))
+        return dict(played)
+
+    def close(self):
+        """Close the file."""
+        self._file.close()
+
+    def _header(self):
+        # The names of the entrants, as written at the start of the file.
+
+        names = [name.encode("utf-8") for name in self.names]
+        return self.MAGIC + self._COUNT.pack(len(names)) + "".join(
+            self._COUNT.pack(len(name)) + name for name in names)
+
+    def _read(self, store):
+        # Read the complete batches of an open file from its position.
+        #
+        # Returns:
+        #     An iterator of tuples composed of each Batch, and the offset of
+        #     the end of the batch in the file.
+
+        while True:
+            data = store.read(self._BATCH.size)
+            if len(data) < self._BATCH.size:
+                return
+            seats, offset, games = self._BATCH.unpack(data)
+            data = store.read(2 * seats + 3 * games)
+            if len(data) < 2 * seats + 3 * games:
+                return
+            seating = struct.unpack_from("<%dH" % seats, data)
+            winners = bytearray(data[2 * seats:2 * seats + games])
+            turns = array("H", data[2 * seats + games:])
+            if sys.byteorder == "big":
+                turns.byteswap()
+            yield Batch(seating, offset, winners, turns), store.tell()
+
+
+class Tournament:
+    """Play every combination of entrants against each other.
+
+    Args:
+        policies: A list of the policies of the entrants, as in
+            liars_dice.sim. A policy that is a class is instantiated for
+            each seat it plays, once per batch. Policies are sent to the
+            worker processes by name, so must be defined at module level.
+        table_size: An integer with the number of players in each game, at
+            most the number of entrants.
+        processes: An integer with the number of worker processes, or None
+            to use one for every CPU.
+        batch_size: An integer with the number of games a worker plays
+            before returning their results.
+        seed: An integer seeding the dice and the policies of every game,
+            or None for a random seed.
+
+    Raises:
+        ValueError: There are fewer entrants than players at a table.
+
+    Attributes:
+        names: A list of strings with the names of the entrants.
+    """
+
+    def __init__(self, policies, table_size=2, processes=None,
+                 batch_size=1000, seed=None):
+        if not 2 <= table_size <= len(policies):
+            raise ValueError("cannot seat %d of %d entrants" %
+                             (table_size, len(policies)))
+        self.policies = list(policies)
+        self.names = [policy.__name__ for policy in policies]
+        self.table_size = table_size
+        self.processes = processes
+        self.batch_size = batch_size
+        self.seed = random.getrandbits(31) if seed is None else seed
+
+    def seatings(self):
+        """List every seating played.
+
+        Returns:
+            A list of tuples of integers with the index of the entrant in
+            each seat, with every rotation of every combination of
+            entrants.
+        """
+        return [players[turn:] + players[:turn]
+                for players in itertools.combinations(
+                    xrange(len(self.policies)), self.table_size)
+                for turn in xrange(self.table_size)]
+
+    def schedule(self, games, played=None):
+        """Divide the games left to play into batches.
+
+        The games of each seating are numbered from 0, and a batch is
+        scheduled for every range of them not covered by a batch played.
+
+        Args:
+            games: An integer with the number of games in the tournament,
+                rounded up to a multiple of the number of seatings.
+            played: A dictionary of seatings to lists of (offset, number of
+                games) tuples of the batches already played, as given by
+                ResultStore.played, or None if there are none.
+
+        Returns:
+            A list of (seating, offset, number of games, seed) tuples, one
+            for each batch.
+        """
+        seatings = self.seatings()
+        per_seating = -(-games // len(seatings))
+        batches = []
+        for seating in seatings:
+            covered = sorted((played or {}).get(seating, []))
+            start = 0
+            for offset, size in covered + [(per_seating, 0)]:
+                end = min(offset, per_seating)
+                for first in xrange(start, end, self.batch_size):
+                    batches.append((seating, first,
+                                    min(self.batch_size, end - first),
+                                    self._seed(seating, first)))
+                start = max(start, offset + size)
+        return batches
+
+    def _seed(self, seating, offset):
+        # The seed of the batch starting at an offset of the games of a
+        # seating, distinct for every batch and the same on every platform.
+
+        seed = self.seed
+        for value in (offset,) + seating:
+            seed = (seed << 32) | value
+        return seed
+
+    def play(self, games, path):
+        """Play the games of the tournament not yet in a store.
+
+        Args:
+            games: An integer with the number of games in the tournament,
+                rounded up to a multiple of the number of seatings.
+            path: A string with the path of the ResultStore.
+
+        Returns:
+            A TournamentResult with the games played and the ratings.
+        """
+        store = ResultStore(path, self.names)
+        batches = self.schedule(games, store.played())
+        played = turns = 0
+        start = time.time()
+        pool = multiprocessing.Pool(self.processes, _start_worker,
+                                    (self.policies,))
+        try:
+            for batch in pool.imap_unordered(_play_batch, batches):
+                store.append(batch)
+                played += len(batch.winners)
+                turns += sum(batch.turns)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+            store.close()
+        seconds = time.time() - start
+        return TournamentResult(played, turns, seconds,
+                                rate(self.names, store.batches()),
+                                seat_wins(store.batches()))
+
+
+def rate(names, batches):
+    """Rate entrants from the results of their games.
+
+    An entrant who has won no games is counted as having won half a game,
+    so that their rating is finite.
+
+    Args:
+        names: A list of strings with the names of the entrants.
+        batches: An iterable of Batches of their games.
+
+    Returns:
+        A list of the Rating of each entrant, from the highest rating.
+    """
+    count = len(names)
+    tables = collections.Counter()
+    games = [0] * count
+    wins = [0] * count
+    for batch in batches:
+        players = tuple(sorted(batch.seating))
+        tables[players] += len(batch.winners)
+        for player in players:
+            games[player] += len(batch.winners)
+        for seat, won in enumerate(_count_seats(batch.winners,
+                                                len(batch.seating))):
+            wins[batch.seating[seat]] += won
+
+    strengths = _fit(count, tables, [max(won, 0.5) for won in wins])
+    variances = _variances(count, tables, strengths)
+    mean = sum(math.log(strength) for strength in strengths) / count
+    ratings = [Rating(names[i],
+                      INITIAL_RATING +
+                      ELO_SCALE * (math.log(strengths[i]) - mean),
+                      CONFIDENCE_Z * ELO_SCALE * math.sqrt(variances[i]),
+                      games[i], wins[i])
+               for i in xrange(count)]
+    ratings.sort(key=lambda rating: rating.rating, reverse=True)
+    return ratings
+
+
+def seat_wins(batches):
+    """Count the games won from each seat.
+
+    Args:
+        batches: An iterable of Batches.
+
+    Returns:
+        A list of integers with the number of games won from each seat.
+    """
+    wins = []
+    for batch in batches:
+        seats = _count_seats(batch.winners, len(batch.seating))
+        wins.extend([0] * (len(seats) - len(wins)))
+        for seat, won in enumerate(seats):
+            wins[seat] += won
+    return wins
+
+
+def _count_seats(winners, seats):
+    # The number of games won from each seat of a batch.
+
+    winners = str(winners)
+    return [winners.count(chr(seat)) for seat in xrange(seats)]
+
+
+def _fit(count, tables, wins, iterations=10000, tolerance=1e-10):
+    # Fit the strength of each entrant by the minorization-maximization
+    # algorithm of Hunter (2004), from the number of games played by each
+    # combination of entrants and the wins of each entrant.
+
+    strengths = [1.0] * count
+    for _ in xrange(iterations):
+        expected = [0.0] * count
+        for players, games in tables.iteritems():
+            share = games / sum(strengths[player] for player in players)
+            for player in players:
+                expected[player] += share
+        updated = [wins[i] / expected[i] for i in xrange(count)]
+        scale = math.exp(-sum(math.log(strength) for strength in updated) /
+                         count)
+        updated = [strength * scale for strength in updated]
+        change = max(abs(math.log(new / old))
+                     for new, old in zip(updated, strengths))
+        strengths = updated
+        if change < tolerance:
+            break
+    return strengths
+
+
+def _variances(count, tables, strengths):
+    # The variance of the log strength of each entrant about the mean, from
+    # the pseudo-inverse of the Fisher information. The information matrix
+    # has the vector of ones as its null space, so adding the projection
+    # onto it makes the matrix invertible without changing its inverse
+    # elsewhere.
+
+    information = [[1.0 / count] * count for _ in xrange(count)]
+    for players, games in tables.iteritems():
+        total = sum(strengths[player] for player in players)
+        for i in players:
+            share = strengths[i] / total
+            information[i][i] += games * share
+            for j in players:
+                information[i][j] -= games * share * strengths[j] / total
+    inverse = _invert(information)
+    return [max(inverse[i][i] - 1.0 / count, 0.0) for i in xrange(count)]
+
+
+def _invert(matrix):
+    # Invert a square matrix by Gauss-Jordan elimination with partial
+    # pivoting.
+
+    size = len(matrix)
+    rows = [list(row) + [float(i == j) for j in xrange(size)]
+            for i, row in enumerate(matrix)]
+    for column in xrange(size):
+        pivot = max(xrange(column, size), key=lambda i: abs(rows[i][column]))
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        divisor = rows[column][column]
+        rows[column] = [value / divisor for value in rows[column]]
+        for i in xrange(size):
+            factor = rows[i][column]
+            if i != column and factor:
+                rows[i] = [value - factor * pivot_value
+                           for value, pivot_value in zip(rows[i],
+                                                         rows[column])]
+    return [row[size:] for row in rows]
+
+
+# The policies of the worker process, set when it starts
+_policies = None
+
+
+def _start_worker(policies):
+    # Keep the policies of the entrants for the batches of the worker.
+
+    global _policies
+    _policies = policies
+
+
+def _play_batch(task):
+    # Play a batch of games at a seating, seeding the dice and the policies
+    # from the seed of the batch.
+
+    seating, offset, games, seed = task
+    policies = []
+    for player in seating:
+        policy = _policies[player]
+        if isinstance(policy, (type, types.ClassType)):
+            policy = policy()
+        policies.append(policy)
+    simulator = Simulator(policies, [str(seat) for seat in
+                                     xrange(len(seating))], seed=seed)
+    winners = bytearray(games)
+    turns = array("H", [0] * games)
+    for game in xrange(games):
+        winner, game_turns = simulator.play_game()
+        winners[game] = int(winner)
+        turns[game] = min(game_turns, MAX_TURNS)
+    return Batch(seating, offset, winners, turns)
+
+
+class BoldOddsPolicy(OddsPolicy):
+    """OddsPolicy, but only declaring 'Liar!' against unlikelier bids."""
+    liar_below = 0.15
+
+
+def run(games=100000, path="tournament.ldtr", table_size=2, processes=None):
+    """Rate the bots against each other and report the speed.
+
+    Args:
+        games: An integer with the number of games in the tournament.
+        path: A string with the path of the ResultStore, which is resumed if
+            it exists.
+        table_size: An integer with the number of players in each game.
+        processes: An integer with the number of worker processes, or None
+            to use one for every CPU.
+    """
+    tournament = Tournament([simple_bot_policy, OddsPolicy, BoldOddsPolicy],
+                            table_size, processes, seed=0)
+    result = tournament.play(games, path)
+    print "Games: %d, turns: %d, seconds: %.2f" % (
+        result.games, result.turns, result.seconds)
+    if result.seconds:
+        print "Games/s: %.0f" % (result.games / result.seconds)
+    print "Entrant\t\t\tRating\t\tGames\tWins"
+    for rating in result.ratings:
+        print "%-24s%.0f +/- %.0f\t%d\t%d" % (
+            rating.name, rating.rating, rating.error, rating.games,
+            rating.wins)
+    print "Wins by seat: " + ", ".join(str(wins)
+                                       for wins in result.seat_wins)
+
+if __name__ == "__main__":
+    run()